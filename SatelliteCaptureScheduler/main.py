@@ -66,12 +66,87 @@ def run_llm_demo():
         print("Make sure you have all required dependencies installed.")
         sys.exit(1)
 
+def run_solver_benchmark(sizes, formulations, time_limit):
+    """Compare the scheduler formulations on generated requests"""
+    from solver.benchmark import run_benchmark
+
+    run_benchmark(sizes, formulations, time_limit=time_limit)
+
+
+def run_animation(output, frames, fps):
+    """Animate the demo satellites, or render them to a GIF or video file"""
+    from visualization.animate import animate_orbit, LABELS, MU, A, EC, IC, OMEGA, W, R
+
+    animate_orbit(
+        speed=50,
+        number_of_satellites=len(A),
+        number_of_tasks=len(LABELS),
+        labels=LABELS,
+        MU=MU,
+        A=A,
+        EC=EC,
+        IC=IC,
+        OMEGA=OMEGA,
+        W=W,
+        R=R,
+        NUM_FRAMES=frames,
+        output=output,
+        fps=fps,
+    )
+
+
+def run_batch(study, workers, output_dir):
+    """Solve the scenarios of a study file in parallel"""
+    from solver.batch import run_study
+
+    run_study(study, output_dir=output_dir, workers=workers)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Satellite Capture Scheduler")
     parser.add_argument(
         "mode", 
-        choices=["sample", "llm"],
-        help="Mode to run: 'sample' for predefined demo or 'llm' for interactive LLM mode"
+        choices=["sample", "llm", "benchmark", "animate", "batch"],
+        help="Mode to run: 'sample' for predefined demo, 'llm' for interactive LLM mode, "
+        "'benchmark' to compare the scheduler formulations, 'animate' to show the orbits "
+        "or 'batch' to solve the scenarios of a study file"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[50, 200, 1000],
+        help="Benchmark: number of requests of each run"
+    )
+    parser.add_argument(
+        "--formulations", nargs="+", default=list(SatelliteScheduler.FORMULATIONS),
+        choices=SatelliteScheduler.FORMULATIONS,
+        help="Benchmark: scheduler formulations to compare"
+    )
+    parser.add_argument(
+        "--time-limit", type=float, default=60,
+        help="Benchmark: solver time limit of each run, in seconds"
+    )
+    parser.add_argument(
+        "--output",
+        help="Animate: render to this .gif or video file (ffmpeg) instead of a window"
+    )
+    parser.add_argument(
+        "--frames", type=int, default=1000,
+        help="Animate: number of frames"
+    )
+    parser.add_argument(
+        "--fps", type=int, default=20,
+        help="Animate: frames per second of the rendered file"
+    )
+    parser.add_argument(
+        "--study",
+        help="Batch: YAML file of the request sets, satellites and scenarios to solve"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Batch: number of scenarios solved in parallel, one per core by default"
+    )
+    parser.add_argument(
+        "--output-dir", default=os.path.join("output", "batch"),
+        help="Batch: directory of stats.csv and results.csv"
     )
     
     args = parser.parse_args()
@@ -82,6 +157,17 @@ def main():
     elif args.mode == "llm":
         print("Starting interactive LLM-based demo...")
         run_llm_demo()
+    elif args.mode == "benchmark":
+        print("Benchmarking the scheduler formulations...")
+        run_solver_benchmark(args.sizes, args.formulations, args.time_limit)
+    elif args.mode == "animate":
+        print("Rendering the orbit animation...")
+        run_animation(args.output, args.frames, args.fps)
+    elif args.mode == "batch":
+        if args.study is None:
+            parser.error("batch mode needs --study")
+        print(f"Solving the scenarios of {args.study}...")
+        run_batch(args.study, args.workers, args.output_dir)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+import numpy as np
+from dataclasses import dataclass
+
+from core.satellite import Satellite
+from core.imaging_task import ImagingTask
+from visualization.visibility import all_availability
+
+EARTH_RADIUS = 6378
+
+
+@dataclass
+class GroundStationConfig:
+    name: str
+    coordinates: tuple[float]
+    downlink_rate_gb_per_s: float
+    min_elevation_angle: float = 5
+
+
+class GroundStation:
+    def __init__(self, config: GroundStationConfig) -> None:
+        self.name = config.name
+        self.coordinates = config.coordinates
+        self.downlink_rate_gb_per_s = config.downlink_rate_gb_per_s
+        self.min_elevation_angle = config.min_elevation_angle
+
+    def position(self) -> tuple[float]:
+        """
+        Position of the station on the Earth's surface at t = 0, in km.
+        """
+        lat_rad, lon_rad = np.radians(self.coordinates[0]), np.radians(self.coordinates[1])
+        return (
+            EARTH_RADIUS * np.cos(lat_rad) * np.cos(lon_rad),
+            EARTH_RADIUS * np.cos(lat_rad) * np.sin(lon_rad),
+            EARTH_RADIUS * np.sin(lat_rad),
+        )
+
+    def downlink_windows(
+        self, satellite: Satellite, begin_time, end_time, time_step=120
+    ) -> list[tuple]:
+        """
+        Passes of `satellite` over the station, from the same orbit propagation
+        as the capture windows (Satellite.position_at).
+
+        Returns (start, end, capacity_gb) tuples, capacity_gb being the data the
+        station can receive during the pass.
+        """
+        station = ImagingTask(labels=[self.name], radius=EARTH_RADIUS, points=[self.position()])
+        availability = all_availability(
+            begin_time,
+            end_time,
+            [satellite],
+            station,
+            min_elevation_angle=self.min_elevation_angle,
+            time_step=time_step,
+            engine="adaptive",
+        )
+        return [
+            (start, end, (end - start) * self.downlink_rate_gb_per_s)
+            for start, end in availability.get(self.name, [])
+        ]
+
+
+def downlink_windows(
+    satellite: Satellite, stations: list[GroundStation], begin_time, end_time, time_step=120
+) -> list[tuple]:
+    """
+    Downlink windows of `satellite` over all the stations, sorted. The satellite
+    has a single downlink, so passes over several stations at once are merged
+    into one window at the best rate of the stations in view.
+    """
+    passes = sorted(
+        (start, end, station.downlink_rate_gb_per_s)
+        for station in stations
+        for start, end, _ in station.downlink_windows(satellite, begin_time, end_time, time_step)
+    )
+
+    merged = []  # [start, end, [(start, end, rate) of the passes]]
+    for start, end, rate in passes:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+            merged[-1][2].append((start, end, rate))
+        else:
+            merged.append([start, end, [(start, end, rate)]])
+
+    windows = []
+    for start, end, overlapping in merged:
+        # Best rate in view at each instant, between the pass edges
+        edges = sorted({edge for s, e, _ in overlapping for edge in (s, e)})
+        capacity = sum(
+            (right - left) * max(rate for s, e, rate in overlapping if s <= left and right <= e)
+            for left, right in zip(edges, edges[1:])
+            if any(s <= left and right <= e for s, e, _ in overlapping)
+        )
+        windows.append((start, end, capacity))
+    return windows
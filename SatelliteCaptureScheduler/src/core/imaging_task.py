@@ -57,3 +57,36 @@ class ImagingTask:
         rotated_points = [tuple(R @ np.array(p)) for p in self.points]
 
         return rotated_points
+
+    def rotate_earth_many(self, times, period=86400):
+        """
+        Rotate all points on Earth for every time of `times` at once.
+
+        Returns an array of shape (len(times), number of points, 3), where
+        [k] holds the same points as rotate_earth(times[k]).
+        """
+        theta = (2 * np.pi / period) * np.asarray(times, dtype=np.float64)
+        cos_t, sin_t = np.cos(theta)[:, None], np.sin(theta)[:, None]
+
+        points = np.asarray(self.points, dtype=np.float64).reshape(-1, 3)
+        x, y, z = points[:, 0], points[:, 1], points[:, 2]
+
+        rotated = np.empty((len(theta), len(points), 3))
+        rotated[:, :, 0] = cos_t * x - sin_t * y
+        rotated[:, :, 1] = sin_t * x + cos_t * y
+        rotated[:, :, 2] = z
+        return rotated
+
+    def rotate_earth_at(self, indices, times, period=86400):
+        """
+        Rotate points[indices[k]] to times[k], elementwise.
+
+        Returns an array of shape (len(indices), 3).
+        """
+        theta = (2 * np.pi / period) * np.asarray(times, dtype=np.float64)
+        cos_t, sin_t = np.cos(theta), np.sin(theta)
+
+        points = np.asarray(self.points, dtype=np.float64).reshape(-1, 3)
+        x, y, z = points[indices].T
+
+        return np.stack([cos_t * x - sin_t * y, sin_t * x + cos_t * y, z], axis=-1)
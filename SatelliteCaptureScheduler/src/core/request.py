@@ -8,6 +8,8 @@ class RequestConfig:
     priority: int
     area_size_km2: int
     time_window_sec: tuple[int]
+    time_windows_sec: list[tuple[int]] | None = None
+    satellite_windows_sec: dict[int, list[tuple[int]]] | None = None
 
 
 class Request:
@@ -16,4 +18,33 @@ class Request:
         self.coordinates = config.coordinates
         self.priority = config.priority
         self.area_size_km2 = config.area_size_km2
-        self.time_window_sec = config.time_window_sec
+
+        # Disjoint capture windows; time_window_sec is the span that covers all of them
+        windows = config.time_windows_sec or [config.time_window_sec]
+        self.time_windows_sec = [tuple(window) for window in sorted(windows)]
+        if config.time_windows_sec:
+            self.time_window_sec = (
+                self.time_windows_sec[0][0],
+                max(end for _, end in self.time_windows_sec),
+            )
+        else:
+            self.time_window_sec = config.time_window_sec
+
+        # Windows of each satellite of a constellation, by satellite index
+        self.satellite_windows_sec = (
+            {
+                sat_idx: [tuple(window) for window in sorted(sat_windows)]
+                for sat_idx, sat_windows in config.satellite_windows_sec.items()
+            }
+            if config.satellite_windows_sec is not None
+            else None
+        )
+
+    def windows_for(self, sat_idx: int) -> list[tuple[int]]:
+        """
+        Capture windows of the request for one satellite of a constellation;
+        the request windows apply to every satellite without per-satellite windows.
+        """
+        if self.satellite_windows_sec is None:
+            return self.time_windows_sec
+        return self.satellite_windows_sec.get(sat_idx, [])
@@ -2,6 +2,39 @@ import numpy as np
 import math
 from dataclasses import dataclass
 
+# Convergence of the Newton solver of Kepler's equation, in radians
+KEPLER_TOLERANCE = 1e-12
+KEPLER_MAX_ITERATIONS = 30
+
+# Scalar positions kept by position_at, for callers asking the same times again
+POSITION_CACHE_SIZE = 4096
+
+
+def solve_kepler(mean_anomaly, eccentricity, tolerance=KEPLER_TOLERANCE):
+    """
+    Eccentric anomaly E of M = E - e sin(E), for a float or an array of mean
+    anomalies, with Newton iterations until every value moves by less than
+    `tolerance`. A float is solved with math, which costs less than building
+    NumPy arrays for a single value.
+    """
+    if isinstance(mean_anomaly, float):
+        xp, converged = math, bool
+    else:
+        xp, converged = np, np.all
+        mean_anomaly = np.asarray(mean_anomaly, dtype=np.float64)
+    E = mean_anomaly
+    if eccentricity >= 0.8:
+        # Closer start for very eccentric orbits, where E = M can diverge
+        E = mean_anomaly + xp.copysign(0.85 * eccentricity, xp.sin(mean_anomaly))
+    for _ in range(KEPLER_MAX_ITERATIONS):
+        step = (E - eccentricity * xp.sin(E) - mean_anomaly) / (
+            1 - eccentricity * xp.cos(E)
+        )
+        E = E - step
+        if converged(abs(step) < tolerance):
+            break
+    return E
+
 
 @dataclass
 class SatelliteConfig:
@@ -45,45 +78,88 @@ class Satellite:
         self.recalibration_time_s = config.recalibration_time_s
         self.speed_kms_per_s = config.speed_kms_per_s
 
+        # Orbit constants of the propagation, computed once
+        # How fast the satellite orbits Earth
+        self.mean_motion = math.sqrt(self.MU / (self.A**3))
+
+        # Rotation of the orbit plane (x_p, y_p) into 3D, as a 3x2 matrix
+        cos_w, sin_w = np.cos(self.W), np.sin(self.W)
+        cos_i, sin_i = np.cos(self.IC), np.sin(self.IC)
+        cos_omega, sin_omega = np.cos(self.OMEGA), np.sin(self.OMEGA)
+        self.orbit_rotation = np.array(
+            [
+                [
+                    cos_omega * cos_w - sin_omega * sin_w * cos_i,
+                    -cos_omega * sin_w - sin_omega * cos_w * cos_i,
+                ],
+                [
+                    sin_omega * cos_w + cos_omega * sin_w * cos_i,
+                    -sin_omega * sin_w + cos_omega * cos_w * cos_i,
+                ],
+                [sin_w * sin_i, cos_w * sin_i],
+            ]
+        )
+        self.__rotation_rows = tuple(tuple(float(v) for v in row) for row in self.orbit_rotation)
+        self.__position_cache = {}
+
+    def propagate(self, times) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Positions of the satellite at `times` (a scalar or an array of any
+        shape), as an array of shape times.shape + (3,), and the distances from
+        the center of the Earth, of shape times.shape.
+        """
+        x, y, z, r = self.__orbit_state(np.asarray(times, dtype=np.float64))
+        return np.stack([x, y, z], axis=-1), r
+
+    def positions_at(self, times) -> np.ndarray:
+        """
+        Positions of the satellite at an array of N times, as an (N, 3) array.
+        """
+        positions, _ = self.propagate(np.ravel(times))
+        return positions
+
     def position_at(self, t: int) -> tuple[int]:
         """
-        Calculate the position of the satellite at a given time t.
+        Calculate the position of the satellite at a given time t (a scalar or
+        an array), as x, y, z and the distance from the center of the Earth.
         """
-        # How fast the satellite orbits Earth
-        n = np.sqrt(self.MU / (self.A**3))
+        if np.ndim(t) == 0:
+            # The visibility scans ask for the same times once per point
+            key = float(t)
+            position = self.__position_cache.get(key)
+            if position is None:
+                if len(self.__position_cache) >= POSITION_CACHE_SIZE:
+                    self.__position_cache.clear()
+                position = self.__orbit_state(key)
+                self.__position_cache[key] = position
+            return position
+
+        xyz, r = self.propagate(t)
+        return xyz[..., 0], xyz[..., 1], xyz[..., 2], r
+
+    def __orbit_state(self, t):
+        """
+        x, y, z and the distance from the center of the Earth at t, a float
+        (computed with math) or an array (computed with NumPy).
+        """
+        xp = math if isinstance(t, float) else np
 
         # Approximate position in orbit
-        M = n * t
+        M = self.mean_motion * t
 
         # Solve Kepler's equation
-        E = M
-        for _ in range(5):
-            E = M + self.EC * np.sin(E)
+        E = solve_kepler(M, self.EC)
+        cos_E, sin_E = xp.cos(E), xp.sin(E)
 
-        nu = 2 * np.arctan2(
-            np.sqrt(1 + self.EC) * np.sin(E / 2), np.sqrt(1 - self.EC) * np.cos(E / 2)
-        )
-
-        # Distance from the center of the Earth to the satellite
-        r = (self.A * (1 - self.EC**2)) / (1 + self.EC * np.cos(nu))
-        x_p = r * np.cos(nu)
-        y_p = r * np.sin(nu)
-
-        # Calculate the values for the rotation of the orbit
-        cos_w, sin_w = np.cos(self.W), np.sin(self.W)
-        cos_i, sin_i = np.cos(self.IC), np.sin(self.IC)
-        cos_omega, sin_omega = np.cos(self.OMEGA), np.sin(self.OMEGA)
+        # Distance from the center of the Earth to the satellite, and its
+        # position in the orbit plane, straight from the eccentric anomaly
+        r = self.A * (1 - self.EC * cos_E)
+        x_p = self.A * (cos_E - self.EC)
+        y_p = self.A * math.sqrt(1 - self.EC**2) * sin_E
 
         # Turn into 3D
-        x = (cos_omega * cos_w - sin_omega * sin_w * cos_i) * x_p + (
-            -cos_omega * sin_w - sin_omega * cos_w * cos_i
-        ) * y_p
-        y = (sin_omega * cos_w + cos_omega * sin_w * cos_i) * x_p + (
-            -sin_omega * sin_w + cos_omega * cos_w * cos_i
-        ) * y_p
-        z = (sin_w * sin_i) * x_p + (cos_w * sin_i) * y_p
-
-        return x, y, z, r
+        (a, b), (c, d), (e, f) = self.__rotation_rows
+        return a * x_p + b * y_p, c * x_p + d * y_p, e * x_p + f * y_p, r
 
     def calculate_distance(self, coord1: tuple[int], coord2: tuple[int]) -> int:
 
@@ -5,16 +5,48 @@ import sys
 from ortools.sat.python import cp_model
 
 from core.satellite import Satellite
+from core.ground_station import GroundStation, downlink_windows
 from core.request import Request, RequestConfig
 from core.imaging_task import ImagingTask
 from visualization.visibility import all_availability
-from solver.scheduler import SatelliteScheduler
+from visualization.visibility_cache import VisibilityCache
+from solver.scheduler import SatelliteScheduler, memory_profile
+from solver.constellation import ConstellationScheduler
+from solver.rolling_horizon import RollingHorizonPlanner
 
+# Windows of the cities already asked for are read back from output/visibility_cache
+DEFAULT_VISIBILITY_CACHE = VisibilityCache()
 
-def convert_to_solver_input(enriched_locations, satellites: list[Satellite]):
+
+def merge_windows(windows):
+    """
+    Sort time windows and merge those that overlap, e.g. the same pass seen by
+    several satellites. Returns a list of (start, end) tuples.
+    """
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def convert_to_solver_input(
+    enriched_locations,
+    satellites: list[Satellite],
+    per_satellite=False,
+    visibility_cache: VisibilityCache = DEFAULT_VISIBILITY_CACHE,
+    output_path=os.path.join("output", "solver_input.yaml"),
+):
     """
     Convert the enriched location data from LLM into a format suitable for the solver.
     Add time windows for each location based on satellite visibility.
+    With per_satellite, each request also gets the windows of every satellite
+    separately, for the ConstellationScheduler.
+    The windows come from `visibility_cache` when it already holds them for the
+    same orbit and location; pass None to always compute them.
+    The solver input is saved to `output_path`, unless it is None.
     """
     # Create satellites
     # Using some typical orbital parameters for Earth observation satellites
@@ -50,15 +82,38 @@ def convert_to_solver_input(enriched_locations, satellites: list[Satellite]):
     begin_time = 0
     end_time = 86400  # 24 hours in seconds
 
-    # Calculate availability windows
-    availability_dict = all_availability(
-        begin_time,
-        end_time,
-        satellites,
-        imaging_task,
-        min_elevation_angle=15,
-        time_step=60,
-    )
+    # Calculate availability windows, for each satellite on its own
+    if visibility_cache is not None:
+        satellite_availability = [
+            visibility_cache.availability(
+                begin_time,
+                end_time,
+                satellite,
+                labels,
+                points,
+                min_elevation_angle=15,
+                time_step=120,
+                engine="adaptive",
+            )
+            for satellite in satellites
+        ]
+    else:
+        satellite_availability = [
+            all_availability(
+                begin_time,
+                end_time,
+                [satellite],
+                imaging_task,
+                min_elevation_angle=15,
+                time_step=120,
+                engine="adaptive",
+            )
+            for satellite in satellites
+        ]
+    availability_dict = {}
+    for sat_availability in satellite_availability:
+        for label, windows in sat_availability.items():
+            availability_dict.setdefault(label, []).extend(windows)
 
     # Create the solver requests
     solver_requests_yaml = []
@@ -72,10 +127,19 @@ def convert_to_solver_input(enriched_locations, satellites: list[Satellite]):
             if not location_windows:
                 # If no visibility windows, use default time window
                 time_window = (0, 86400)  # Full day
+                time_windows = None
             else:
-                # Use the first availability window for simplicity
-                # In a more complex implementation, you could merge windows or pick the best one
-                time_window = location_windows[0]
+                # Give the solver every window; it picks the one to use
+                time_windows = merge_windows(location_windows)
+                time_window = (time_windows[0][0], time_windows[-1][1])
+
+            satellite_windows = None
+            if per_satellite:
+                satellite_windows = {
+                    sat_idx: merge_windows(sat_availability[loc["location"]])
+                    for sat_idx, sat_availability in enumerate(satellite_availability)
+                    if loc["location"] in sat_availability
+                }
 
             solver_requests_yaml.append(
                 {
@@ -87,6 +151,8 @@ def convert_to_solver_input(enriched_locations, satellites: list[Satellite]):
                     "priority": loc.get("priority", 3),
                     "area_size_km2": loc.get("area_size_km2", 1.0),
                     "time_window_sec": time_window,
+                    "time_windows_sec": time_windows,
+                    "satellite_windows_sec": satellite_windows,
                 }
             )
 
@@ -98,28 +164,74 @@ def convert_to_solver_input(enriched_locations, satellites: list[Satellite]):
                         loc.get("priority", 3),
                         loc.get("area_size_km2", 1.0),
                         time_window,
+                        time_windows,
+                        satellite_windows,
                     )
                 )
             )
 
+    if output_path is None:
+        return solver_requests
+
     # Save the solver requests to a YAML file
 
     # Create a directory for outputs if it doesn't exist
-    output_dir = "output"
-    os.makedirs(output_dir, exist_ok=True)
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
 
     # Save to YAML file
-    yaml_file_path = os.path.join(output_dir, "solver_input.yaml")
-    with open(yaml_file_path, "w") as yaml_file:
+    with open(output_path, "w") as yaml_file:
         yaml.dump(solver_requests_yaml, yaml_file, default_flow_style=False)
 
-    print(f"Solver input saved to {yaml_file_path}")
+    print(f"Solver input saved to {output_path}")
     return solver_requests
 
 
-def run_satellite_scheduler(enriched_locations, satellite:Satellite):
+def load_solver_input(path) -> list[dict]:
     """
-    Run the satellite scheduler with the enriched location data.
+    Read the request entries of a solver input file written by
+    convert_to_solver_input (the windows are dumped as Python tuples).
+    """
+    with open(path) as yaml_file:
+        return yaml.load(yaml_file, Loader=yaml.FullLoader) or []
+
+
+def requests_from_solver_input(entries: list[dict]) -> list[Request]:
+    """
+    Requests of the entries of a solver input file; only location, coordinates
+    and one of time_window_sec or time_windows_sec are required.
+    """
+    solver_requests = []
+    for entry in entries:
+        time_windows = entry.get("time_windows_sec")
+        time_window = entry.get("time_window_sec")
+        if time_window is None:
+            if not time_windows:
+                raise ValueError(f"Request '{entry['location']}' has no time window")
+            time_window = (time_windows[0][0], time_windows[-1][1])
+        solver_requests.append(
+            Request(
+                RequestConfig(
+                    entry["location"],
+                    tuple(entry["coordinates"]),
+                    entry.get("priority", 3),
+                    entry.get("area_size_km2", 1.0),
+                    tuple(time_window),
+                    time_windows,
+                    entry.get("satellite_windows_sec"),
+                )
+            )
+        )
+    return solver_requests
+
+
+def run_satellite_scheduler(
+    enriched_locations, satellite: Satellite, ground_stations: list[GroundStation] = None
+):
+    """
+    Run the satellite scheduler with the enriched location data. With ground
+    stations, the memory is emptied during the passes over them.
     Returns the scheduled observations.
     """
 
@@ -129,12 +241,149 @@ def run_satellite_scheduler(enriched_locations, satellite:Satellite):
     if not solver_requests:
         return {"observations": [], "error": "No valid locations with GPS coordinates"}
 
+    # Passes over the ground stations, over the same 24 hours as the capture windows
+    satellite_downlinks = (
+        downlink_windows(satellite, ground_stations, 0, 86400) if ground_stations else None
+    )
+
     # Run the solver
-    scheduler = SatelliteScheduler(satellite, solver_requests)
+    scheduler = SatelliteScheduler(
+        satellite,
+        solver_requests,
+        formulation="interval",
+        downlink_windows=satellite_downlinks,
+    )
     status, results = scheduler.solve()
     scheduler.print_solution(status, results)
 
-    # Format results
+    formatted_results = format_scheduler_results(status, results)
+    formatted_results["memory_capacity_gb"] = satellite.memory_capacity_gb
+    if satellite_downlinks:
+        formatted_results.update(
+            downlink_summary(
+                [r for r in results if r.get("selected")], satellite_downlinks
+            )
+        )
+    save_scheduler_results(formatted_results)
+    return formatted_results
+
+
+def run_constellation_scheduler(
+    enriched_locations,
+    satellites: list[Satellite],
+    ground_stations: list[GroundStation] = None,
+    time_limit=60,
+):
+    """
+    Run the constellation scheduler with the enriched location data: each
+    location is captured by at most one of the satellites. With ground
+    stations, the memory of each satellite is emptied during its passes over them.
+    The joint model can take long to prove optimal, so the solver stops after
+    `time_limit` seconds with the best plan found.
+    Returns the scheduled observations.
+    """
+    solver_requests = convert_to_solver_input(
+        enriched_locations, satellites, per_satellite=True
+    )
+
+    if not solver_requests:
+        return {"observations": [], "error": "No valid locations with GPS coordinates"}
+
+    satellite_downlinks = [
+        downlink_windows(satellite, ground_stations, 0, 86400) if ground_stations else []
+        for satellite in satellites
+    ]
+
+    # Run the solver
+    scheduler = ConstellationScheduler(
+        satellites, solver_requests, downlink_windows=satellite_downlinks
+    )
+    status, results = scheduler.solve(time_limit=time_limit)
+    scheduler.print_solution(status, results)
+
+    formatted_results = format_scheduler_results(status, results)
+    formatted_results["satellites"] = []
+    for sat_idx, satellite in enumerate(satellites):
+        captures = [r for r in results if r["selected"] and r["satellite"] == sat_idx]
+        satellite_results = {
+            "satellite": sat_idx,
+            "memory_used_gb": sum(r["memory_used"] for r in captures),
+            "memory_capacity_gb": satellite.memory_capacity_gb,
+        }
+        if satellite_downlinks[sat_idx]:
+            satellite_results.update(
+                downlink_summary(captures, satellite_downlinks[sat_idx])
+            )
+        formatted_results["satellites"].append(satellite_results)
+    save_scheduler_results(formatted_results)
+    return formatted_results
+
+
+def run_rolling_horizon_planner(
+    enriched_locations, planner: RollingHorizonPlanner, now=None
+):
+    """
+    Add the enriched locations to the live plan of `planner` instead of solving
+    them on their own: the clock first moves to `now` (seconds), committing the
+    captures that are about to start, then only the open horizon is re-planned.
+    Returns the scheduled observations of the whole plan.
+    """
+    if now is not None and now > planner.now:
+        planner.advance(now)
+
+    solver_requests = convert_to_solver_input(enriched_locations, [planner.satellite])
+
+    if not solver_requests:
+        return {"observations": [], "error": "No valid locations with GPS coordinates"}
+
+    status, results = planner.insert(solver_requests)
+    return format_planner_results(planner, status, results)
+
+
+def advance_rolling_horizon_planner(planner: RollingHorizonPlanner, now):
+    """
+    Move the clock of `planner` to `now` (seconds) without new requests: the
+    captures about to start are committed and the pending requests that the
+    horizon now reaches are planned. Returns the scheduled observations of the
+    whole plan.
+    """
+    status, results = planner.advance(max(now, planner.now))
+    return format_planner_results(planner, status, results)
+
+
+def format_planner_results(planner: RollingHorizonPlanner, status, results):
+    """
+    format_scheduler_results of a live plan, with the committed and pending
+    locations, saved like the other scheduler results.
+    """
+    formatted_results = format_scheduler_results(status, results)
+    formatted_results["memory_capacity_gb"] = planner.satellite.memory_capacity_gb
+    formatted_results["committed"] = [r["location"] for r in planner.committed]
+    formatted_results["pending"] = [r["location"] for r in results if r.get("pending")]
+    save_scheduler_results(formatted_results)
+    return formatted_results
+
+
+def downlink_summary(captures, satellite_downlinks):
+    """
+    Downlink windows, data sent and peak memory of the selected captures of
+    one satellite, for the YAML output.
+    """
+    profile, sent = memory_profile(captures, satellite_downlinks)
+    return {
+        "downlink_windows": [
+            {"start_time": start, "end_time": end, "capacity_gb": capacity}
+            for start, end, capacity in satellite_downlinks
+        ],
+        "downlinked_gb": sent,
+        "peak_memory_used_gb": max((on_board for _, on_board in profile), default=0),
+    }
+
+
+def format_scheduler_results(status, results):
+    """
+    Format the results of a scheduler for the LLM summary and the YAML output.
+    """
     formatted_results = {
         "observations": [],
         "status": (
@@ -152,6 +401,9 @@ def run_satellite_scheduler(enriched_locations, satellite:Satellite):
             "priority": r["priority"],
             "success": r.get("selected", False),
         }
+        if r.get("pending"):
+            # Not planned yet, only because its windows are beyond the planner horizon
+            result_entry["pending"] = True
 
         if r.get("selected", False):
             result_entry.update(
@@ -162,13 +414,20 @@ def run_satellite_scheduler(enriched_locations, satellite:Satellite):
                     "memory_used_gb": r["memory_used"],
                 }
             )
+            if "satellite" in r:
+                result_entry["satellite"] = r["satellite"]
             total_memory += r["memory_used"]
 
         formatted_results["observations"].append(result_entry)
 
     formatted_results["total_memory_used_gb"] = total_memory
-    formatted_results["memory_capacity_gb"] = satellite.memory_capacity_gb
-    # Save the formatted results to a YAML file
+    return formatted_results
+
+
+def save_scheduler_results(formatted_results):
+    """
+    Save the formatted results to output/scheduler_results.yaml.
+    """
     output_dir = "output"
     os.makedirs(output_dir, exist_ok=True)
 
@@ -177,4 +436,3 @@ def run_satellite_scheduler(enriched_locations, satellite:Satellite):
         yaml.dump(formatted_results, yaml_file, default_flow_style=False)
 
     print(f"Scheduler results saved to {yaml_file_path}")
-    return formatted_results
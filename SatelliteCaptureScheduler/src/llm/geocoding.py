@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+
+# Common cities and landmarks, resolved without any network access
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.json")
+
+
+def normalize_location(location: str) -> str:
+    """
+    Lookup key of a location name: "New-York", " new  york" and "NEW YORK"
+    share a key, and so do "Genève" and "Geneve".
+    """
+    decomposed = unicodedata.normalize("NFKD", location)
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(without_accents.casefold().replace("-", " ").split())
+
+
+class RateLimiter:
+    """
+    Spaces the calls of wait() at least `min_interval` seconds apart, across threads.
+    """
+
+    def __init__(self, min_interval: float) -> None:
+        self.min_interval = min_interval
+        self.__lock = threading.Lock()
+        self.__next_call = 0.0
+
+    def wait(self) -> None:
+        with self.__lock:
+            now = time.monotonic()
+            delay = self.__next_call - now
+            self.__next_call = max(now, self.__next_call) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Geocoder:
+    """
+    GPS coordinates of location names, looked up in this order:
+
+    1. the persistent cache, for the names looked up less than `ttl_sec` ago
+       (`negative_ttl_sec` for the names Nominatim did not find);
+    2. the offline gazetteer of common cities;
+    3. the Nominatim API, at most one request every `min_interval_sec` seconds
+       (the Nominatim usage policy) but with up to `max_workers` requests in
+       flight, so their latencies overlap;
+    4. an expired cache entry, when the network lookup fails.
+
+    Network failures are not cached, so the next lookup tries again.
+    """
+
+    def __init__(
+        self,
+        cache_path=os.path.join("output", "geocode_cache.json"),
+        ttl_sec=30 * 86400,
+        negative_ttl_sec=86400,
+        gazetteer_path=GAZETTEER_PATH,
+        min_interval_sec=1.0,
+        max_workers=4,
+        timeout_sec=10,
+        url=NOMINATIM_URL,
+    ) -> None:
+
+        self.cache_path = cache_path
+        self.ttl_sec = ttl_sec
+        self.negative_ttl_sec = negative_ttl_sec
+        self.max_workers = max_workers
+        self.timeout_sec = timeout_sec
+        self.url = url
+        self.rate_limiter = RateLimiter(min_interval_sec)
+        self.stats = {"cache": 0, "gazetteer": 0, "network": 0, "stale": 0, "failed": 0}
+
+        self.__lock = threading.Lock()
+        self.__session = requests.Session()
+        self.__session.headers["User-Agent"] = "satellite-scheduler"
+
+        self.__gazetteer = {}
+        if gazetteer_path and os.path.exists(gazetteer_path):
+            with open(gazetteer_path, encoding="utf-8") as f:
+                self.__gazetteer = {
+                    normalize_location(name): tuple(coordinates)
+                    for name, coordinates in json.load(f).items()
+                }
+
+        # key -> {"coordinates": [lat, lon] or None, "time": epoch seconds}
+        self.__cache = {}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, encoding="utf-8") as f:
+                    self.__cache = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: ignoring the geocode cache {cache_path}: {e}")
+
+    def lookup(self, location: str) -> tuple[float] | None:
+        """
+        (latitude, longitude) of `location`, or None if it cannot be found.
+        """
+        return self.lookup_many([location])[location]
+
+    def lookup_many(self, locations: list[str]) -> dict:
+        """
+        Coordinates of every location, by location name. The names missing from
+        the cache and the gazetteer are looked up concurrently, once each.
+        """
+        found = {}
+        missing = {}  # key -> names
+        now = time.time()
+        for location in locations:
+            key = normalize_location(location)
+            entry = self.__cache.get(key)
+            if entry is not None and now - entry["time"] < self.__ttl(entry):
+                self.stats["cache"] += 1
+                found[location] = _coordinates(entry)
+            elif key in self.__gazetteer:
+                self.stats["gazetteer"] += 1
+                found[location] = self.__gazetteer[key]
+            else:
+                missing.setdefault(key, []).append(location)
+
+        if missing:
+            names = [names[0] for names in missing.values()]
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(names))) as pool:
+                results = list(pool.map(self.__search, names))
+
+            for (key, same_key), (ok, coordinates) in zip(missing.items(), results):
+                if ok:
+                    self.stats["network"] += 1
+                    self.__cache[key] = {
+                        "coordinates": list(coordinates) if coordinates else None,
+                        "time": time.time(),
+                    }
+                elif key in self.__cache:
+                    self.stats["stale"] += 1
+                    coordinates = _coordinates(self.__cache[key])
+                else:
+                    self.stats["failed"] += 1
+                for location in same_key:
+                    found[location] = coordinates
+            self.__save()
+
+        return found
+
+    def __ttl(self, entry) -> float:
+        return self.ttl_sec if entry["coordinates"] is not None else self.negative_ttl_sec
+
+    def __search(self, location: str) -> tuple[bool, tuple[float] | None]:
+        """
+        Nominatim lookup of one location: (True, coordinates or None if not
+        found), or (False, None) if the request failed.
+        """
+        self.rate_limiter.wait()
+        try:
+            response = self.__session.get(
+                self.url,
+                params={"q": location, "format": "json", "limit": 1},
+                timeout=self.timeout_sec,
+            )
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            print(f"Error getting GPS coordinates for {location}: {str(e)}")
+            return False, None
+        if not data:
+            print(f"Warning: Could not find coordinates for location: {location}")
+            return True, None
+        return True, (float(data[0]["lat"]), float(data[0]["lon"]))
+
+    def __save(self) -> None:
+        """
+        Write the cache next to its path, then move it in place, so a reader
+        never sees a partial file.
+        """
+        if not self.cache_path:
+            return
+        with self.__lock:
+            directory = os.path.dirname(self.cache_path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self.__cache, f, ensure_ascii=False)
+                os.replace(tmp_path, self.cache_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+
+def _coordinates(entry) -> tuple[float] | None:
+    return tuple(entry["coordinates"]) if entry["coordinates"] is not None else None
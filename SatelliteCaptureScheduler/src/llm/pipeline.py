@@ -2,14 +2,20 @@ import codecs
 import json
 import os
 import sys
+import time
 import click
-import requests
 import yaml
 from dotenv import load_dotenv
 from openai import OpenAI
 
 from core.satellite import Satellite, SatelliteConfig
-from integration.scheduler_interface import run_satellite_scheduler
+from integration.scheduler_interface import (
+    advance_rolling_horizon_planner,
+    run_rolling_horizon_planner,
+    run_satellite_scheduler,
+)
+from solver.rolling_horizon import RollingHorizonPlanner
+from llm.geocoding import Geocoder
 
 if sys.stdout.encoding != "utf-8":
     sys.stdout = codecs.getwriter("utf-8")(sys.stdout.buffer, "strict")
@@ -32,21 +38,14 @@ if missing_vars:
 llm = OpenAI(base_url=base_url, api_key=api_key)
 
 
+# Persistent across sessions in output/geocode_cache.json; common cities need no network
+geocoder = Geocoder()
+
+
 def get_gps_coordinates(location):
-    """Get GPS coordinates for a location using OpenStreetMap Nominatim API."""
-    try:
-        url = f"https://nominatim.openstreetmap.org/search?q={location}&format=json"
-        response = requests.get(url, headers={"User-Agent": "satellite-scheduler"})
-        response.raise_for_status()  # Raise exception for bad responses
-        data = response.json()
-        if data:
-            return float(data[0]["lat"]), float(data[0]["lon"])
-        else:
-            print(f"Warning: Could not find coordinates for location: {location}")
-            return None
-    except Exception as e:
-        print(f"Error getting GPS coordinates for {location}: {str(e)}")
-        return None
+    """Get GPS coordinates for a location, from the geocode cache, the offline
+    gazetteer or the OpenStreetMap Nominatim API."""
+    return geocoder.lookup(location)
 
 
 def parse_user_request(user_text):
@@ -97,6 +96,9 @@ def parse_user_request(user_text):
 
 def generate_solver_input(locations):
     """Generate input for the solver by adding GPS coordinates to locations."""
+    # One lookup for all the locations, the unknown ones in parallel
+    coordinates = geocoder.lookup_many([loc["location"] for loc in locations])
+
     enriched_locations = []
     for loc in locations:
         if "priority" not in loc:
@@ -104,7 +106,7 @@ def generate_solver_input(locations):
         if "area_size_km2" not in loc:
             loc["area_size_km2"] = 20.0  # Default area size
 
-        gps_coordinates = get_gps_coordinates(loc["location"])
+        gps_coordinates = coordinates[loc["location"]]
         loc_with_coords = loc.copy()
         loc_with_coords["gps_coordinates"] = (
             {"latitude": gps_coordinates[0], "longitude": gps_coordinates[1]}
@@ -117,31 +119,39 @@ def generate_solver_input(locations):
     return {"locations": enriched_locations}
 
 
-def simulate_solver(input_data):
-    """Run the real satellite observation scheduling solver."""
-    try:
-
-        satellite = Satellite(
-                SatelliteConfig(
-                MU=398600.4418,
-                A=7000,
-                EC=0.01,
-                IC=45,
-                OMEGA=60,
-                W=30,
-                R=6371,
-                NUM_FRAMES=1000,
-                memory_capacity_gb=10,
-                image_size_per_km2_gb=0.15,
-                image_duration_per_km2_sec=3.5,
-                max_photo_duration_s=120,
-                recalibration_time_s=30,
-                speed_kms_per_s=50,
-            )
+def demo_satellite():
+    """The satellite the CLI plans for."""
+    return Satellite(
+        SatelliteConfig(
+            MU=398600.4418,
+            A=7000,
+            EC=0.01,
+            IC=45,
+            OMEGA=60,
+            W=30,
+            R=6371,
+            NUM_FRAMES=1000,
+            memory_capacity_gb=10,
+            image_size_per_km2_gb=0.15,
+            image_duration_per_km2_sec=3.5,
+            max_photo_duration_s=120,
+            recalibration_time_s=30,
+            speed_kms_per_s=50,
         )
+    )
+
+
+def simulate_solver(input_data, planner=None, now=None):
+    """Run the real satellite observation scheduling solver.
+
+    With a RollingHorizonPlanner, the requests are added to its live plan at
+    time `now` instead of being scheduled on their own."""
+    try:
+        if planner is not None:
+            return run_rolling_horizon_planner(input_data["locations"], planner, now)
 
         # Use our new integrated solver
-        return run_satellite_scheduler(input_data["locations"], satellite)
+        return run_satellite_scheduler(input_data["locations"], demo_satellite())
     except Exception as e:
         print(f"Error in solver: {str(e)}")
         # Fallback to simple simulation
@@ -254,6 +264,13 @@ def cli():
 
     conversation_history = []
 
+    # Requests of the whole session share one live plan; the plan clock runs
+    # in seconds since the CLI started. Each re-plan only covers the bounded
+    # look-ahead: later requests are reported as pending, and get planned as
+    # the clock advances (on each new request or status check).
+    planner = RollingHorizonPlanner(demo_satellite())
+    session_start = time.monotonic()
+
     while True:
         click.echo("\n" + "=" * 50)
         click.secho("[1] Enter a new observation request or ask a question", fg="cyan")
@@ -292,7 +309,11 @@ def cli():
                         continue
 
                     solver_input = generate_solver_input(parsed_data["requests"])
-                    solver_output = simulate_solver(solver_input)
+                    solver_output = simulate_solver(
+                        solver_input,
+                        planner,
+                        now=int(time.monotonic() - session_start),
+                    )
 
                     summary = describe_solver_output(solver_output)
 
@@ -349,12 +370,36 @@ def cli():
                     )
 
             elif intent == "status_check":
-                status_msg = "\nStatus Check: This functionality is not yet fully implemented. In the future, you'll be able to check the status of your scheduled observations."
-                click.secho(status_msg, fg="yellow")
+                try:
+                    # Re-plan at the current time, so the pending requests the
+                    # horizon now reaches get scheduled
+                    solver_output = advance_rolling_horizon_planner(
+                        planner, int(time.monotonic() - session_start)
+                    )
+                    summary = describe_solver_output(solver_output)
 
-                conversation_history.append(
-                    {"role": "assistant", "content": status_msg}
-                )
+                    click.secho("\n📊 Scheduled Observations:", fg="green", bold=True)
+                    click.echo(
+                        yaml.dump(
+                            solver_output,
+                            default_flow_style=False,
+                            allow_unicode=True,
+                        )
+                    )
+
+                    click.secho("\n📝 Summary:", fg="green", bold=True)
+                    click.echo(summary)
+
+                    conversation_history.append(
+                        {"role": "assistant", "content": summary}
+                    )
+
+                except Exception as e:
+                    error_msg = f"\nError checking the observation status: {str(e)}"
+                    click.secho(error_msg, fg="red")
+                    conversation_history.append(
+                        {"role": "assistant", "content": error_msg}
+                    )
 
             else:
                 try:
@@ -0,0 +1,272 @@
+import os
+import csv
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import fields
+from itertools import product
+
+import yaml
+
+from core.satellite import Satellite, SatelliteConfig
+from integration.scheduler_interface import (
+    convert_to_solver_input,
+    load_solver_input,
+    requests_from_solver_input,
+)
+from solver.scheduler import SatelliteScheduler
+from visualization.visibility_cache import ORBIT_FIELDS
+
+# Satellite of the sample demo; the satellites of a study override some of its fields.
+# The windows of the request sets are those of its orbit
+DEFAULT_SATELLITE = {
+    "MU": 398600.4418,
+    "A": 7000,
+    "EC": 0.01,
+    "IC": 45,
+    "OMEGA": 60,
+    "W": 30,
+    "R": 6371,
+    "NUM_FRAMES": 1000,
+    "memory_capacity_gb": 10,
+    "image_size_per_km2_gb": 0.15,
+    "image_duration_per_km2_sec": 3.5,
+    "max_photo_duration_s": 120,
+    "recalibration_time_s": 30,
+    "speed_kms_per_s": 50,
+}
+
+# Columns of the two output files, one row per scenario and one per request of each scenario
+STATS_FIELDS = [
+    "scenario",
+    "request_set",
+    "satellite",
+    "formulation",
+    "time_limit",
+    "num_requests",
+    "num_variables",
+    "num_constraints",
+    "build_time",
+    "solve_time",
+    "total_time",
+    "status",
+    "objective",
+    "best_bound",
+    "selected",
+    "memory_used",
+    "error",
+]
+RESULT_FIELDS = [
+    "scenario",
+    "location",
+    "priority",
+    "selected",
+    "start_time",
+    "end_time",
+    "duration",
+    "travel_time",
+    "memory_used",
+]
+
+
+def load_study(path) -> list[dict]:
+    """
+    Scenarios of a study file:
+
+        time_limit: 30              # defaults of every scenario
+        formulation: interval
+        satellites:                 # SatelliteConfig fields over DEFAULT_SATELLITE
+          demo: {}
+          small_memory: {memory_capacity_gb: 2}
+        request_sets:               # solver input files, as written by
+          paris: paris.yaml         # convert_to_solver_input, or inline entries
+          inline:
+            - {location: Lyon, coordinates: [45.76, 4.83], time_window_sec: [0, 86400]}
+        scenarios:                  # every request set with every satellite by default
+          - {request_set: paris, satellite: small_memory, time_limit: 10}
+
+    Paths are relative to the study file. Returns one dict per scenario, with
+    the satellite config and the request entries it uses. The windows of the
+    request sets are taken to be those of the DEFAULT_SATELLITE orbit; a
+    satellite that overrides orbit fields gets them recomputed in
+    solve_scenario.
+    """
+    with open(path) as study_file:
+        study = yaml.load(study_file, Loader=yaml.FullLoader) or {}
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    config_fields = {field.name for field in fields(SatelliteConfig)}
+    satellites = {}
+    for name, overrides in (study.get("satellites") or {"demo": {}}).items():
+        unknown = set(overrides or {}) - config_fields
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)} for satellite '{name}'")
+        satellites[name] = {**DEFAULT_SATELLITE, **(overrides or {})}
+
+    request_sets = {}
+    for name, entries in (study.get("request_sets") or {}).items():
+        if isinstance(entries, str):
+            entries = load_solver_input(os.path.join(base_dir, entries))
+        request_sets[name] = entries
+    if not request_sets:
+        raise ValueError(f"No request set in '{path}'")
+
+    scenarios = study.get("scenarios") or [
+        {"request_set": request_set, "satellite": satellite}
+        for request_set, satellite in product(request_sets, satellites)
+    ]
+
+    resolved = []
+    for scenario in scenarios:
+        request_set = scenario["request_set"]
+        satellite = scenario.get("satellite", next(iter(satellites)))
+        if request_set not in request_sets:
+            raise ValueError(f"Unknown request set '{request_set}'")
+        if satellite not in satellites:
+            raise ValueError(f"Unknown satellite '{satellite}'")
+
+        formulation = scenario.get("formulation", study.get("formulation", "interval"))
+        if formulation not in SatelliteScheduler.FORMULATIONS:
+            raise ValueError(
+                f"Unknown formulation '{formulation}', expected one of {SatelliteScheduler.FORMULATIONS}"
+            )
+
+        resolved.append(
+            {
+                "scenario": scenario.get("name", f"{request_set}-{satellite}"),
+                "request_set": request_set,
+                "satellite": satellite,
+                "formulation": formulation,
+                "time_limit": scenario.get("time_limit", study.get("time_limit", 60)),
+                "satellite_config": satellites[satellite],
+                "requests": request_sets[request_set],
+            }
+        )
+
+    names = [scenario["scenario"] for scenario in resolved]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate scenario names {duplicates}")
+    return resolved
+
+
+def has_default_orbit(satellite_config: dict) -> bool:
+    """Whether the windows of the request sets hold for this satellite."""
+    return all(satellite_config[field] == DEFAULT_SATELLITE[field] for field in ORBIT_FIELDS)
+
+
+def recompute_windows(entries: list[dict], satellite: Satellite) -> list:
+    """
+    Requests of the entries of a solver input file with the windows of
+    `satellite`, computed from their coordinates (or read back from the
+    visibility cache) instead of the windows of the file.
+    """
+    enriched_locations = [
+        {
+            "location": entry["location"],
+            "gps_coordinates": {
+                "latitude": entry["coordinates"][0],
+                "longitude": entry["coordinates"][1],
+            },
+            "priority": entry.get("priority", 3),
+            "area_size_km2": entry.get("area_size_km2", 1.0),
+        }
+        for entry in entries
+    ]
+    return convert_to_solver_input(enriched_locations, [satellite], output_path=None)
+
+
+def solve_scenario(scenario: dict, num_workers=None) -> tuple[dict, list[dict]]:
+    """
+    Solve one scenario of load_study. Returns its stats row and one result row
+    per request; a scenario that fails gets the status ERROR and no results.
+    """
+    stats = {
+        field: scenario[field]
+        for field in ("scenario", "request_set", "satellite", "formulation", "time_limit")
+    }
+    start = time.perf_counter()
+    try:
+        satellite = Satellite(SatelliteConfig(**scenario["satellite_config"]))
+        if has_default_orbit(scenario["satellite_config"]):
+            requests = requests_from_solver_input(scenario["requests"])
+        else:
+            requests = recompute_windows(scenario["requests"], satellite)
+        scheduler = SatelliteScheduler(satellite, requests, formulation=scenario["formulation"])
+        _, results = scheduler.solve(
+            time_limit=scenario["time_limit"], num_workers=num_workers
+        )
+    except Exception as e:
+        stats.update(
+            total_time=time.perf_counter() - start,
+            status="ERROR",
+            error=f"{type(e).__name__}: {e}",
+        )
+        return stats, []
+
+    selected = [r for r in results if r.get("selected")]
+    stats.update(scheduler.last_solve_stats)
+    stats.update(
+        total_time=time.perf_counter() - start,
+        selected=len(selected),
+        memory_used=sum(r["memory_used"] for r in selected),
+    )
+    rows = [
+        {"scenario": scenario["scenario"], **{field: r.get(field) for field in RESULT_FIELDS[1:]}}
+        for r in results
+    ]
+    return stats, rows
+
+
+def run_study(path, output_dir=os.path.join("output", "batch"), workers=None) -> list[dict]:
+    """
+    Solve the scenarios of a study file across `workers` processes (one per
+    core by default), and write output_dir/stats.csv and output_dir/results.csv
+    as the scenarios finish, so an interrupted study keeps its finished rows.
+
+    Returns the stats rows, in the order of the scenarios.
+    """
+    scenarios = load_study(path)
+    cores = os.cpu_count() or 1
+    workers = workers or cores
+    # CP-SAT threads of each solve, so the parallel solves share the cores
+    num_workers = max(1, cores // workers)
+
+    os.makedirs(output_dir, exist_ok=True)
+    stats_path = os.path.join(output_dir, "stats.csv")
+    results_path = os.path.join(output_dir, "results.csv")
+
+    stats_rows = {}
+    with open(stats_path, "w", newline="") as stats_file, open(
+        results_path, "w", newline=""
+    ) as results_file:
+        stats_writer = csv.DictWriter(stats_file, STATS_FIELDS, extrasaction="ignore")
+        results_writer = csv.DictWriter(results_file, RESULT_FIELDS)
+        stats_writer.writeheader()
+        results_writer.writeheader()
+
+        def record(stats, rows):
+            stats_writer.writerow(stats)
+            results_writer.writerows(rows)
+            stats_file.flush()
+            results_file.flush()
+            stats_rows[stats["scenario"]] = stats
+            print(
+                f"[{len(stats_rows)}/{len(scenarios)}] {stats['scenario']:<30} "
+                f"{stats['status']:<9} objective {stats.get('objective')}  "
+                f"selected {stats.get('selected')}  total {stats['total_time']:6.2f}s",
+                flush=True,
+            )
+
+        if workers == 1:
+            for scenario in scenarios:
+                record(*solve_scenario(scenario, num_workers))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(solve_scenario, scenario, num_workers) for scenario in scenarios
+                ]
+                for future in as_completed(futures):
+                    record(*future.result())
+
+    print(f"Stats saved to {stats_path}, results saved to {results_path}")
+    return [stats_rows[scenario["scenario"]] for scenario in scenarios]
@@ -0,0 +1,174 @@
+import time
+
+import numpy as np
+
+from core.satellite import Satellite, SatelliteConfig
+from core.request import Request, RequestConfig
+from core.imaging_task import ImagingTask
+from visualization.visibility import all_availability
+from integration.scheduler_interface import merge_windows
+from solver.scheduler import SatelliteScheduler
+
+EARTH_RADIUS = 6378
+
+# Request hotspots (latitude, longitude): requests cluster around big cities and
+# compete for the same passes, as in real acquisition plans
+HOTSPOTS = [
+    (48.8, 2.3),
+    (40.7, -74.0),
+    (35.7, 139.7),
+    (-23.5, -46.6),
+    (28.6, 77.2),
+    (30.0, 31.2),
+    (-33.9, 151.2),
+    (51.5, -0.1),
+]
+
+
+def benchmark_satellite(memory_capacity_gb=100):
+    """
+    The satellite of the sample demo, with room for many captures.
+    """
+    return Satellite(
+        SatelliteConfig(
+            MU=398600.4418,
+            A=7000,
+            EC=0.01,
+            IC=45,
+            OMEGA=60,
+            W=30,
+            R=6371,
+            NUM_FRAMES=1000,
+            memory_capacity_gb=memory_capacity_gb,
+            image_size_per_km2_gb=0.15,
+            image_duration_per_km2_sec=3.5,
+            max_photo_duration_s=120,
+            recalibration_time_s=30,
+            speed_kms_per_s=50,
+        )
+    )
+
+
+def generate_requests(
+    num_requests, satellites, seed=0, horizon=86400, per_satellite=False
+):
+    """
+    Random requests around HOTSPOTS, with the visibility windows of `satellites`
+    over `horizon` seconds as capture windows. With per_satellite, the windows of
+    each satellite are also kept separately, for the ConstellationScheduler.
+    """
+    rng = np.random.default_rng(seed)
+    hubs = rng.integers(len(HOTSPOTS), size=num_requests)
+    latitudes = np.clip(
+        [HOTSPOTS[h][0] for h in hubs] + rng.normal(0, 4, num_requests), -70, 70
+    )
+    longitudes = np.array([HOTSPOTS[h][1] for h in hubs]) + rng.normal(
+        0, 6, num_requests
+    )
+
+    lat_rad, lon_rad = np.radians(latitudes), np.radians(longitudes)
+    points = np.column_stack(
+        [
+            EARTH_RADIUS * np.cos(lat_rad) * np.cos(lon_rad),
+            EARTH_RADIUS * np.cos(lat_rad) * np.sin(lon_rad),
+            EARTH_RADIUS * np.sin(lat_rad),
+        ]
+    )
+    labels = [f"Request-{k}" for k in range(num_requests)]
+    tasks = ImagingTask(labels=labels, radius=EARTH_RADIUS, points=list(points))
+    satellite_availability = [
+        all_availability(
+            0,
+            horizon,
+            [satellite],
+            tasks,
+            min_elevation_angle=15,
+            time_step=120,
+            engine="adaptive",
+        )
+        for satellite in satellites
+    ]
+
+    requests = []
+    for k, label in enumerate(labels):
+        satellite_windows = {
+            sat_idx: merge_windows(availability[label])
+            for sat_idx, availability in enumerate(satellite_availability)
+            if label in availability
+        }
+        windows = merge_windows(
+            [window for sat_windows in satellite_windows.values() for window in sat_windows]
+        )
+        span = (windows[0][0], windows[-1][1]) if windows else (0, horizon)
+        requests.append(
+            Request(
+                RequestConfig(
+                    label,
+                    (float(latitudes[k]), float(longitudes[k])),
+                    int(rng.integers(1, 6)),
+                    float(rng.uniform(2, 30)),
+                    span,
+                    windows or None,
+                    satellite_windows if per_satellite else None,
+                )
+            )
+        )
+    return requests
+
+
+def count_violations(satellite, requests, results):
+    """
+    Number of pairs of selected captures closer than capture + recalibration + travel.
+    """
+    by_location = {req.location: req for req in requests}
+    selected = sorted(
+        (r for r in results if r.get("selected")), key=lambda r: r["start_time"]
+    )
+    violations = 0
+    for a, first in enumerate(selected):
+        for second in selected[a + 1 :]:
+            travel = satellite.calculate_distance(
+                by_location[first["location"]].coordinates,
+                by_location[second["location"]].coordinates,
+            )
+            if second["start_time"] < (
+                first["start_time"]
+                + first["duration"]
+                + satellite.recalibration_time_s
+                + travel
+            ):
+                violations += 1
+    return violations
+
+
+def run_benchmark(sizes, formulations, time_limit=60, seed=0):
+    """
+    Solve the same generated requests with each formulation and print a table of
+    model size, build and solve times, objective and bound.
+
+    Returns the rows as a list of dicts.
+    """
+    satellite = benchmark_satellite()
+    rows = []
+    for num_requests in sizes:
+        requests = generate_requests(num_requests, [satellite], seed=seed)
+        for formulation in formulations:
+            scheduler = SatelliteScheduler(satellite, requests, formulation=formulation)
+            start = time.perf_counter()
+            _, results = scheduler.solve(time_limit=time_limit)
+            total_time = time.perf_counter() - start
+
+            row = dict(scheduler.last_solve_stats)
+            row["total_time"] = total_time
+            row["selected"] = sum(1 for r in results if r.get("selected"))
+            row["violations"] = count_violations(satellite, requests, results)
+            rows.append(row)
+            print(
+                f"{num_requests:>5} requests  {formulation:<8}  "
+                f"{row['num_variables']:>7} vars  {row['num_constraints']:>8} constraints  "
+                f"build {row['build_time']:6.2f}s  solve {row['solve_time']:6.2f}s  "
+                f"{row['status']:<9} objective {row['objective']}  bound {row['best_bound']}  "
+                f"selected {row['selected']}  violations {row['violations']}",
+                flush=True,
+            )
+    return rows
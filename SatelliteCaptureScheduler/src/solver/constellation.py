@@ -0,0 +1,317 @@
+import time
+
+from ortools.sat.python import cp_model
+
+from core.satellite import Satellite
+from core.request import Request
+from solver.scheduler import (
+    add_interval_sequencing,
+    add_memory_profile,
+    feasible_starts,
+    memory_profile,
+)
+from solver.transitions import transition_matrix
+
+
+class ConstellationScheduler:
+    """
+    Joint schedule of several satellites: each request is captured by at most one
+    of them, in one of that satellite's own visibility windows (see
+    Request.windows_for). Every satellite keeps its own capture durations,
+    recalibration time, travel speed and memory capacity, and its captures are
+    sequenced with the interval model of SatelliteScheduler.
+    """
+
+    def __init__(
+        self,
+        satellites: list[Satellite],
+        requests: list[Request],
+        downlink_windows=None,
+    ) -> None:
+        """
+        downlink_windows[s] are the (start, end, capacity_gb) passes of satellite
+        s over ground stations, during which its memory is emptied (see
+        SatelliteScheduler).
+        """
+        self.__satellites = satellites
+        self.__requests = requests
+        self.__downlink_windows = [
+            sorted(windows or [])
+            for windows in (downlink_windows or [None] * len(satellites))
+        ]
+        self.__model = cp_model.CpModel()
+        self.__solver = cp_model.CpSolver()
+        self.last_solve_stats = None
+
+    def solve(self, time_limit=None) -> tuple[int, list[dict]]:
+
+        build_start = time.perf_counter()
+        n = len(self.__requests)
+
+        # assigned[s][i] / start_times[s][i] exist when request i fits in a window of satellite s
+        capture_durations = []
+        mem_usages = []
+        assigned = []
+        start_times = []
+
+        # Travel times of each satellite between all the requests, computed once
+        coordinates = [req.coordinates for req in self.__requests]
+        transitions = [
+            transition_matrix(satellite, coordinates) for satellite in self.__satellites
+        ]
+
+        for s, satellite in enumerate(self.__satellites):
+            durations = [
+                int(satellite.calculate_capture_duration(req.area_size_km2))
+                for req in self.__requests
+            ]
+            capture_durations.append(durations)
+            mem_usages.append(
+                [satellite.calculate_memory_usage(req.area_size_km2) for req in self.__requests]
+            )
+
+            sat_assigned = {}
+            sat_starts = {}
+            sat_feasible = {}
+            for i, req in enumerate(self.__requests):
+                starts = feasible_starts(req.windows_for(s), durations[i])
+                if not starts:
+                    continue
+                sat_assigned[i] = self.__model.NewBoolVar(f"assign_{s}_{i}")
+                sat_starts[i] = self.__model.NewIntVarFromDomain(
+                    cp_model.Domain.FromIntervals(starts), f"start_{s}_{i}"
+                )
+                sat_feasible[i] = starts
+            assigned.append(sat_assigned)
+            start_times.append(sat_starts)
+
+            # Sequencing of the captures of this satellite
+            candidates = list(sat_assigned)
+            add_interval_sequencing(
+                self.__model,
+                satellite,
+                [self.__requests[i].coordinates for i in candidates],
+                [sat_feasible[i] for i in candidates],
+                [sat_assigned[i] for i in candidates],
+                [sat_starts[i] for i in candidates],
+                [durations[i] for i in candidates],
+                prefix=f"sat{s}_",
+                transitions=transitions[s].subset(candidates),
+            )
+
+            # Memory of each satellite, emptied during its downlink windows
+            add_memory_profile(
+                self.__model,
+                satellite,
+                [sat_feasible[i] for i in candidates],
+                [sat_assigned[i] for i in candidates],
+                [sat_starts[i] for i in candidates],
+                [durations[i] for i in candidates],
+                [mem_usages[s][i] for i in candidates],
+                self.__downlink_windows[s],
+                prefix=f"sat{s}_",
+            )
+
+        # Each request is captured by at most one satellite
+        for i in range(n):
+            self.__model.AddAtMostOne(
+                assigned[s][i] for s in range(len(self.__satellites)) if i in assigned[s]
+            )
+
+        # Start the search from a greedy plan: the joint model is much larger
+        # than the single-satellite one and can take long to find a first plan
+        plan = self.__greedy_plan(capture_durations, mem_usages, assigned, transitions)
+        for s, sat_assigned in enumerate(assigned):
+            for i, literal in sat_assigned.items():
+                self.__model.AddHint(literal, (s, i) in plan)
+                if (s, i) in plan:
+                    self.__model.AddHint(start_times[s][i], plan[s, i])
+
+        # Objective function: maximize the priority of the captured requests
+        self.__model.Maximize(
+            sum(
+                self.__requests[i].priority * literal
+                for sat_assigned in assigned
+                for i, literal in sat_assigned.items()
+            )
+        )
+
+        build_time = time.perf_counter() - build_start
+
+        # Solve the model
+        if time_limit is not None:
+            self.__solver.parameters.max_time_in_seconds = time_limit
+        status = self.__solver.Solve(self.__model)
+        self.__record_solve_stats(status, build_time)
+
+        results = []
+        captured = set()
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            for s, satellite in enumerate(self.__satellites):
+                selected_indices = sorted(
+                    (i for i, literal in assigned[s].items() if self.__solver.Value(literal)),
+                    key=lambda i: self.__solver.Value(start_times[s][i]),
+                )
+
+                for idx, i in enumerate(selected_indices):
+                    start = self.__solver.Value(start_times[s][i])
+                    duration = capture_durations[s][i]
+
+                    travel_time = 0
+                    if idx > 0:
+                        travel_time = transitions[s][selected_indices[idx - 1], i]
+
+                    results.append(
+                        {
+                            "location": self.__requests[i].location,
+                            "priority": self.__requests[i].priority,
+                            "satellite": s,
+                            "start_time": start,
+                            "duration": duration,
+                            "end_time": start + duration,
+                            "memory_used": mem_usages[s][i],
+                            "travel_time": travel_time,
+                            "selected": True,
+                            "time_window": next(
+                                window
+                                for window in self.__requests[i].windows_for(s)
+                                if window[0] <= start <= window[1]
+                            ),
+                        }
+                    )
+                    captured.add(i)
+
+        # Unselected locations
+        for i in range(n):
+            if i not in captured:
+                results.append(
+                    {
+                        "location": self.__requests[i].location,
+                        "priority": self.__requests[i].priority,
+                        "selected": False,
+                    }
+                )
+
+        return status, results
+
+    def __greedy_plan(self, capture_durations, mem_usages, assigned, transitions):
+        """
+        Feasible plan {(satellite, request): start}, inserting the requests by
+        decreasing priority per second of capture at the earliest start that
+        keeps clear of the captures already planned on some satellite.
+        """
+        order = sorted(
+            range(len(self.__requests)),
+            key=lambda i: -self.__requests[i].priority
+            / (1 + min(durations[i] for durations in capture_durations)),
+        )
+        planned = [[] for _ in self.__satellites]  # (start, duration, request)
+        memory = [0.0] * len(self.__satellites)
+        plan = {}
+
+        for i in order:
+            for s, satellite in enumerate(self.__satellites):
+                if i not in assigned[s]:
+                    continue
+                if memory[s] + mem_usages[s][i] > satellite.memory_capacity_gb:
+                    continue
+                start = self.__earliest_start(
+                    satellite, s, i, planned[s], capture_durations[s], transitions[s]
+                )
+                if start is None:
+                    continue
+                planned[s].append((start, capture_durations[s][i], i))
+                memory[s] += mem_usages[s][i]
+                plan[s, i] = start
+                break
+        return plan
+
+    def __earliest_start(self, satellite, s, i, planned, durations, transitions):
+        """
+        Earliest start of request i on satellite s that respects recalibration
+        and travel to every planned capture, or None.
+        """
+        recalibration = satellite.recalibration_time_s
+        gaps = [
+            (start, duration, recalibration + transitions[i, j])
+            for start, duration, j in planned
+        ]
+        for first, last in feasible_starts(self.__requests[i].windows_for(s), durations[i]):
+            candidate = first
+            while candidate <= last:
+                # Push the start past every planned capture it conflicts with
+                blocking = [
+                    start + duration + gap
+                    for start, duration, gap in gaps
+                    if candidate < start + duration + gap
+                    and start < candidate + durations[i] + gap
+                ]
+                if not blocking:
+                    return candidate
+                candidate = max(blocking)
+        return None
+
+    def __record_solve_stats(self, status, build_time):
+        """
+        Store the size and timing figures of the last solve in last_solve_stats.
+        """
+        proto = self.__model.Proto()
+        feasible = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        self.last_solve_stats = {
+            "num_satellites": len(self.__satellites),
+            "num_requests": len(self.__requests),
+            "num_variables": len(proto.variables),
+            "num_constraints": len(proto.constraints),
+            "build_time": build_time,
+            "solve_time": self.__solver.WallTime(),
+            "status": self.__solver.StatusName(status),
+            "objective": self.__solver.ObjectiveValue() if feasible else None,
+            "best_bound": self.__solver.BestObjectiveBound() if feasible else None,
+        }
+
+    def print_solution(self, status: int, results: list[dict]) -> None:
+        if status == cp_model.OPTIMAL:
+            print("Found optimal solution!")
+        elif status == cp_model.FEASIBLE:
+            print("Found a feasible solution.")
+        else:
+            print("No solution found.")
+
+        selected_results = [r for r in results if r["selected"]]
+        print(
+            f"\nScheduled {len(selected_results)} out of {len(self.__requests)} image captures "
+            f"on {len(self.__satellites)} satellites:"
+        )
+
+        total_priority = 0
+        for s, satellite in enumerate(self.__satellites):
+            captures = [r for r in selected_results if r["satellite"] == s]
+            memory = sum(r["memory_used"] for r in captures)
+            if self.__downlink_windows[s]:
+                profile, sent = memory_profile(captures, self.__downlink_windows[s])
+                peak = max((on_board for _, on_board in profile), default=0)
+                print(
+                    f"\nSatellite {s}: {len(captures)} captures, {memory:.2f} GB captured, "
+                    f"{sent:.2f} GB sent to ground stations, "
+                    f"peak {peak:.2f} GB out of {satellite.memory_capacity_gb} GB"
+                )
+            else:
+                print(
+                    f"\nSatellite {s}: {len(captures)} captures, "
+                    f"{memory:.2f} GB out of {satellite.memory_capacity_gb} GB"
+                )
+            for r in captures:
+                print(
+                    f"  {r['location']} (Priority {r['priority']}): Start at {r['start_time']}s, "
+                    f"Duration: {r['duration']}s, Travel time from previous: {r['travel_time']}s, "
+                    f"Time window: {r['time_window']}"
+                )
+                total_priority += r["priority"]
+
+        print(f"\nTotal priority score: {total_priority}")
+
+        unscheduled = [r for r in results if not r["selected"]]
+        if unscheduled:
+            print("\nUnscheduled locations:")
+            for r in unscheduled:
+                print(f"{r['location']} (Priority {r['priority']})")
@@ -0,0 +1,261 @@
+import time
+
+from ortools.sat.python import cp_model
+
+from core.satellite import Satellite
+from core.request import Request
+from solver.scheduler import MAX_DISTANCE_KM, add_interval_sequencing, feasible_starts
+
+
+class RollingHorizonPlanner:
+    """
+    Live capture plan of one satellite, updated as requests come and go.
+
+    Captures starting before now + freeze_sec are committed: they are never
+    moved or cancelled again. Each re-plan only optimizes the open horizon
+    [now + freeze_sec, now + freeze_sec + lookahead_sec], with the committed
+    captures as fixed neighbours, and starts from the previous plan through
+    solution hints. The model size depends on the number of requests in the
+    look-ahead and not on the whole backlog, so re-planning stays fast as
+    requests pile up.
+
+    Requests whose windows all open beyond the horizon stay pending (and are
+    reported so by results()) until advance() brings the horizon to them.
+    The memory is a single budget over the whole session: ground-station
+    downlinks (downlink_windows of SatelliteScheduler) are not modelled here.
+    """
+
+    def __init__(
+        self,
+        satellite: Satellite,
+        lookahead_sec=6 * 3600,
+        freeze_sec=600,
+        time_limit=5,
+    ) -> None:
+
+        self.__satellite = satellite
+        self.lookahead_sec = lookahead_sec
+        self.freeze_sec = freeze_sec
+        self.time_limit = time_limit
+        self.now = 0
+
+        self.__requests = {}  # location -> pending Request
+        self.__planned = {}  # location -> result of the planned, uncommitted capture
+        self.__committed = []  # results of the committed captures, by start time
+        self.__expired = {}  # location -> Request whose windows have all passed
+        self.last_solve_stats = None
+
+    @property
+    def satellite(self) -> Satellite:
+        return self.__satellite
+
+    @property
+    def committed(self) -> list[dict]:
+        return list(self.__committed)
+
+    @property
+    def planned(self) -> list[dict]:
+        return sorted(self.__planned.values(), key=lambda r: r["start_time"])
+
+    def insert(self, requests: list[Request], time_limit=None) -> tuple[int, list[dict]]:
+        """
+        Add requests to the plan, or replace the pending ones with the same
+        location, and re-plan.
+        """
+        committed = {r["location"] for r in self.__committed}
+        for req in requests:
+            if req.location in committed:
+                raise ValueError(f"'{req.location}' is already committed")
+            self.__requests[req.location] = req
+            self.__planned.pop(req.location, None)
+            self.__expired.pop(req.location, None)
+        return self.replan(time_limit)
+
+    def cancel(self, locations: list[str], time_limit=None) -> tuple[int, list[dict]]:
+        """
+        Withdraw pending requests and re-plan; committed captures cannot be cancelled.
+        """
+        committed = {r["location"] for r in self.__committed}
+        for location in locations:
+            if location in committed:
+                raise ValueError(f"'{location}' is already committed")
+            if location not in self.__requests and location not in self.__expired:
+                raise KeyError(f"Unknown request '{location}'")
+        for location in locations:
+            self.__requests.pop(location, None)
+            self.__planned.pop(location, None)
+            self.__expired.pop(location, None)
+        return self.replan(time_limit)
+
+    def advance(self, now: int, time_limit=None) -> tuple[int, list[dict]]:
+        """
+        Move the clock to `now`, commit the captures that start before the new
+        freeze limit and re-plan the open horizon.
+        """
+        if now < self.now:
+            raise ValueError(f"Cannot go back in time from {self.now}s to {now}s")
+        self.now = now
+        return self.replan(time_limit)
+
+    def replan(self, time_limit=None) -> tuple[int, list[dict]]:
+
+        build_start = time.perf_counter()
+        freeze_limit = self.now + self.freeze_sec
+        horizon_end = freeze_limit + self.lookahead_sec
+
+        self.__commit_until(freeze_limit)
+
+        # Candidates: pending requests with a start in the open horizon. The
+        # ones only visible later wait for the horizon to reach them.
+        satellite = self.__satellite
+        candidates, starts, capture_durations = [], [], []
+        for location, req in list(self.__requests.items()):
+            duration = int(satellite.calculate_capture_duration(req.area_size_km2))
+            req_starts = feasible_starts(req.time_windows_sec, duration)
+            open_starts = [
+                [max(first, freeze_limit), min(last, horizon_end)]
+                for first, last in req_starts
+                if last >= freeze_limit and first <= horizon_end
+            ]
+            if open_starts:
+                candidates.append(req)
+                starts.append(open_starts)
+                capture_durations.append(duration)
+            elif all(last < freeze_limit for _, last in req_starts):
+                self.__expired[location] = self.__requests.pop(location)
+                self.__planned.pop(location, None)
+
+        # Committed captures close enough to the freeze limit to constrain the
+        # first open captures, as fixed and always selected intervals
+        reach = satellite.recalibration_time_s + MAX_DISTANCE_KM // max(
+            satellite.speed_kms_per_s, 1
+        ) + 1
+        neighbours = [
+            r for r in self.__committed if r["start_time"] + r["duration"] + reach > freeze_limit
+        ]
+
+        model = cp_model.CpModel()
+        is_selected = [model.NewBoolVar(f"select_{i}") for i in range(len(candidates))]
+        start_times = [
+            model.NewIntVarFromDomain(cp_model.Domain.FromIntervals(starts[i]), f"start_{i}")
+            for i in range(len(candidates))
+        ]
+        fixed_selected = model.NewConstant(1)
+        add_interval_sequencing(
+            model,
+            satellite,
+            [req.coordinates for req in candidates]
+            + [r["coordinates"] for r in neighbours],
+            starts + [[[r["start_time"], r["start_time"]]] for r in neighbours],
+            is_selected + [fixed_selected] * len(neighbours),
+            start_times + [model.NewConstant(r["start_time"]) for r in neighbours],
+            capture_durations + [r["duration"] for r in neighbours],
+        )
+
+        # Memory left once the committed captures are stored, scaling the floats to ints
+        scale = 1000
+        mem_usages = [satellite.calculate_memory_usage(req.area_size_km2) for req in candidates]
+        memory_left = satellite.memory_capacity_gb - sum(r["memory_used"] for r in self.__committed)
+        model.Add(
+            sum(int(mem_usages[i] * scale) * is_selected[i] for i in range(len(candidates)))
+            <= int(memory_left * scale)
+        )
+
+        model.Maximize(sum(req.priority * is_selected[i] for i, req in enumerate(candidates)))
+
+        # Warm start: the previous plan stays feasible after inserts, cancels
+        # and clock moves, so the solver starts from a plan at least as good
+        for i, req in enumerate(candidates):
+            previous = self.__planned.get(req.location)
+            in_domain = previous is not None and any(
+                first <= previous["start_time"] <= last for first, last in starts[i]
+            )
+            model.AddHint(is_selected[i], in_domain)
+            if in_domain:
+                model.AddHint(start_times[i], previous["start_time"])
+
+        build_time = time.perf_counter() - build_start
+
+        solver = cp_model.CpSolver()
+        time_limit = self.time_limit if time_limit is None else time_limit
+        if time_limit is not None:
+            solver.parameters.max_time_in_seconds = time_limit
+        status = solver.Solve(model)
+
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            self.__planned = {}
+            for i, req in enumerate(candidates):
+                if solver.Value(is_selected[i]):
+                    start = solver.Value(start_times[i])
+                    self.__planned[req.location] = {
+                        "location": req.location,
+                        "priority": req.priority,
+                        "coordinates": req.coordinates,
+                        "start_time": start,
+                        "duration": capture_durations[i],
+                        "end_time": start + capture_durations[i],
+                        "memory_used": mem_usages[i],
+                        "selected": True,
+                        "committed": False,
+                        "time_window": next(
+                            window
+                            for window in req.time_windows_sec
+                            if window[0] <= start <= window[1]
+                        ),
+                        "time_windows": req.time_windows_sec,
+                    }
+
+        feasible = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        self.last_solve_stats = {
+            "now": self.now,
+            "num_pending": len(self.__requests),
+            "num_candidates": len(candidates),
+            "num_committed": len(self.__committed),
+            "num_variables": len(model.Proto().variables),
+            "num_constraints": len(model.Proto().constraints),
+            "build_time": build_time,
+            "solve_time": solver.WallTime(),
+            "status": solver.StatusName(status),
+            "objective": solver.ObjectiveValue() if feasible else None,
+            "best_bound": solver.BestObjectiveBound() if feasible else None,
+        }
+        return status, self.results()
+
+    def results(self) -> list[dict]:
+        """
+        Committed and planned captures by start time, with their travel time
+        from the previous capture, followed by the pending and expired requests
+        that are not planned.
+        """
+        captures = self.__committed + self.planned
+        results = []
+        for idx, r in enumerate(captures):
+            travel_time = 0
+            if idx > 0:
+                travel_time = self.__satellite.calculate_distance(
+                    captures[idx - 1]["coordinates"], r["coordinates"]
+                )
+            results.append({**r, "travel_time": travel_time})
+
+        # Pending requests may still be planned once the horizon reaches them
+        for req in list(self.__requests.values()) + list(self.__expired.values()):
+            if req.location not in self.__planned:
+                results.append(
+                    {
+                        "location": req.location,
+                        "priority": req.priority,
+                        "selected": False,
+                        "pending": req.location in self.__requests,
+                    }
+                )
+        return results
+
+    def __commit_until(self, freeze_limit):
+        """
+        Freeze the planned captures that start before freeze_limit.
+        """
+        for location, r in sorted(self.__planned.items(), key=lambda item: item[1]["start_time"]):
+            if r["start_time"] < freeze_limit:
+                self.__committed.append({**r, "committed": True})
+                del self.__planned[location]
+                del self.__requests[location]
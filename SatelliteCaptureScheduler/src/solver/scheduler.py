@@ -1,20 +1,250 @@
+import time
+
 from ortools.sat.python import cp_model
 
 from core.satellite import Satellite
 from core.request import Request
+from solver.transitions import transition_matrix
+
+# Half of the Earth's circumference, the longest great-circle distance (km)
+MAX_DISTANCE_KM = 20015
+
+
+def feasible_starts(windows, duration):
+    """
+    [first, last] start times at which a capture of `duration` fits in each window.
+    """
+    return [[begin, end - duration] for begin, end in windows if end - duration >= begin]
+
+
+def add_interval_sequencing(
+    model,
+    satellite,
+    coordinates,
+    starts,
+    is_selected,
+    start_times,
+    capture_durations,
+    prefix="",
+    transitions=None,
+):
+    """
+    Keep the selected captures of one satellite apart with optional intervals.
+
+    Each request gets an optional interval covering its capture and the
+    recalibration that follows, and all of them go into one NoOverlap. Travel
+    times are symmetric, so the travel constraint of a pair is itself a
+    NoOverlap of the two intervals stretched by the travel time. It is only
+    added for the pairs whose windows come close enough in time for the
+    captures to conflict; the other pairs are always far enough apart.
+    `starts[i]` holds the feasible_starts of request i, and `transitions` the
+    TransitionMatrix of `coordinates` (looked up in the cache when not given).
+    """
+    n = len(start_times)
+    recalibration = satellite.recalibration_time_s
+    if transitions is None:
+        transitions = transition_matrix(satellite, coordinates)
+    horizon = recalibration + max(
+        (last + capture_durations[i] for i in range(n) for _, last in starts[i]),
+        default=0,
+    )
+
+    intervals = []
+    for i in range(n):
+        busy_end = model.NewIntVar(0, horizon, f"{prefix}busy_end_{i}")
+        intervals.append(
+            model.NewOptionalIntervalVar(
+                start_times[i],
+                capture_durations[i] + recalibration,
+                busy_end,
+                is_selected[i],
+                f"{prefix}capture_{i}",
+            )
+        )
+    model.AddNoOverlap(intervals)
+
+    # Placements of each request: (earliest start, latest end) of every window
+    windows = sorted(
+        (first, last + capture_durations[i], i)
+        for i in range(n)
+        for first, last in starts[i]
+    )
+    max_travel = MAX_DISTANCE_KM // max(satellite.speed_kms_per_s, 1) + 1
+
+    travel_times = {}
+    for k, (_, latest_end, i) in enumerate(windows):
+        for earliest_start, _, j in windows[k + 1 :]:
+            if earliest_start >= latest_end + recalibration + max_travel:
+                break
+            pair = (min(i, j), max(i, j))
+            if i == j or pair in travel_times:
+                continue
+            travel = transitions[i, j]
+            if earliest_start >= latest_end + recalibration + travel:
+                continue
+            travel_times[pair] = travel
+
+    for (i, j), travel in travel_times.items():
+        model.AddNoOverlap(
+            [
+                model.NewOptionalFixedSizeIntervalVar(
+                    start_times[i],
+                    capture_durations[i] + recalibration + travel,
+                    is_selected[i],
+                    f"{prefix}transition_{i}_{j}_from_{i}",
+                ),
+                model.NewOptionalFixedSizeIntervalVar(
+                    start_times[j],
+                    capture_durations[j] + recalibration + travel,
+                    is_selected[j],
+                    f"{prefix}transition_{i}_{j}_from_{j}",
+                ),
+            ]
+        )
+
+
+def add_memory_profile(
+    model,
+    satellite,
+    starts,
+    is_selected,
+    start_times,
+    capture_durations,
+    mem_usages,
+    downlink_windows,
+    prefix="",
+):
+    """
+    Keep the data on board within the memory of the satellite, emptying it
+    during the downlink windows (start, end, capacity_gb), sorted and disjoint.
+
+    A capture takes up memory from its start, and its data can only be sent
+    during a window that starts after the capture ends. The data sent during a
+    window only frees memory at the end of the window. The data on board is
+    then highest at the end of each window and at the end of the horizon, so
+    it is only checked there. `starts[i]` holds the feasible_starts of request
+    i. Without downlink windows, this is a single knapsack over the memory.
+    """
+    n = len(start_times)
+    scale = 1000
+    memory_capacity_scaled = int(satellite.memory_capacity_gb * scale)
+    memory_usages_scaled = [int(mem * scale) for mem in mem_usages]
+
+    def started_by(latest_starts, name):
+        """
+        Data (scaled) of the selected requests i starting by latest_starts[i].
+        A literal is only created for the requests that can fall on either side.
+        """
+        terms = []
+        for i in range(n):
+            if not starts[i] or starts[i][0][0] > latest_starts[i]:
+                continue
+            if starts[i][-1][1] <= latest_starts[i]:
+                terms.append(memory_usages_scaled[i] * is_selected[i])
+                continue
+            literal = model.NewBoolVar(f"{prefix}{name}_{i}")
+            model.AddImplication(literal, is_selected[i])
+            model.Add(start_times[i] <= latest_starts[i]).OnlyEnforceIf(literal)
+            model.Add(start_times[i] > latest_starts[i]).OnlyEnforceIf(
+                [is_selected[i], literal.Not()]
+            )
+            terms.append(memory_usages_scaled[i] * literal)
+        return sum(terms)
+
+    sent_before = 0  # data sent before the current window (scaled)
+    for k, (window_start, window_end, capacity) in enumerate(downlink_windows):
+        # On board at the end of the window, before its downlink frees memory
+        on_board = started_by([window_end] * n, f"on_board_{k}")
+        model.Add(on_board - sent_before <= memory_capacity_scaled)
+
+        # The window can only send the data of the captures done before it starts
+        ready = started_by(
+            [window_start - capture_durations[i] for i in range(n)], f"ready_{k}"
+        )
+        sent = model.NewIntVar(0, int(capacity * scale), f"{prefix}downlink_{k}")
+        model.Add(sent_before + sent <= ready)
+        sent_before = sent_before + sent
+
+    # On board at the end of the horizon
+    model.Add(
+        sum(memory_usages_scaled[i] * is_selected[i] for i in range(n)) - sent_before
+        <= memory_capacity_scaled
+    )
+
+
+def memory_profile(captures, downlink_windows):
+    """
+    Data on board (GB) over time for the captures (dicts with start_time,
+    duration and memory_used), with the same rules as add_memory_profile and
+    every window sending as much as it can.
+
+    Returns (time, GB on board) points, after each capture start and each
+    window end, and the total of the data sent.
+    """
+    events = [(r["start_time"], "capture", r["memory_used"]) for r in captures]
+    events += [(end, "downlink", (start, capacity)) for start, end, capacity in downlink_windows]
+    # At the same time, captures come first, as they hold memory from their start
+    events.sort(key=lambda event: (event[0], event[1] != "capture"))
+
+    on_board = 0
+    sent_total = 0
+    profile = []
+    for time_point, kind, value in events:
+        if kind == "capture":
+            on_board += value
+        else:
+            start, capacity = value
+            ready = sum(
+                r["memory_used"] for r in captures if r["start_time"] + r["duration"] <= start
+            )
+            sent = max(0, min(capacity, ready - sent_total))
+            sent_total += sent
+            on_board -= sent
+        profile.append((time_point, on_board))
+    return profile, sent_total
 
 
 class SatelliteScheduler:
 
-    def __init__(self, satellite: Satellite, requests: list[Request]) -> None:
+    FORMULATIONS = ("pairwise", "interval")
+
+    def __init__(
+        self,
+        satellite: Satellite,
+        requests: list[Request],
+        formulation="pairwise",
+        downlink_windows=None,
+    ) -> None:
+        """
+        formulation selects how captures are kept apart: "pairwise" (one ordering
+        boolean and two reified constraints per pair of requests) or "interval"
+        (one optional interval per request in a NoOverlap, plus travel times only
+        for the pairs whose windows are close enough in time to conflict).
+
+        downlink_windows are the (start, end, capacity_gb) passes over ground
+        stations (see core.ground_station.downlink_windows), during which the
+        memory is emptied. Without them, the memory is filled once for the
+        whole horizon.
+        """
+        if formulation not in self.FORMULATIONS:
+            raise ValueError(
+                f"Unknown formulation '{formulation}', expected one of {self.FORMULATIONS}"
+            )
 
         self.__satellite = satellite
         self.__requests = requests
+        self.__formulation = formulation
+        self.__downlink_windows = sorted(downlink_windows or [])
         self.__model = cp_model.CpModel()
         self.__solver = cp_model.CpSolver()
-
-    def solve(self) -> tuple[int, list[dict]]:
-
+        self.last_solve_stats = None
+
+    def solve(self, time_limit=None, num_workers=None) -> tuple[int, list[dict]]:
+        """
+        num_workers is the number of CP-SAT search threads, all the cores by
+        default; lower it when several solves run side by side.
+        """
+        build_start = time.perf_counter()
         n = len(self.__requests)
         capture_durations = []
         mem_usages = []
@@ -28,85 +258,67 @@ class SatelliteScheduler:
             memory = self.__satellite.calculate_memory_usage(req.area_size_km2)
             mem_usages.append(memory)
 
-        # Decision variables (if the satellite is chosen and its start time)
-        is_selected = [self.__model.NewBoolVar(f"select_{i}") for i in range(n)]
-        start_times = [
-            self.__model.NewIntVar(
-                req.time_window_sec[0], req.time_window_sec[1], f"start_{i}"
-            )
-            for i, req in enumerate(self.__requests)
-        ]
-
-        # Travel time of each pair of points
-        travel_times = {}
-        for i in range(n):
-            for j in range(n):
-                if i != j:
-                    travel_times[i, j] = self.__satellite.calculate_distance(
-                        self.__requests[i].coordinates, self.__requests[j].coordinates
-                    )
-
-        # Calculate the latest ending time from all time windows (with recalibration)
-        horizon = (
-            max(req.time_window_sec[1] for req in self.__requests)
-            + self.__satellite.recalibration_time_s
+        # Travel time of each pair of requests, computed once for the model and
+        # the results, and shared with the re-solves of the same requests
+        transitions = transition_matrix(
+            self.__satellite, [req.coordinates for req in self.__requests]
         )
 
-        # Calculate the end times for each task
-        end_times = []
-        for i in range(n):
-            end_time = self.__model.NewIntVar(0, horizon, f"end_{i}")
-            self.__model.Add(
-                end_time == start_times[i] + capture_durations[i]
-            ).OnlyEnforceIf(is_selected[i])
-
-            # If not selected, sets a default value
-            self.__model.Add(end_time == 0).OnlyEnforceIf(is_selected[i].Not())
-            end_times.append(end_time)
-
-        # Sequence of selected location, checks if i is visited before j or j before i
-        sequence = {}
-        for i in range(n):
-            for j in range(i + 1, n):
-                sequence[i, j] = self.__model.NewBoolVar(f"sequence_{i}_{j}")
-
-        # Multiple selected requests
-        for i in range(n):
-            for j in range(i + 1, n):
-                # i before j
-                self.__model.Add(
-                    start_times[j]
-                    >= start_times[i]
-                    + capture_durations[i]
-                    + self.__satellite.recalibration_time_s
-                    + travel_times[i, j]
-                ).OnlyEnforceIf([is_selected[i], is_selected[j], sequence[i, j]])
-
-                # j before i
-                self.__model.Add(
-                    start_times[i]
-                    >= start_times[j]
-                    + capture_durations[j]
-                    + self.__satellite.recalibration_time_s
-                    + travel_times[j, i]
-                ).OnlyEnforceIf([is_selected[i], is_selected[j], sequence[i, j].Not()])
+        # Decision variables (if the satellite is chosen and its start time)
+        is_selected = [self.__model.NewBoolVar(f"select_{i}") for i in range(n)]
 
-        # Ensure time windows
+        # The start time can only take values that fit the capture in one of the
+        # windows of the request, so the solver picks the window itself
+        start_times = []
         for i, req in enumerate(self.__requests):
-            self.__model.Add(
-                start_times[i] + capture_durations[i] <= req.time_window_sec[1]
-            ).OnlyEnforceIf(is_selected[i])
-
-        # Memory constraint
-        # Memory limit of the satellite
-        # Scaling the float to an int
-        scale = 1000
-        memory_capacity_scaled = int(self.__satellite.memory_capacity_gb * scale)
-        memory_usages_scaled = [int(mem * scale) for mem in mem_usages]
+            starts = feasible_starts(req.time_windows_sec, capture_durations[i])
+            if starts:
+                start_times.append(
+                    self.__model.NewIntVarFromDomain(
+                        cp_model.Domain.FromIntervals(starts), f"start_{i}"
+                    )
+                )
+            else:
+                # The capture fits in none of the windows
+                start_times.append(
+                    self.__model.NewIntVar(
+                        req.time_window_sec[0], req.time_window_sec[1], f"start_{i}"
+                    )
+                )
+                self.__model.Add(is_selected[i] == 0)
+
+        if self.__formulation == "interval":
+            add_interval_sequencing(
+                self.__model,
+                self.__satellite,
+                [req.coordinates for req in self.__requests],
+                [
+                    feasible_starts(req.time_windows_sec, capture_durations[i])
+                    for i, req in enumerate(self.__requests)
+                ],
+                is_selected,
+                start_times,
+                capture_durations,
+                transitions=transitions,
+            )
+        else:
+            self.__add_pairwise_sequencing(
+                is_selected, start_times, capture_durations, transitions
+            )
 
-        self.__model.Add(
-            sum(memory_usages_scaled[i] * is_selected[i] for i in range(n))
-            <= memory_capacity_scaled
+        # Memory constraint, emptied during the downlink windows
+        add_memory_profile(
+            self.__model,
+            self.__satellite,
+            [
+                feasible_starts(req.time_windows_sec, capture_durations[i])
+                for i, req in enumerate(self.__requests)
+            ],
+            is_selected,
+            start_times,
+            capture_durations,
+            mem_usages,
+            self.__downlink_windows,
         )
 
         # Objective function: maximize the number of selected requests
@@ -115,8 +327,15 @@ class SatelliteScheduler:
         )
         self.__model.Maximize(priority_score)
 
+        build_time = time.perf_counter() - build_start
+
         # Solve the model
+        if time_limit is not None:
+            self.__solver.parameters.max_time_in_seconds = time_limit
+        if num_workers is not None:
+            self.__solver.parameters.num_workers = num_workers
         status = self.__solver.Solve(self.__model)
+        self.__record_solve_stats(status, build_time)
 
         results = []
         if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
@@ -136,11 +355,7 @@ class SatelliteScheduler:
 
                 travel_time = 0
                 if idx > 0:
-                    prev_idx = selected_indices[idx - 1]
-                    travel_time = self.__satellite.calculate_distance(
-                        self.__requests[prev_idx].coordinates,
-                        self.__requests[i].coordinates,
-                    )
+                    travel_time = transitions[selected_indices[idx - 1], i]
 
                 result = {
                     "location": self.__requests[i].location,
@@ -151,7 +366,12 @@ class SatelliteScheduler:
                     "memory_used": memory,
                     "travel_time": travel_time,
                     "selected": True,
-                    "time_window": self.__requests[i].time_window_sec,
+                    "time_window": next(
+                        window
+                        for window in self.__requests[i].time_windows_sec
+                        if window[0] <= start <= window[1]
+                    ),
+                    "time_windows": self.__requests[i].time_windows_sec,
                 }
                 results.append(result)
 
@@ -176,6 +396,78 @@ class SatelliteScheduler:
 
         return status, results
 
+    def __add_pairwise_sequencing(
+        self, is_selected, start_times, capture_durations, travel_times
+    ):
+        """
+        Keep selected captures apart with one ordering boolean per pair of requests.
+        `travel_times` is the TransitionMatrix of the requests.
+        """
+        n = len(self.__requests)
+
+        # Calculate the latest ending time from all time windows (with recalibration)
+        horizon = (
+            max(req.time_window_sec[1] for req in self.__requests)
+            + self.__satellite.recalibration_time_s
+        )
+
+        # Calculate the end times for each task
+        end_times = []
+        for i in range(n):
+            end_time = self.__model.NewIntVar(0, horizon, f"end_{i}")
+            self.__model.Add(
+                end_time == start_times[i] + capture_durations[i]
+            ).OnlyEnforceIf(is_selected[i])
+
+            # If not selected, sets a default value
+            self.__model.Add(end_time == 0).OnlyEnforceIf(is_selected[i].Not())
+            end_times.append(end_time)
+
+        # Sequence of selected location, checks if i is visited before j or j before i
+        sequence = {}
+        for i in range(n):
+            for j in range(i + 1, n):
+                sequence[i, j] = self.__model.NewBoolVar(f"sequence_{i}_{j}")
+
+        # Multiple selected requests
+        for i in range(n):
+            for j in range(i + 1, n):
+                # i before j
+                self.__model.Add(
+                    start_times[j]
+                    >= start_times[i]
+                    + capture_durations[i]
+                    + self.__satellite.recalibration_time_s
+                    + travel_times[i, j]
+                ).OnlyEnforceIf([is_selected[i], is_selected[j], sequence[i, j]])
+
+                # j before i
+                self.__model.Add(
+                    start_times[i]
+                    >= start_times[j]
+                    + capture_durations[j]
+                    + self.__satellite.recalibration_time_s
+                    + travel_times[j, i]
+                ).OnlyEnforceIf([is_selected[i], is_selected[j], sequence[i, j].Not()])
+
+    def __record_solve_stats(self, status, build_time):
+        """
+        Store the size and timing figures of the last solve in last_solve_stats.
+        """
+        proto = self.__model.Proto()
+        feasible = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        self.last_solve_stats = {
+            "formulation": self.__formulation,
+            "num_requests": len(self.__requests),
+            "num_variables": len(proto.variables),
+            "num_constraints": len(proto.constraints),
+            "build_time": build_time,
+            "solve_time": self.__solver.WallTime(),
+            "status": self.__solver.StatusName(status),
+            "objective": self.__solver.ObjectiveValue() if feasible else None,
+            "best_bound": self.__solver.BestObjectiveBound() if feasible else None,
+        }
+
     def print_solution(self, status: int, results: tuple[int, list[dict]]) -> None:
         if status == cp_model.OPTIMAL:
             print("Found optimal solution!")
@@ -229,9 +521,21 @@ class SatelliteScheduler:
                 total_memory += r["memory_used"]
                 total_priority += r["priority"]
 
-        print(
-            f"Total memory used: {total_memory:.2f} GB out of {self.__satellite.memory_capacity_gb} GB"
-        )
+        if self.__downlink_windows:
+            profile, sent = memory_profile(selected_results, self.__downlink_windows)
+            peak = max((on_board for _, on_board in profile), default=0)
+            print(f"Total data captured: {total_memory:.2f} GB")
+            print(
+                f"Sent to ground stations: {sent:.2f} GB "
+                f"in {len(self.__downlink_windows)} downlink windows"
+            )
+            print(
+                f"Peak memory used: {peak:.2f} GB out of {self.__satellite.memory_capacity_gb} GB"
+            )
+        else:
+            print(
+                f"Total memory used: {total_memory:.2f} GB out of {self.__satellite.memory_capacity_gb} GB"
+            )
         print(f"Total priority score: {total_priority}")
 
         unscheduled = [r for r in results if not r.get("selected", True)]
@@ -0,0 +1,93 @@
+from functools import lru_cache
+
+import numpy as np
+
+from core.satellite import Satellite
+
+EARTH_RADIUS_KM = 6371
+
+
+class TransitionMatrix:
+    """
+    Travel times (seconds) of one satellite between every pair of points, the
+    same values as Satellite.calculate_distance.
+
+    The times only depend on the points and the travel speed, and they are
+    symmetric, so only the upper triangle is computed (vectorized) and stored,
+    condensed in the smallest unsigned integer type that holds it.
+    """
+
+    def __init__(self, coordinates: list[tuple[float]], speed_kms_per_s: int) -> None:
+
+        self.size = len(coordinates)
+        self.speed_kms_per_s = speed_kms_per_s
+
+        n = self.size
+        rows, cols = np.triu_indices(n, k=1)
+        latitudes, longitudes = np.radians(np.asarray(coordinates, dtype=float).reshape(n, 2)).T
+
+        # Haversine formula, as in Satellite.calculate_distance
+        dlon = longitudes[cols] - longitudes[rows]
+        dlat = latitudes[cols] - latitudes[rows]
+        a = (
+            np.sin(dlat / 2) ** 2
+            + np.cos(latitudes[rows]) * np.cos(latitudes[cols]) * np.sin(dlon / 2) ** 2
+        )
+        c = 2 * np.arcsin(np.sqrt(a))
+        travel = (c * EARTH_RADIUS_KM / self.speed_kms_per_s).astype(np.int64)
+
+        fits_16_bits = travel.size == 0 or travel.max() <= np.iinfo(np.uint16).max
+        self.condensed = travel.astype(np.uint16 if fits_16_bits else np.uint32)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, pair: tuple[int]) -> int:
+        i, j = pair
+        if i == j:
+            return 0
+        if i > j:
+            i, j = j, i
+        return int(self.condensed[i * self.size - i * (i + 1) // 2 + j - i - 1])
+
+    def subset(self, indices: list[int]) -> "TransitionMatrix":
+        """
+        TransitionMatrix of the points at `indices` (distinct), without
+        recomputing any travel time.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        rows, cols = np.triu_indices(len(indices), k=1)
+        first = np.minimum(indices[rows], indices[cols])
+        second = np.maximum(indices[rows], indices[cols])
+
+        sub = TransitionMatrix.__new__(TransitionMatrix)
+        sub.size = len(indices)
+        sub.speed_kms_per_s = self.speed_kms_per_s
+        sub.condensed = self.condensed[
+            first * self.size - first * (first + 1) // 2 + second - first - 1
+        ]
+        return sub
+
+    def to_square(self) -> np.ndarray:
+        """
+        Full n x n matrix of travel times.
+        """
+        square = np.zeros((self.size, self.size), dtype=self.condensed.dtype)
+        rows, cols = np.triu_indices(self.size, k=1)
+        square[rows, cols] = self.condensed
+        square[cols, rows] = self.condensed
+        return square
+
+
+@lru_cache(maxsize=16)
+def _cached_matrix(coordinates, speed_kms_per_s):
+    return TransitionMatrix(coordinates, speed_kms_per_s)
+
+
+def transition_matrix(satellite: Satellite, coordinates: list[tuple[float]]) -> TransitionMatrix:
+    """
+    TransitionMatrix of the points for `satellite`, shared between the
+    re-solves of the same points at the same speed.
+    """
+    key = tuple((float(lat), float(lon)) for lat, lon in coordinates)
+    return _cached_matrix(key, satellite.speed_kms_per_s)
@@ -0,0 +1,273 @@
+import os
+import subprocess
+
+import numpy as np
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.animation import FuncAnimation
+from matplotlib.colors import to_rgb
+from matplotlib.lines import Line2D
+from PIL import Image, ImageChops, GifImagePlugin
+
+from core.imaging_task import ImagingTask
+from visualization.visibility import visibility_mask
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".webm", ".avi", ".mov")
+
+
+class OrbitRenderer:
+    """
+    Frame renderer of the satellites and the task points at `times`.
+
+    The satellite positions and the visibility of every point are computed for
+    all the frames in one vectorized pass (visibility_mask, the same conditions
+    as all_availability). The Earth, the trajectories and the legend are drawn
+    once; each frame only moves the satellites, the points and the lines of
+    sight, updating the existing artists in place.
+    """
+
+    def __init__(
+        self,
+        fig,
+        satellites,
+        imaging_task: ImagingTask,
+        times,
+        min_elevation_angle=10,
+        radius=6371,
+    ) -> None:
+
+        self.fig = fig
+        self.satellites = satellites
+        self.imaging_task = imaging_task
+        self.times = np.asarray(times, dtype=np.float64)
+        self.radius = radius
+
+        # (satellites, frames, 3) and (satellites, points, frames)
+        self.positions = np.stack([sat.positions_at(self.times) for sat in satellites])
+        self.visible = visibility_mask(satellites, imaging_task, self.times, min_elevation_angle)
+
+        self.ax = fig.add_subplot(111, projection="3d")
+        self.artists = self.__draw_background()
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __draw_background(self) -> list:
+        """
+        Draw the static scene and create the artists updated by each frame.
+        """
+        ax, R = self.ax, self.radius
+
+        # Earth
+        u, v = np.mgrid[0 : 2 * np.pi : 30j, 0 : np.pi : 20j]
+        ax.plot_surface(
+            R * np.cos(u) * np.sin(v),
+            R * np.sin(u) * np.sin(v),
+            R * np.cos(v),
+            color="blue",
+            alpha=0.3,
+        )
+
+        # Expected trajectory of each satellite over one orbit
+        for satellite in self.satellites:
+            t_full_orbit = np.linspace(0, 2 * np.pi / satellite.mean_motion, 50)
+            trajectory = satellite.positions_at(t_full_orbit)
+            ax.plot(trajectory[:, 0], trajectory[:, 1], trajectory[:, 2], color="green", alpha=0.5)
+
+        ax.set_title("Satellite Orbit and Imaging Capability Visualization")
+        ax.set_xlim([-1.5 * R, 1.5 * R])
+        ax.set_ylim([-1.5 * R, 1.5 * R])
+        ax.set_zlim([-1.5 * R, 1.5 * R])
+        ax.set_box_aspect([1, 1, 1])
+
+        legend = [
+            Line2D([0], [0], marker="o", color="w", markerfacecolor=color, markersize=10, label=label)
+            for color, label in (
+                ("red", "Satellite"),
+                ("lime", "Visible Point"),
+                ("black", "Non-visible Point"),
+            )
+        ]
+        legend.append(Line2D([0], [0], color="green", lw=2, label="Trajectory"))
+        legend.append(Line2D([0], [0], color="y", lw=2, linestyle="--", label="Line of Sight"))
+        ax.legend(handles=legend, loc="upper right")
+
+        # Artists moved by each frame
+        self.satellite_markers = [
+            ax.plot([], [], [], "o", color="red", markersize=7)[0] for _ in self.satellites
+        ]
+        self.lines_of_sight = [
+            ax.plot([], [], [], "y--", alpha=0.7, linewidth=1)[0] for _ in self.satellites
+        ]
+        self.visible_points = ax.plot(
+            [], [], [], "o", color="lime", markeredgecolor="black", markersize=6
+        )[0]
+        self.hidden_points = ax.plot([], [], [], "o", color="black", markersize=5)[0]
+        self.status_text = ax.text2D(0.02, 0.02, "", transform=ax.transAxes, fontsize=10)
+
+        return (
+            self.satellite_markers
+            + self.lines_of_sight
+            + [self.visible_points, self.hidden_points, self.status_text]
+        )
+
+    def update(self, frame) -> list:
+        """
+        Move the artists to frame `frame` and return them.
+        """
+        t = self.times[frame]
+        points = self.imaging_task.rotate_earth_many(self.times[frame : frame + 1])[0]
+        visible = self.visible[:, :, frame]
+
+        for i, sat_pos in enumerate(self.positions[:, frame]):
+            self.satellite_markers[i].set_data_3d([sat_pos[0]], [sat_pos[1]], [sat_pos[2]])
+
+            # One polyline through (satellite, point, gap) for every visible point
+            seen = points[visible[i]]
+            segments = np.full((len(seen), 3, 3), np.nan)
+            segments[:, 0] = sat_pos
+            segments[:, 1] = seen
+            self.lines_of_sight[i].set_data_3d(*segments.reshape(-1, 3).T)
+
+        any_visible = visible.any(axis=0)
+        self.visible_points.set_data_3d(*points[any_visible].T)
+        self.hidden_points.set_data_3d(*points[~any_visible].T)
+        self.status_text.set_text(f"Time: {t:.1f}s")
+
+        return self.artists
+
+    def animation(self, interval=50) -> FuncAnimation:
+        """
+        Interactive animation, blitting the moving artists over the static scene.
+        """
+        return FuncAnimation(
+            self.fig,
+            self.update,
+            frames=len(self),
+            init_func=lambda: self.artists,
+            interval=interval,
+            blit=True,
+            cache_frame_data=False,
+        )
+
+    def frames(self):
+        """
+        Yield every frame as an RGB image, without a display.
+
+        The static scene is rasterized once; each frame restores it and only
+        draws the moving artists on top, as blitting does on screen.
+        """
+        canvas = self.fig.canvas
+        for artist in self.artists:
+            artist.set_visible(False)
+        canvas.draw()
+        background = canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.artists:
+            artist.set_visible(True)
+            artist.set_animated(True)
+
+        for frame in range(len(self)):
+            canvas.restore_region(background)
+            for artist in self.update(frame):
+                self.fig.draw_artist(artist)
+            yield Image.fromarray(np.asarray(canvas.buffer_rgba())).convert("RGB")
+
+    def export(self, path, fps=20) -> None:
+        """
+        Render every frame to a GIF or video file at `path`, streaming the
+        frames to the file so memory does not grow with the number of frames.
+        Videos are encoded by ffmpeg (matplotlib's animation.ffmpeg_path).
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".gif":
+            colors = {
+                to_rgb(color)
+                for artist in self.artists
+                if isinstance(artist, Line2D)
+                for color in (artist.get_color(), artist.get_markerfacecolor())
+            }
+            _write_gif(path, self.frames(), fps, sorted(colors))
+        elif extension in VIDEO_EXTENSIONS:
+            width, height = self.fig.canvas.get_width_height()
+            _write_video(path, self.frames(), fps, width, height)
+        else:
+            raise ValueError(
+                f"Unsupported output format '{extension}', expected .gif or one of {VIDEO_EXTENSIONS}"
+            )
+
+
+def _write_gif(path, frames, fps, colors=()):
+    """
+    Append each frame to a looping GIF as soon as it is rendered.
+
+    All the frames share the palette of the first one, extended with `colors`
+    (RGB floats) so the moving artists keep their colors, and each frame only
+    stores the box that changed since the previous one.
+    """
+    duration = int(1000 / fps)
+    previous = None
+    with open(path, "wb") as f:
+        for frame in frames:
+            if previous is None:
+                swatch = Image.new("RGB", (max(len(colors), 1) * 8, 8))
+                for idx, color in enumerate(colors):
+                    swatch.paste(tuple(int(255 * c) for c in color), (8 * idx, 0, 8 * idx + 8, 8))
+                sample = Image.new("RGB", (frame.width, frame.height + 8))
+                sample.paste(frame)
+                sample.paste(swatch, (0, frame.height))
+                palette = sample.quantize(256)
+                header, _ = GifImagePlugin.getheader(
+                    palette, info={"loop": 0, "duration": duration}
+                )
+                f.writelines(header)
+                box = (0, 0, frame.width, frame.height)
+            else:
+                box = ImageChops.difference(previous, frame).getbbox() or (0, 0, 1, 1)
+
+            indexed = frame.crop(box).quantize(palette=palette, dither=Image.Dither.NONE)
+            f.writelines(GifImagePlugin.getdata(indexed, offset=box[:2], duration=duration))
+            previous = frame
+        f.write(b";")
+
+
+def _write_video(path, frames, fps, width, height):
+    """
+    Pipe the raw frames to ffmpeg.
+    """
+    command = [
+        matplotlib.rcParams["animation.ffmpeg_path"],
+        "-y",
+        "-loglevel", "error",
+        "-f", "rawvideo",
+        "-pix_fmt", "rgb24",
+        "-s", f"{width}x{height}",
+        "-r", str(fps),
+        "-i", "-",
+        "-pix_fmt", "yuv420p",
+        "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+        path,
+    ]
+    try:
+        process = subprocess.Popen(command, stdin=subprocess.PIPE)
+    except FileNotFoundError:
+        raise RuntimeError(
+            f"ffmpeg not found ('{command[0]}'): install it or export to a .gif"
+        ) from None
+    try:
+        for frame in frames:
+            process.stdin.write(frame.tobytes())
+    finally:
+        process.stdin.close()
+        returncode = process.wait()
+    if returncode:
+        raise RuntimeError(f"ffmpeg exited with code {returncode} while writing '{path}'")
+
+
+def headless_figure(figsize=(10, 8), dpi=100) -> Figure:
+    """
+    Figure drawn by the Agg canvas, outside of pyplot, for renders without a display.
+    """
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    return fig
@@ -106,16 +106,331 @@ def check_satellite_see_point(
     return (is_visible, time_window, toAddToCounter)
 
 
+def _satellite_positions(satellite, times):
+    """
+    Satellite positions at `times`, as an array of shape (len(times), 3).
+    """
+    positions, _ = satellite.propagate(np.asarray(times, dtype=np.float64))
+    return positions
+
+
+def _visibility_margin(sat_pos, points, sin_min_elevation):
+    """
+    Signed visibility margin in km, non-negative when the point sees the satellite.
+
+    It is the smallest of the two conditions of check_satellite_see_point_specific_time:
+    distance below EARTH_RADIUS, and elevation above the minimum, written as
+    (point_to_sat . normal) >= sin(min elevation) * |point_to_sat| to avoid arccos.
+    `sat_pos` and `points` broadcast against each other, with (x, y, z) on the last axis.
+    """
+    point_to_sat = sat_pos - points
+    distance = np.linalg.norm(point_to_sat, axis=-1)
+    along_normal = np.sum(point_to_sat * points, axis=-1) / np.linalg.norm(
+        points, axis=-1
+    )
+    return np.minimum(
+        EARTH_RADIUS - distance, along_normal - sin_min_elevation * distance
+    )
+
+
+def visibility_mask(
+    satellites, tasks, times, min_elevation_angle=10, chunk_size=4096, ephemerides=None
+):
+    """
+    Visibility of every task point from every satellite over a grid of times.
+
+    Each orbit is propagated over the whole grid in one call, unless its
+    positions at `times` are given in `ephemerides`, and all points are
+    rotated at once, `chunk_size` times at a time to bound memory. A point sees a
+    satellite under the same conditions as check_satellite_see_point_specific_time.
+
+    Returns a boolean array of shape (satellites, points, times).
+    """
+    times = np.asarray(times, dtype=np.float64)
+    num_points = len(tasks.points)
+    mask = np.zeros((len(satellites), num_points, len(times)), dtype=bool)
+    sin_min_elevation = np.sin(np.radians(min_elevation_angle))
+
+    for sat_idx, satellite in enumerate(satellites):
+        if ephemerides is not None:
+            sat_pos = np.asarray(ephemerides[sat_idx])
+        else:
+            sat_pos = _satellite_positions(satellite, times)
+
+        for lo in range(0, len(times), chunk_size):
+            hi = min(lo + chunk_size, len(times))
+            points = tasks.rotate_earth_many(times[lo:hi])  # (chunk, points, 3)
+            margin = _visibility_margin(
+                sat_pos[lo:hi, None, :], points, sin_min_elevation
+            )
+            mask[sat_idx, :, lo:hi] = (margin >= 0).T
+
+    return mask
+
+
+def mask_runs(mask):
+    """
+    Run-length detection of True values along the last axis of a boolean array.
+
+    Returns (rows, starts, ends): for each run, the index of its row in the
+    flattened leading axes and the indices of its first and last True value.
+    Runs are ordered by row, then by time.
+    """
+    flat = mask.reshape(-1, mask.shape[-1]).astype(np.int8)
+    padded = np.zeros((flat.shape[0], flat.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = flat
+    edges = np.diff(padded, axis=1)
+
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends - 1
+
+
+def time_grid(begin, end, time_step):
+    """
+    Coarse time grid of the vectorized engines: every `time_step` seconds from
+    `begin`, then `end` (the "numpy" engine leaves `end` out).
+    """
+    return np.append(np.arange(begin, end, time_step, dtype=np.float64), float(end))
+
+
+def _all_availability_numpy(
+    begin, end, satellites, tasks, min_elevation_angle, time_step, ephemerides=None
+):
+    """
+    NumPy engine of all_availability: one visibility mask, then run-length windows.
+    """
+    labels = tasks.getLabels()
+    times = time_grid(begin, end, time_step)[:-1]
+    mask = visibility_mask(
+        satellites,
+        tasks,
+        times,
+        min_elevation_angle,
+        ephemerides=(
+            [ephemeris[: len(times)] for ephemeris in ephemerides] if ephemerides else None
+        ),
+    )
+
+    availabilityDico = {}
+    rows, starts, ends = mask_runs(mask)
+    for row, start, stop in zip(rows, starts, ends):
+        label = labels[row % mask.shape[1]]
+        time_window = [int(times[start]), int(times[stop])]
+        availabilityDico.setdefault(label, []).append(time_window)
+
+    return availabilityDico
+
+
+def _margin_at(satellite, tasks, point_idx, times, sin_min_elevation):
+    """
+    Visibility margin of points[point_idx[k]] at times[k], elementwise.
+    """
+    sat_pos = _satellite_positions(satellite, times)
+    points = tasks.rotate_earth_at(point_idx, times)
+    return _visibility_margin(sat_pos, points, sin_min_elevation)
+
+
+def _refine_crossings(
+    satellite, tasks, point_idx, lo, hi, sin_min_elevation, tolerance
+):
+    """
+    Bisect all the brackets [lo[k], hi[k]] at once, down to `tolerance` seconds.
+
+    The visibility of point_idx[k] must differ at lo[k] and hi[k]. Returns the
+    final (lo, hi): the crossing lies between them and their visibility is
+    still that of the original bounds.
+    """
+    lo = np.asarray(lo, dtype=np.float64)
+    hi = np.asarray(hi, dtype=np.float64)
+    visible_lo = _margin_at(satellite, tasks, point_idx, lo, sin_min_elevation) >= 0
+
+    while len(lo) and np.max(hi - lo) > tolerance:
+        mid = (lo + hi) / 2
+        visible_mid = (
+            _margin_at(satellite, tasks, point_idx, mid, sin_min_elevation) >= 0
+        )
+        same = visible_mid == visible_lo
+        lo = np.where(same, mid, lo)
+        hi = np.where(same, hi, mid)
+
+    return lo, hi
+
+
+def _refine_peaks(satellite, tasks, point_idx, lo, hi, sin_min_elevation, tolerance):
+    """
+    Golden-section search of the highest margin of point_idx[k] in [lo[k], hi[k]].
+
+    Returns the time of each maximum and the margin there.
+    """
+    inv_phi = (np.sqrt(5) - 1) / 2
+    lo = np.asarray(lo, dtype=np.float64)
+    hi = np.asarray(hi, dtype=np.float64)
+
+    while len(lo) and np.max(hi - lo) > tolerance:
+        left = hi - inv_phi * (hi - lo)
+        right = lo + inv_phi * (hi - lo)
+        left_higher = _margin_at(
+            satellite, tasks, point_idx, left, sin_min_elevation
+        ) > _margin_at(satellite, tasks, point_idx, right, sin_min_elevation)
+        hi = np.where(left_higher, right, hi)
+        lo = np.where(left_higher, lo, left)
+
+    peak = (lo + hi) / 2
+    return peak, _margin_at(satellite, tasks, point_idx, peak, sin_min_elevation)
+
+
+def _all_availability_adaptive(
+    begin, end, satellites, tasks, min_elevation_angle, time_step, tolerance, ephemerides=None
+):
+    """
+    Adaptive engine of all_availability: coarse scan, then root refinement.
+
+    The visibility margin is sampled every `time_step` seconds to bracket the
+    horizon crossings, which are then bisected down to `tolerance` seconds. Passes
+    too short to show up on the coarse grid are caught at the local maxima of the
+    margin: a golden-section search finds the true peak, and both crossings
+    around it are bisected when the peak is visible.
+    """
+    labels = tasks.getLabels()
+    times = time_grid(begin, end, time_step)
+    sin_min_elevation = np.sin(np.radians(min_elevation_angle))
+    grid_points = tasks.rotate_earth_many(times).transpose(1, 0, 2)  # (points, times, 3)
+
+    availabilityDico = {}
+    for sat_idx, satellite in enumerate(satellites):
+        if ephemerides is not None:
+            sat_pos = np.asarray(ephemerides[sat_idx])
+        else:
+            sat_pos = _satellite_positions(satellite, times)
+        margin = _visibility_margin(sat_pos[None, :, :], grid_points, sin_min_elevation)
+
+        # Windows visible on the coarse grid, with their edges bracketed by samples
+        rows, starts, ends = mask_runs(margin >= 0)
+        rise = times[starts]
+        set_ = times[ends]
+
+        rising = starts > 0
+        _, rise_hi = _refine_crossings(
+            satellite,
+            tasks,
+            rows[rising],
+            times[starts[rising] - 1],
+            times[starts[rising]],
+            sin_min_elevation,
+            tolerance,
+        )
+        rise[rising] = np.ceil(rise_hi)
+
+        setting = ends < len(times) - 1
+        set_lo, _ = _refine_crossings(
+            satellite,
+            tasks,
+            rows[setting],
+            times[ends[setting]],
+            times[ends[setting] + 1],
+            sin_min_elevation,
+            tolerance,
+        )
+        set_[setting] = np.floor(set_lo)
+
+        # Short passes between two samples: invisible local maxima of the margin
+        inner = margin[:, 1:-1]
+        peak_rows, peak_cols = np.nonzero(
+            (inner < 0) & (inner > margin[:, :-2]) & (inner >= margin[:, 2:])
+        )
+        peak_time, peak_margin = _refine_peaks(
+            satellite,
+            tasks,
+            peak_rows,
+            times[peak_cols],
+            times[peak_cols + 2],
+            sin_min_elevation,
+            tolerance,
+        )
+        seen = peak_margin >= 0
+        peak_rows, peak_cols, peak_time = peak_rows[seen], peak_cols[seen], peak_time[seen]
+        _, peak_rise = _refine_crossings(
+            satellite,
+            tasks,
+            peak_rows,
+            times[peak_cols],
+            peak_time,
+            sin_min_elevation,
+            tolerance,
+        )
+        peak_set, _ = _refine_crossings(
+            satellite,
+            tasks,
+            peak_rows,
+            peak_time,
+            times[peak_cols + 2],
+            sin_min_elevation,
+            tolerance,
+        )
+
+        windows = sorted(
+            zip(
+                np.concatenate([rows, peak_rows]),
+                np.concatenate([rise, np.ceil(peak_rise)]),
+                np.concatenate([set_, np.floor(peak_set)]),
+            )
+        )
+        for row, start, stop in windows:
+            if start <= stop:
+                availabilityDico.setdefault(labels[row], []).append(
+                    [int(start), int(stop)]
+                )
+
+    return availabilityDico
+
+
 def all_availability(
-    begin, end, satellites, tasks, min_elevation_angle=10, time_step=10
+    begin,
+    end,
+    satellites,
+    tasks,
+    min_elevation_angle=10,
+    time_step=10,
+    engine="python",
+    tolerance=1.0,
+    ephemerides=None,
 ):
     """
     Calculate all availability windows for imaging tasks.
 
+    engine "numpy" evaluates every (satellite, point, time) of the grid in array
+    operations and extracts the windows from the visibility mask; "python" walks
+    the grid step by step with check_satellite_see_point. Both give window edges
+    on the `time_step` grid. engine "adaptive" only uses `time_step` to bracket
+    rises and sets, which are then refined to `tolerance` seconds.
+
+    The vectorized engines can take the positions of each satellite on
+    time_grid(begin, end, time_step) in `ephemerides` (see VisibilityCache)
+    instead of propagating the orbits over the grid again.
+
     Returns:
     - Dictionary mapping location labels to lists of time windows
     - Each time window is [start_time, end_time]
     """
+    if engine == "numpy":
+        return _all_availability_numpy(
+            begin, end, satellites, tasks, min_elevation_angle, time_step, ephemerides
+        )
+    if engine == "adaptive":
+        return _all_availability_adaptive(
+            begin,
+            end,
+            satellites,
+            tasks,
+            min_elevation_angle,
+            time_step,
+            tolerance,
+            ephemerides,
+        )
+    if engine != "python":
+        raise ValueError(f"Unknown visibility engine '{engine}'")
+
     availability = []
     labels = tasks.getLabels()
 
@@ -0,0 +1,138 @@
+import os
+import json
+import hashlib
+import tempfile
+
+import numpy as np
+
+from core.satellite import Satellite
+from core.imaging_task import ImagingTask
+from visualization.visibility import all_availability, time_grid
+
+# Orbit fields of Satellite that the propagation depends on
+ORBIT_FIELDS = ("MU", "A", "EC", "IC", "OMEGA", "W")
+
+
+def _digest(*parts) -> str:
+    """
+    Content address of the JSON-serializable `parts`.
+    """
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _atomic_write(path, write):
+    """
+    Call write(file) on a temporary file next to `path`, then move it in place,
+    so a reader never sees a partial entry.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class VisibilityCache:
+    """
+    Content-addressed on-disk cache of ephemerides and visibility windows.
+
+    Ephemerides are keyed on the orbit fields of the satellite and the time
+    grid, and stored as .npy files opened as memory maps. Visibility windows
+    are stored per point, keyed on the orbit, the grid, the visibility
+    parameters and the coordinates of the point, so a new point only computes
+    its own windows and known points skip the propagation altogether.
+    """
+
+    def __init__(self, directory=os.path.join("output", "visibility_cache")) -> None:
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def orbit_key(satellite: Satellite) -> list:
+        return [repr(float(getattr(satellite, field))) for field in ORBIT_FIELDS]
+
+    def ephemeris(self, satellite: Satellite, begin, end, time_step) -> np.ndarray:
+        """
+        Positions of `satellite` on time_grid(begin, end, time_step), as a
+        read-only memory-mapped (times, 3) array.
+        """
+        key = _digest("ephemeris", self.orbit_key(satellite), [begin, end, time_step])
+        path = os.path.join(self.directory, "ephemeris", f"{key}.npy")
+        if not os.path.exists(path):
+            positions = satellite.positions_at(time_grid(begin, end, time_step))
+            _atomic_write(path, lambda f: np.save(f, positions))
+        return np.load(path, mmap_mode="r")
+
+    def availability(
+        self,
+        begin,
+        end,
+        satellite: Satellite,
+        labels,
+        points,
+        min_elevation_angle=10,
+        time_step=120,
+        engine="adaptive",
+        tolerance=1.0,
+        radius=6378,
+    ) -> dict:
+        """
+        all_availability of one satellite over the points (x, y, z) named by
+        `labels`, reading the cached windows and only computing the others.
+        """
+        params_key = _digest(
+            "visibility",
+            self.orbit_key(satellite),
+            [begin, end, time_step],
+            [min_elevation_angle, engine, tolerance, radius],
+        )
+        windows_dir = os.path.join(self.directory, "visibility", params_key)
+
+        availability = {}
+        missing = []
+        for label, point in zip(labels, points):
+            point_key = _digest([round(float(c), 6) for c in point])
+            path = os.path.join(windows_dir, f"{point_key}.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    windows = json.load(f)
+                self.hits += 1
+                if windows:
+                    availability[label] = windows
+            else:
+                missing.append((label, point, path))
+        self.misses += len(missing)
+
+        if missing:
+            tasks = ImagingTask(
+                labels=[label for label, _, _ in missing],
+                radius=radius,
+                points=[point for _, point, _ in missing],
+            )
+            ephemerides = None
+            if engine in ("numpy", "adaptive"):
+                ephemerides = [self.ephemeris(satellite, begin, end, time_step)]
+            computed = all_availability(
+                begin,
+                end,
+                [satellite],
+                tasks,
+                min_elevation_angle=min_elevation_angle,
+                time_step=time_step,
+                engine=engine,
+                tolerance=tolerance,
+                ephemerides=ephemerides,
+            )
+            for label, _, path in missing:
+                windows = [[int(start), int(stop)] for start, stop in computed.get(label, [])]
+                _atomic_write(path, lambda f: f.write(json.dumps(windows).encode()))
+                if windows:
+                    availability[label] = windows
+
+        return availability
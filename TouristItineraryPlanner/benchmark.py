@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Benchmark the itinerary solver on reproducible synthetic cities.
+
+Every run generates a fresh synthetic city (src/synthetic_city.py) with its own empty
+travel-time store, solves it and records the model size, timings, objective and number of
+distance API calls. Results are printed as a table and optionally written to CSV or JSON.
+
+Example:
+    python benchmark.py --sizes 50 200 1000 --engines exact lns --formulations circuit \\
+        --time-limit 30 --output results.csv
+"""
+import os
+import io
+import csv
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+from src.solver import TouristItinerarySolver
+from src.synthetic_city import generate_synthetic_graph
+from src.distance_api import StubTravelTimeProvider
+from data.travel_time_store import TravelTimeStore
+
+COLUMNS = [
+    "num_pois", "seed", "engine", "formulation", "scheduling", "candidates", "num_variables",
+    "num_constraints", "setup_time", "build_time", "solve_time", "total_time", "status", "objective",
+    "visits", "api_calls",
+]
+
+
+def run_benchmark(num_pois, seed, engine, formulation, scheduling, args, store_dir):
+    """Generate one city, solve it once and return the row of figures."""
+    graph = generate_synthetic_graph(num_pois, city=f"synthetic_{num_pois}_{seed}",
+                                     restaurant_ratio=args.restaurant_ratio, seed=seed)
+    store = TravelTimeStore(path=os.path.join(store_dir, f"{num_pois}_{seed}_{engine}_{formulation}_{scheduling}.sqlite"))
+    provider = StubTravelTimeProvider(latency=args.api_latency, seed=seed) if args.api == "stub" else None
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+        start = time.perf_counter()
+        solver = TouristItinerarySolver(
+            city=f"synthetic_{num_pois}_{seed}", graph=graph, start_time=args.start, end_time=args.end,
+            api_key=None, max_pois=args.max_pois, restaurant_count=args.restaurants,
+            use_api_for_distance=args.api != "off", travel_time_store=store, distance_provider=provider,
+            engine=engine,
+        )
+        setup_time = time.perf_counter() - start
+        itinerary = solver.solve(formulation=formulation, scheduling=scheduling, time_limit=args.time_limit)
+        total_time = time.perf_counter() - start
+
+    stats = solver.last_solve_stats or {}
+    return {
+        "num_pois": num_pois,
+        "seed": seed,
+        "engine": engine,
+        "formulation": stats.get("formulation", formulation),
+        "scheduling": stats.get("scheduling", scheduling),
+        "candidates": stats.get("num_pois"),
+        "num_variables": stats.get("num_variables"),
+        "num_constraints": stats.get("num_constraints"),
+        "setup_time": round(setup_time, 3),
+        "build_time": round(stats.get("build_time", 0.0), 3),
+        "solve_time": round(stats.get("solve_time", 0.0), 3),
+        "total_time": round(total_time, 3),
+        "status": stats.get("status"),
+        "objective": stats.get("objective"),
+        "visits": len(itinerary) if itinerary else 0,
+        "api_calls": solver.distance_calculator.request_count,
+    }
+
+
+def benchmark_configurations(args):
+    """(num_pois, seed, engine, formulation, scheduling) of every run; formulation is moot for LNS."""
+    for num_pois in args.sizes:
+        for seed in args.seeds:
+            for engine in args.engines:
+                formulations = ["circuit"] if engine == "lns" else args.formulations
+                for formulation in formulations:
+                    for scheduling in args.scheduling:
+                        yield num_pois, seed, engine, formulation, scheduling
+
+
+def print_table(rows):
+    """Print the rows as an aligned text table."""
+    widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in COLUMNS}
+    print("  ".join(column.rjust(widths[column]) for column in COLUMNS))
+    for row in rows:
+        print("  ".join(str(row[column]).rjust(widths[column]) for column in COLUMNS))
+
+
+def write_results(rows, path):
+    """Write the rows to `path`, as JSON if it ends in .json and as CSV otherwise."""
+    with open(path, "w", newline="") as f:
+        if path.endswith(".json"):
+            json.dump(rows, f, indent=2)
+        else:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+    print(f"Results written to {path}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the itinerary solver on synthetic cities.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200], help="Number of POIs per city")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0], help="Seeds of the generated cities")
+    parser.add_argument("--engines", nargs="+", default=["exact"], choices=TouristItinerarySolver.ENGINES)
+    parser.add_argument("--formulations", nargs="+", default=["circuit"],
+                        choices=TouristItinerarySolver.FORMULATIONS)
+    parser.add_argument("--scheduling", nargs="+", default=["reified"],
+                        choices=TouristItinerarySolver.SCHEDULING_MODES)
+    parser.add_argument("--time-limit", type=float, default=30, help="Solver time limit per run, in seconds")
+    parser.add_argument("--max-pois", type=int, default=6)
+    parser.add_argument("--restaurants", type=int, default=2)
+    parser.add_argument("--restaurant-ratio", type=float, default=0.2)
+    parser.add_argument("--start", default="09:00")
+    parser.add_argument("--end", default="21:00")
+    parser.add_argument("--api", choices=["off", "stub"], default="off",
+                        help="off: haversine travel times; stub: StubTravelTimeProvider, counting API calls")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Simulated latency of a stub API call")
+    parser.add_argument("--output", help="CSV (or .json) file to write the results to")
+    parser.add_argument("--verbose", action="store_true", help="Show the solver output")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="itinerary_benchmark_") as store_dir:
+        for configuration in benchmark_configurations(args):
+            row = run_benchmark(*configuration, args, store_dir)
+            rows.append(row)
+            print(f"{row['num_pois']} POIs, seed {row['seed']}, {row['engine']}/{row['formulation']}/"
+                  f"{row['scheduling']}: {row['status']}, objective {row['objective']}, "
+                  f"{row['total_time']}s", flush=True)
+
+    print()
+    print_table(rows)
+    if args.output:
+        write_results(rows, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS travel_times (
+    origin INTEGER NOT NULL,
+    destination INTEGER NOT NULL,
+    mode INTEGER NOT NULL,
+    minutes INTEGER NOT NULL,
+    PRIMARY KEY (origin, destination, mode)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS selected_modes (
+    origin INTEGER NOT NULL,
+    destination INTEGER NOT NULL,
+    mode INTEGER NOT NULL,
+    minutes INTEGER NOT NULL,
+    PRIMARY KEY (origin, destination)
+) WITHOUT ROWID;
+"""
+
+
+def get_travel_time_store_path(city):
+    """Return the path of a city's travel-time database."""
+    city = city.lower().replace(" ", "_")
+    graph_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'city_graphs')
+    return os.path.join(graph_dir, f"{city}_travel_times.sqlite")
+
+
+class TravelTimeStore:
+    """Append-only on-disk store of travel times between POIs.
+
+    Two keyed tables live in one SQLite file per city:
+      - travel_times: (origin, destination, mode) -> minutes, as estimated by the distance API
+      - selected_modes: (origin, destination) -> (mode, minutes), the solver's preferred option
+
+    The database is only opened on first access. Each thread gets its own connection and
+    the file runs in WAL mode, so several Flask workers can read and append concurrently.
+    """
+
+    def __init__(self, city=None, path=None):
+        """Create a store for `city`, or at an explicit `path`."""
+        if path is None:
+            if city is None:
+                raise ValueError("TravelTimeStore needs a city or a path")
+            path = get_travel_time_store_path(city)
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        """Open (once per thread) the connection to the database."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            logger.debug(f"Opened travel-time store {self.path}")
+        return conn
+
+    def get(self, origin, destination, mode):
+        """Return the stored travel time in minutes, or None."""
+        row = self._connection().execute(
+            "SELECT minutes FROM travel_times WHERE origin = ? AND destination = ? AND mode = ?",
+            (int(origin), int(destination), int(mode))).fetchone()
+        return row[0] if row else None
+
+    def put(self, origin, destination, mode, minutes):
+        """Record a travel time; the first value written for a key is kept."""
+        self.put_many([(origin, destination, mode, minutes)])
+
+    def put_many(self, rows):
+        """Record many (origin, destination, mode, minutes) rows in one transaction."""
+        rows = [(int(o), int(d), int(m), int(t)) for o, d, m, t in rows]
+        if not rows:
+            return
+        conn = self._connection()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO travel_times VALUES (?, ?, ?, ?)", rows)
+
+    def get_selected(self, origin, destination):
+        """Return the stored (mode, minutes) preferred between two POIs, or None."""
+        row = self._connection().execute(
+            "SELECT mode, minutes FROM selected_modes WHERE origin = ? AND destination = ?",
+            (int(origin), int(destination))).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put_selected(self, origin, destination, mode, minutes):
+        """Record the preferred (mode, minutes) between two POIs."""
+        self.put_selected_many([(origin, destination, mode, minutes)])
+
+    def put_selected_many(self, rows):
+        """Record many (origin, destination, mode, minutes) preferred options in one transaction."""
+        rows = [(int(o), int(d), int(m), int(t)) for o, d, m, t in rows]
+        if not rows:
+            return
+        conn = self._connection()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO selected_modes VALUES (?, ?, ?, ?)", rows)
+
+    def load_selected(self, pois):
+        """Return {(origin, destination): (mode, minutes)} for all stored pairs among `pois`."""
+        pois = [int(poi) for poi in pois]
+        conn = self._connection()
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted_pois (id INTEGER PRIMARY KEY)")
+        with conn:
+            conn.execute("DELETE FROM wanted_pois")
+            conn.executemany("INSERT OR IGNORE INTO wanted_pois VALUES (?)", [(poi,) for poi in pois])
+        rows = conn.execute(
+            "SELECT origin, destination, mode, minutes FROM selected_modes "
+            "WHERE origin IN (SELECT id FROM wanted_pois) AND destination IN (SELECT id FROM wanted_pois)")
+        return {(o, d): (m, t) for o, d, m, t in rows}
+
+    def count_selected(self):
+        """Number of POI pairs with a preferred mode stored."""
+        if not os.path.exists(self.path) and self.path != ":memory:":
+            return 0
+        return self._connection().execute("SELECT COUNT(*) FROM selected_modes").fetchone()[0]
+
+    def close(self):
+        """Close this thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -4,10 +4,13 @@ import os
 import json
 import logging
 import traceback
+import threading
 from datetime import datetime
 from dotenv import load_dotenv
 from src.solver import TouristItinerarySolver
-from flask import Flask, request, jsonify, render_template
+from src.solve_cache import SolveCache, make_plan_request
+from src.solve_service import SolveService, QueueFullError
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 
 # Configure logging
 log_dir = os.path.join(os.path.dirname(__file__), 'logs')
@@ -32,6 +35,29 @@ logger.info("=" * 50)
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 
+# Recent itineraries, reused verbatim for identical requests and as warm starts for near misses
+solve_cache = SolveCache(
+    max_entries=int(os.environ.get('SOLVE_CACHE_SIZE', 128)),
+    ttl_seconds=int(os.environ.get('SOLVE_CACHE_TTL', 3600))
+)
+
+# POI IDs matched by the LLM for a city's mandatory POI text, so a repeated request skips the OpenAI call
+mandatory_poi_cache = SolveCache(
+    max_entries=int(os.environ.get('SOLVE_CACHE_SIZE', 128)),
+    ttl_seconds=int(os.environ.get('SOLVE_CACHE_TTL', 3600))
+)
+
+# Worker processes for /api/jobs; started on the first submitted job
+solve_service = SolveService(
+    num_workers=int(os.environ.get('SOLVE_WORKERS', 2)),
+    time_limit=int(os.environ.get('SOLVE_JOB_TIME_LIMIT', 60)),
+    max_queued=int(os.environ.get('SOLVE_MAX_QUEUED', 100)),
+    preload_cities=[city.strip() for city in os.environ.get('SOLVE_PRELOAD_CITIES', '').split(',') if city.strip()]
+)
+
+# Streamed solves run in the request threads: at most as many at once as /api/jobs workers
+stream_slots = threading.BoundedSemaphore(solve_service.num_workers)
+
 def _simple_poi_matching(mandatory_pois_text, poi_data):
     """Simple string matching for POIs"""
     mandatory_poi_ids = []
@@ -43,7 +69,7 @@ def _simple_poi_matching(mandatory_pois_text, poi_data):
                 break
     return mandatory_poi_ids
 
-def identify_mandatory_pois(city, mandatory_pois_text, api_key=None):
+def identify_mandatory_pois(city, mandatory_pois_text, api_key=None, graph=None):
     """Use LLM to match user-entered POI names to actual POI IDs in the database"""
     logger.info(f"Identifying mandatory POIs for {city}: {mandatory_pois_text}")
     
@@ -53,8 +79,10 @@ def identify_mandatory_pois(city, mandatory_pois_text, api_key=None):
         
     try:
         # Load the city graph to get actual POIs
-        from data.city_graph import load_graph
-        city_graph = load_graph(city.lower())
+        city_graph = graph
+        if city_graph is None:
+            from data.city_graph import load_graph
+            city_graph = load_graph(city.lower())
         
         if not city_graph:
             logger.warning(f"No graph found for {city}, cannot match mandatory POIs")
@@ -145,8 +173,77 @@ Do not include any explanation or additional text in your response, only the JSO
         logger.error(traceback.format_exc())
         return []
 
-def plan_itinerary(city, start_time="08:00", end_time="22:00", max_pois=6, restaurant_count=1, api_key=None, mandatory_poi_ids=None, use_api_for_distance=True):
-    """Plan a tourist itinerary and return the results"""
+def _warm_start_hint(plan_request):
+    """Shift the itinerary of a cached near-miss request to this request's start time, or return None."""
+    similar = solve_cache.find_similar(plan_request)
+    if similar is None:
+        return None
+    similar_request, similar_result = similar
+    offset = 0
+    if isinstance(similar_request.start_minutes, int) and isinstance(plan_request.start_minutes, int):
+        offset = similar_request.start_minutes - plan_request.start_minutes
+    logger.info(f"Warm-starting from cached itinerary for {similar_request}")
+    return [(poi_id, arrival + offset, departure + offset)
+            for poi_id, arrival, departure in similar_result['raw_itinerary']]
+
+def _is_optimal(stats):
+    """True if the solve stats prove the itinerary optimal (every day of a multi-day plan)."""
+    if not stats:
+        return False
+    if 'days' in stats:
+        return all(day.get('status') == "OPTIMAL" for day in stats['days'])
+    return stats.get('status') == "OPTIMAL"
+
+def _create_solver(city, start_time, end_time, max_pois, restaurant_count, api_key, mandatory_poi_ids,
+                   use_api_for_distance, formulation, scheduling, graph, engine="exact"):
+    """Load the city graph if needed and set up a TouristItinerarySolver for the request."""
+    # Try to load the graph with cached travel times, unless the caller keeps it resident
+    if graph is None:
+        from data.city_graph import load_graph
+        graph = load_graph(city.lower())
+    
+    # Verify graph loaded correctly with travel times
+    if graph is not None:
+        edge_count = 0
+        edges_with_travel_times = 0
+        
+        for u, v in graph.edges():
+            edge_count += 1
+            if 'travel_time' in graph[u][v]:
+                edges_with_travel_times += 1
+        
+        # Travel times computed since the graph was pickled live in the travel-time store
+        from data.travel_time_store import TravelTimeStore
+        edges_with_travel_times = max(edges_with_travel_times, TravelTimeStore(city).count_selected())
+        
+        # Define has_travel_times variable based on coverage percentage
+        has_travel_times = edge_count > 0 and edges_with_travel_times / edge_count >= 0.5
+        logger.info(f"Loaded graph with {edges_with_travel_times}/{edge_count} edges having travel times")
+        logger.info(f"Has sufficient travel times: {has_travel_times}")
+    else:
+        # If no graph was loaded, we definitely don't have travel times
+        has_travel_times = False
+    
+    logger.debug("Initializing TouristItinerarySolver")
+    return TouristItinerarySolver(
+        city=city,
+        graph=graph,  # Pass the loaded graph
+        start_time=start_time, 
+        end_time=end_time,
+        mandatory_visits=mandatory_poi_ids,
+        api_key=api_key,
+        max_neighbors=3,
+        mandatory_restaurant=True if restaurant_count > 0 else False,
+        restaurant_count=restaurant_count,
+        max_pois=max_pois,
+        use_api_for_distance=use_api_for_distance and not has_travel_times,  # Skip API if we have cached times
+        formulation=formulation,
+        scheduling=scheduling,
+        engine=engine
+    )
+
+def plan_itinerary(city, start_time="08:00", end_time="22:00", max_pois=6, restaurant_count=1, api_key=None, mandatory_poi_ids=None, use_api_for_distance=True, formulation="positional", scheduling="reified", graph=None, time_limit=60, num_days=1, engine="exact"):
+    """Plan a tourist itinerary over `num_days` days and return the results"""
     logger.info(f"Planning itinerary for {city}")
     logger.info(f"Time window: {start_time} - {end_time}")
     
@@ -155,58 +252,55 @@ def plan_itinerary(city, start_time="08:00", end_time="22:00", max_pois=6, resta
         if mandatory_poi_ids is None:
             mandatory_poi_ids = []
         
-        # Try to load the graph with cached travel times
-        from data.city_graph import load_graph
-        graph = load_graph(city.lower())
+        # Return a recent identical plan straight from the cache (if optimal, or solved with this much time)
+        plan_request = make_plan_request(city, start_time, end_time, max_pois, restaurant_count,
+                                         mandatory_poi_ids, use_api_for_distance, formulation, scheduling, num_days,
+                                         engine)
+        cached_result = solve_cache.get(plan_request, time_limit)
+        if cached_result is not None:
+            logger.info(f"Returning cached itinerary for {plan_request}")
+            return dict(cached_result, stats=dict(cached_result['stats'], cache="hit"))
         
-        # Verify graph loaded correctly with travel times
-        if graph is not None:
-            edge_count = 0
-            edges_with_travel_times = 0
+        solver = _create_solver(city, start_time, end_time, max_pois, restaurant_count, api_key, mandatory_poi_ids,
+                                use_api_for_distance, formulation, scheduling, graph, engine)
+        
+        if num_days > 1:
+            # One itinerary per day, over disjoint sets of POIs
+            hint_itinerary = None
+            itinerary = solver.solve_multi_day(num_days, max_pois=max_pois, time_limit=time_limit)
+            formatted_itinerary = "\n".join(f"Day {day}\n\n{solver.format_itinerary(day_itinerary)}"
+                                             for day, day_itinerary in enumerate(itinerary, start=1))
+            failed_days = [day for day, day_itinerary in enumerate(itinerary, start=1) if not day_itinerary]
+            if failed_days:
+                # A partial plan is neither returned as a success nor cached
+                return {
+                    "success": False,
+                    "error": f"No feasible itinerary found for day(s) {', '.join(map(str, failed_days))}"
+                }
+        else:
+            # A near-miss request (e.g. a shifted end time) still provides a good warm start
+            hint_itinerary = _warm_start_hint(plan_request)
             
-            for u, v in graph.edges():
-                edge_count += 1
-                if 'travel_time' in graph[u][v]:
-                    edges_with_travel_times += 1
+            # Solve the problem
+            itinerary = solver.solve(max_pois=max_pois, time_limit=time_limit, hint_itinerary=hint_itinerary)
             
-            # Define has_travel_times variable based on coverage percentage
-            has_travel_times = edge_count > 0 and edges_with_travel_times / edge_count >= 0.5
-            logger.info(f"Loaded graph with {edges_with_travel_times}/{edge_count} edges having travel times")
-            logger.info(f"Has sufficient travel times: {has_travel_times}")
-        else:
-            # If no graph was loaded, we definitely don't have travel times
-            has_travel_times = False
-        
-        logger.debug("Initializing TouristItinerarySolver")
-        solver = TouristItinerarySolver(
-            city=city,
-            graph=graph,  # Pass the loaded graph
-            start_time=start_time, 
-            end_time=end_time,
-            mandatory_visits=mandatory_poi_ids,
-            api_key=api_key,
-            max_neighbors=3,
-            mandatory_restaurant=True if restaurant_count > 0 else False,
-            restaurant_count=restaurant_count,
-            max_pois=max_pois,
-            use_api_for_distance=use_api_for_distance and not has_travel_times  # Skip API if we have cached times
-        )
-        
-        # Solve the problem
-        itinerary = solver.solve(max_pois=max_pois)
-        
-        # Format the itinerary
-        formatted_itinerary = solver.format_itinerary(itinerary)
+            # Format the itinerary
+            formatted_itinerary = solver.format_itinerary(itinerary)
         
         # Return results
-        return {
+        result = {
             "success": True,
             "itinerary": formatted_itinerary,
             "raw_itinerary": itinerary,
             "stats": {
-                "api_requests": solver.distance_calculator.request_count
+                "api_requests": solver.distance_calculator.request_count,
+                "model": solver.last_solve_stats,
+                "cache": "warm_start" if hint_itinerary else "miss"
             }
         }
+        if itinerary:
+            solve_cache.put(plan_request, result, time_limit, optimal=_is_optimal(solver.last_solve_stats))
+        return result
         
     except Exception as e:
         return {
@@ -214,6 +308,168 @@ def plan_itinerary(city, start_time="08:00", end_time="22:00", max_pois=6, resta
             "error": str(e)
         }
 
+def stream_itinerary(city, start_time="08:00", end_time="22:00", max_pois=6, restaurant_count=1, api_key=None, mandatory_poi_ids=None, use_api_for_distance=True, formulation="positional", scheduling="reified", graph=None, time_limit=60, num_days=1, engine="exact"):
+    """Plan a tourist itinerary, yielding each improving plan and then the final result.
+
+    Intermediate items have `final` set to False and carry the formatted and raw itinerary
+    with its objective; the last item is the plan_itinerary() result with `final` set to True.
+    Multi-day and LNS plans are not streamed: only the final item is yielded.
+    """
+    if num_days > 1 or engine != "exact":
+        yield dict(plan_itinerary(city, start_time, end_time, max_pois, restaurant_count, api_key, mandatory_poi_ids,
+                                  use_api_for_distance, formulation, scheduling, graph, time_limit, num_days, engine),
+                   final=True)
+        return
+    
+    try:
+        if mandatory_poi_ids is None:
+            mandatory_poi_ids = []
+        
+        plan_request = make_plan_request(city, start_time, end_time, max_pois, restaurant_count,
+                                         mandatory_poi_ids, use_api_for_distance, formulation, scheduling, num_days,
+                                         engine)
+        cached_result = solve_cache.get(plan_request, time_limit)
+        if cached_result is not None:
+            logger.info(f"Returning cached itinerary for {plan_request}")
+            yield dict(cached_result, stats=dict(cached_result['stats'], cache="hit"), final=True)
+            return
+        
+        hint_itinerary = _warm_start_hint(plan_request)
+        solver = _create_solver(city, start_time, end_time, max_pois, restaurant_count, api_key, mandatory_poi_ids,
+                                use_api_for_distance, formulation, scheduling, graph, engine)
+        
+        for solution in solver.solve_iter(max_pois=max_pois, time_limit=time_limit, hint_itinerary=hint_itinerary):
+            if not solution['final']:
+                yield {
+                    "success": True,
+                    "itinerary": solver.format_itinerary(solution['itinerary']),
+                    "raw_itinerary": solution['itinerary'],
+                    "objective": solution['objective'],
+                    "wall_time": solution['wall_time'],
+                    "final": False
+                }
+                continue
+            
+            itinerary = solution['itinerary']
+            result = {
+                "success": True,
+                "itinerary": solver.format_itinerary(itinerary),
+                "raw_itinerary": itinerary,
+                "stats": {
+                    "api_requests": solver.distance_calculator.request_count,
+                    "model": solver.last_solve_stats,
+                    "cache": "warm_start" if hint_itinerary else "miss"
+                }
+            }
+            if itinerary:
+                solve_cache.put(plan_request, result, time_limit, optimal=_is_optimal(solver.last_solve_stats))
+            yield dict(result, final=True)
+    
+    except Exception as e:
+        yield {
+            "success": False,
+            "error": str(e),
+            "final": True
+        }
+
+def plan_arguments(data, graph_cache=None):
+    """Turn the JSON body of an /api/plan request into plan_itinerary() keyword arguments.
+
+    Generates the city data if needed and matches the requested mandatory POIs. `graph_cache`
+    maps lowercased city names to graphs kept in memory between calls.
+    """
+    city = data.get('city')
+    start_time = data.get('start_time', "08:00")
+    end_time = data.get('end_time', "22:00")
+    max_pois = int(data.get('max_pois', 6))
+    restaurant_count = int(data.get('restaurant_count', 1))
+    mandatory_pois_text = data.get('mandatory_pois', '').strip()
+    use_api_for_distance = data.get('use_api_for_distance', True)
+    formulation = data.get('formulation', 'positional')
+    scheduling = data.get('scheduling', 'reified')
+    num_days = int(data.get('num_days', 1))
+    engine = data.get('engine', 'exact')
+    
+    logger.info(f"Planning itinerary for {city} from {start_time} to {end_time}")
+    logger.info(f"Max POIs: {max_pois}, Restaurant count: {restaurant_count}")
+    if mandatory_pois_text:
+        logger.info(f"Mandatory POIs requested: {mandatory_pois_text}")
+    
+    # Get API key from environment
+    api_key = os.environ.get('OPENAI_API_KEY')
+    if not api_key:
+        logger.warning("No OpenAI API key found in environment")
+    
+    # Check data/city_graph.py for graph existence
+    from data.city_graph import check_city_graph_exists, load_graph
+    graph_exists = check_city_graph_exists(city.lower())
+    logger.info(f"Graph exists for {city}: {graph_exists}")
+
+    import src.city_generator as city_generator
+    if not graph_exists:
+        city_generator.generate_city_data(city, api_key)
+    
+    # Keep the graph resident when the caller provides a cache
+    graph = None
+    if graph_cache is not None:
+        graph = graph_cache.get(city.lower())
+        if graph is None:
+            graph = load_graph(city.lower())
+            if graph is not None:
+                graph_cache[city.lower()] = graph
+    
+    # After graph is created, identify mandatory POIs if any were specified
+    mandatory_poi_ids = []
+    if mandatory_pois_text:
+        logger.info(f"Identifying mandatory POIs: {mandatory_pois_text}")
+        # Now that the graph should exist, identify mandatory POIs (once per city and text)
+        match_key = (city.strip().lower(), " ".join(mandatory_pois_text.lower().split()))
+        mandatory_poi_ids = mandatory_poi_cache.get(match_key)
+        if mandatory_poi_ids is None:
+            mandatory_poi_ids = identify_mandatory_pois(city, mandatory_pois_text, api_key, graph=graph)
+            if mandatory_poi_ids:
+                mandatory_poi_cache.put(match_key, mandatory_poi_ids)
+        logger.info(f"Identified mandatory POI IDs: {mandatory_poi_ids}")
+        if mandatory_poi_ids:
+            logger.info(f"Re-planning itinerary with mandatory POIs: {mandatory_poi_ids}")
+    
+    return dict(
+        city=city, 
+        start_time=start_time, 
+        end_time=end_time, 
+        max_pois=max_pois, 
+        restaurant_count=restaurant_count, 
+        api_key=api_key, 
+        mandatory_poi_ids=mandatory_poi_ids,
+        use_api_for_distance=use_api_for_distance,
+        formulation=formulation,
+        scheduling=scheduling,
+        graph=graph,
+        num_days=num_days,
+        engine=engine
+    )
+
+def requested_time_limit(data):
+    """The 'time_limit' of a request body, capped by the service limit (SOLVE_JOB_TIME_LIMIT), or None.
+
+    Raises ValueError if it is not a positive number of seconds.
+    """
+    time_limit = data.get('time_limit')
+    if time_limit is None:
+        return None
+    try:
+        if isinstance(time_limit, bool):
+            raise ValueError
+        time_limit = float(time_limit)
+    except (TypeError, ValueError):
+        raise ValueError(f"'time_limit' must be a number of seconds, got {time_limit!r}") from None
+    if not 0 < time_limit < float('inf'):
+        raise ValueError(f"'time_limit' must be a positive number of seconds, got {time_limit}")
+    return min(time_limit, solve_service.time_limit)
+
+def plan_request(data, graph_cache=None, time_limit=60):
+    """Plan an itinerary from the JSON body of an /api/plan request."""
+    return plan_itinerary(**plan_arguments(data, graph_cache), time_limit=time_limit)
 
 @app.route('/')
 def index():
@@ -229,65 +485,7 @@ def api_plan():
         data = request.json
         logger.debug(f"Request data: {json.dumps(data)}")
         
-        city = data.get('city')
-        start_time = data.get('start_time', "08:00")
-        end_time = data.get('end_time', "22:00")
-        max_pois = int(data.get('max_pois', 6))
-        restaurant_count = int(data.get('restaurant_count', 1))
-        mandatory_pois_text = data.get('mandatory_pois', '').strip()
-        use_api_for_distance = data.get('use_api_for_distance', True)
-        
-        logger.info(f"Planning itinerary for {city} from {start_time} to {end_time}")
-        logger.info(f"Max POIs: {max_pois}, Restaurant count: {restaurant_count}")
-        if mandatory_pois_text:
-            logger.info(f"Mandatory POIs requested: {mandatory_pois_text}")
-        
-        # Get API key from environment
-        api_key = os.environ.get('OPENAI_API_KEY')
-        if not api_key:
-            logger.warning("No OpenAI API key found in environment")
-        
-        # Check data/city_graph.py for graph existence
-        from data.city_graph import check_city_graph_exists, load_graph
-        graph_exists = check_city_graph_exists(city.lower())
-        logger.info(f"Graph exists for {city}: {graph_exists}")
-
-        import src.city_generator as city_generator
-        if not graph_exists:
-            city_generator.generate_city_data(city, api_key)
-        
-        # After graph is created, identify mandatory POIs if any were specified
-        mandatory_poi_ids = []
-        if mandatory_pois_text:
-            logger.info(f"Identifying mandatory POIs: {mandatory_pois_text}")
-            # Now that the graph should exist, identify mandatory POIs
-            mandatory_poi_ids = identify_mandatory_pois(city, mandatory_pois_text, api_key)
-            logger.info(f"Identified mandatory POI IDs: {mandatory_poi_ids}")
-            print("ici")
-            # If we found mandatory POIs, re-run the planner to include them
-            if mandatory_poi_ids:
-                logger.info(f"Re-planning itinerary with mandatory POIs: {mandatory_poi_ids}")
-                result = plan_itinerary(
-                    city, 
-                    start_time, 
-                    end_time, 
-                    max_pois, 
-                    restaurant_count, 
-                    api_key, 
-                    mandatory_poi_ids,
-                    use_api_for_distance  # Add this parameter
-                )
-        else:
-            # If no mandatory POIs, just plan the itinerary
-            result = plan_itinerary(
-                city, 
-                start_time, 
-                end_time, 
-                max_pois, 
-                restaurant_count, 
-                api_key,
-                use_api_for_distance  # Add this parameter
-            )
+        result = plan_request(data)
         
         logger.info("Itinerary planning completed successfully")
         logger.debug(f"Result: {json.dumps(result)}")
@@ -299,6 +497,87 @@ def api_plan():
         logger.error(traceback.format_exc())
         return jsonify({"error": error_msg}), 500
 
+@app.route('/api/plan/stream', methods=['POST'])
+def api_plan_stream():
+    """Server-Sent Events variant of /api/plan: one `solution` event per improving itinerary, then `done`"""
+    logger.info("Received streaming itinerary planning request")
+    data = request.json or {}
+    logger.debug(f"Request data: {json.dumps(data)}")
+    
+    try:
+        time_limit = requested_time_limit(data) or solve_service.time_limit
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if not stream_slots.acquire(blocking=False):
+        error_msg = f"All {solve_service.num_workers} solver slots are busy, try again later"
+        logger.warning(error_msg)
+        return jsonify({"error": error_msg}), 503
+    
+    def events():
+        try:
+            arguments = plan_arguments(data)
+            for item in stream_itinerary(**arguments, time_limit=time_limit):
+                if not item.get('success', False):
+                    event = "error"
+                elif item['final']:
+                    event = "done"
+                else:
+                    event = "solution"
+                yield f"event: {event}\ndata: {json.dumps(item)}\n\n"
+        except Exception as e:
+            error_msg = f"Error planning itinerary: {str(e)}"
+            logger.error(error_msg)
+            logger.error(traceback.format_exc())
+            yield f"event: error\ndata: {json.dumps({'success': False, 'error': error_msg, 'final': True})}\n\n"
+    
+    response = Response(stream_with_context(events()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Also released when the client disconnects, which closes the stream and stops the search
+    response.call_on_close(stream_slots.release)
+    return response
+
+@app.route('/api/jobs', methods=['POST'])
+def api_submit_job():
+    """Queue an itinerary planning request on the solve worker pool"""
+    data = request.json or {}
+    if not data.get('city'):
+        return jsonify({"error": "Missing 'city'"}), 400
+    
+    try:
+        time_limit = requested_time_limit(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        job = solve_service.submit(data, time_limit=time_limit)
+    except QueueFullError as e:
+        logger.warning(str(e))
+        return jsonify({"error": str(e)}), 503
+    
+    logger.info(f"Queued planning job {job['id']} for {data.get('city')}")
+    return jsonify(job), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job_status(job_id):
+    """Poll a planning job; `?wait=N` blocks up to N seconds for it to finish"""
+    wait = request.args.get('wait', type=float)
+    if wait:
+        job = solve_service.wait(job_id, timeout=min(wait, 60))
+    else:
+        job = solve_service.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def api_cancel_job(job_id):
+    """Cancel a queued or running planning job"""
+    job = solve_service.cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return jsonify(job)
+
 @app.route('/api/fun-facts', methods=['POST'])
 def api_fun_facts():
     """API endpoint for getting fun facts about a city"""
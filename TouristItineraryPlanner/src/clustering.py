@@ -0,0 +1,125 @@
+import math
+
+import numpy as np
+
+from src.spatial_index import KM_PER_DEGREE_LAT
+
+
+def project_km(latitudes, longitudes):
+    """Project coordinates onto a local plane in kilometers (city-scale equirectangular approximation)."""
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    cos_ref = max(math.cos(math.radians(float(np.mean(latitudes)))), 1e-6) if len(latitudes) else 1.0
+    return np.column_stack([longitudes * KM_PER_DEGREE_LAT * cos_ref, latitudes * KM_PER_DEGREE_LAT])
+
+
+def kmeans(points, k, seed=0, max_iter=100):
+    """Lloyd's k-means with k-means++ seeding; returns (labels, centroids)."""
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+
+    # k-means++: pick each new centroid with probability proportional to the squared distance
+    centroids = [points[rng.integers(n)]]
+    closest = np.sum((points - centroids[0]) ** 2, axis=1)
+    for _ in range(1, k):
+        total = closest.sum()
+        idx = rng.choice(n, p=closest / total) if total > 0 else rng.integers(n)
+        centroids.append(points[idx])
+        closest = np.minimum(closest, np.sum((points - points[idx]) ** 2, axis=1))
+    centroids = np.array(centroids)
+
+    labels = np.full(n, -1)
+    for _ in range(max_iter):
+        distances = np.sum((points[:, np.newaxis, :] - centroids[np.newaxis, :, :]) ** 2, axis=2)
+        new_labels = np.argmin(distances, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = points[labels == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+            else:
+                # Re-seed an empty cluster on the point farthest from its centroid
+                far = np.argmax(distances[np.arange(n), labels])
+                centroids[c] = points[far]
+                labels[far] = c
+    return labels, centroids
+
+
+def _ensure_minimums(labels, points, centroids, groups):
+    """Move the closest eligible points into clusters holding fewer than the minimum of a group.
+
+    `groups` is a list of (eligible mask, minimum). A point is only taken from a cluster that
+    keeps the minimum of every group the point belongs to.
+    """
+    k = len(centroids)
+    counts = [np.bincount(labels[eligible], minlength=k) for eligible, _ in groups]
+    for g, (eligible, minimum) in enumerate(groups):
+        for c in range(k):
+            while counts[g][c] < minimum:
+                donors = np.flatnonzero(eligible & (labels != c))
+                keeps = np.ones(len(donors), dtype=bool)
+                for h, (other, other_minimum) in enumerate(groups):
+                    keeps &= ~other[donors] | (counts[h][labels[donors]] > other_minimum)
+                donors = donors[keeps]
+                if len(donors) == 0:
+                    break
+                idx = donors[np.argmin(np.sum((points[donors] - centroids[c]) ** 2, axis=1))]
+                for h, (other, _) in enumerate(groups):
+                    if other[idx]:
+                        counts[h][labels[idx]] -= 1
+                        counts[h][c] += 1
+                labels[idx] = c
+
+
+def _ensure_maximum(labels, points, centroids, eligible, maximum):
+    """Move eligible points out of clusters holding more than `maximum` of them, to the closest cluster with room."""
+    k = len(centroids)
+    counts = np.bincount(labels[eligible], minlength=k)
+    for c in range(k):
+        while counts[c] > maximum:
+            members = np.flatnonzero(eligible & (labels == c))
+            receivers = np.flatnonzero(counts < maximum)
+            if len(receivers) == 0:
+                return
+            distances = np.sum((points[members][:, np.newaxis, :] - centroids[receivers][np.newaxis, :, :]) ** 2, axis=2)
+            member, receiver = np.unravel_index(np.argmin(distances), distances.shape)
+            idx, target = members[member], receivers[receiver]
+            counts[c] -= 1
+            counts[target] += 1
+            labels[idx] = target
+
+
+def partition_pois(graph, pois, num_parts, minimums=(), mandatory=(), max_mandatory=None, seed=0):
+    """Split POIs into `num_parts` geographic clusters, one per day, closest to their centroid first.
+
+    `minimums` is a list of (POI collection, minimum): clusters are adjusted so that, when
+    possible, each holds at least that many POIs of the collection. Each cluster also holds
+    at most `max_mandatory` of the `mandatory` POIs. Returns a list of `num_parts` POI lists;
+    a POI appears in exactly one of them.
+    """
+    pois = list(pois)
+    if not pois:
+        return [[] for _ in range(num_parts)]
+
+    points = project_km([graph.nodes[p]['latitude'] for p in pois], [graph.nodes[p]['longitude'] for p in pois])
+    labels, centroids = kmeans(points, num_parts, seed=seed)
+
+    groups = []
+    for members, minimum in minimums:
+        members = set(members)
+        groups.append((np.array([p in members for p in pois]), minimum))
+    if groups:
+        _ensure_minimums(labels, points, centroids, groups)
+    if max_mandatory is not None:
+        mandatory = set(mandatory)
+        _ensure_maximum(labels, points, centroids, np.array([p in mandatory for p in pois]), max_mandatory)
+
+    parts = [[] for _ in range(num_parts)]
+    order = np.argsort(np.sum((points - centroids[labels]) ** 2, axis=1), kind='stable')
+    for idx in order:
+        parts[labels[idx]].append(pois[idx])
+    return parts
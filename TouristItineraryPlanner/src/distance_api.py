@@ -2,23 +2,61 @@ import openai
 import time
 import json
 import os
+import re
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MODE_STRINGS = ["walking", "public transport", "car"]
+
+SYSTEM_PROMPT = "You are a helpful assistant that provides precise travel time estimates."
+
+logger = logging.getLogger(__name__)
+
+
+class TravelTimeProviderError(RuntimeError):
+    """Raised by a travel time provider that could not answer a prompt."""
+
+
+# Errors of a provider call or of its answer; anything else is a bug and propagates
+PROVIDER_ERRORS = (openai.OpenAIError, TravelTimeProviderError, ValueError)
+
 
 class DistanceCalculator:
     """Calculates travel times between POIs using OpenAI API."""
     
-    def __init__(self, api_key=None, use_api=True, batch_size=10):
-        """Initialize the distance calculator with API key."""
+    def __init__(self, api_key=None, use_api=True, batch_size=10, store=None, provider=None,
+                 prefetch_batch_size=50, max_concurrency=4, max_retries=2):
+        """Initialize the distance calculator with API key and an optional persistent TravelTimeStore.
+        
+        provider is a callable taking a prompt and returning the model's text answer; it
+        defaults to the OpenAI chat API (see StubTravelTimeProvider for offline runs) and
+        raises TravelTimeProviderError when it cannot answer.
+        The prefetch_* / max_* settings drive get_travel_times_batch.
+        Haversine fallbacks are only cached in memory, never written to the store, so a
+        later run asks the API again for them.
+        """
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
         self.use_api = use_api
         self.batch_size = batch_size
-        if not self.api_key:
+        self.store = store
+        self.provider = provider
+        if use_api and not self.api_key and provider is None:
             raise ValueError("OpenAI API key is required")
             
-        openai.api_key = self.api_key
+        if self.api_key:
+            openai.api_key = self.api_key
         self.cache = {}  # Cache to store previous requests
         self.request_count = 0  # Counter for API requests
         self.request_queue = []  # Queue for batch requests
         
+        # Concurrent batch mode
+        self.prefetch_batch_size = prefetch_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._count_lock = threading.Lock()
+        
     def get_travel_time(self, origin, destination, mode):
         """Get travel time between two POIs."""
         # Create a cache key
@@ -28,10 +66,17 @@ class DistanceCalculator:
         if cache_key in self.cache:
             return self.cache[cache_key]
         
+        # Check the persistent store before asking the API
+        if self.store is not None:
+            stored_time = self.store.get(origin['ID'], destination['ID'], mode)
+            if stored_time is not None:
+                self.cache[cache_key] = stored_time
+                return stored_time
+        
         # If not using API, use haversine formula
         if not self.use_api:
             travel_time = self._fallback_travel_time(origin, destination, mode)
-            self.cache[cache_key] = travel_time
+            self._remember(origin, destination, mode, travel_time, persist=False)
             return travel_time
             
         # Add to request queue
@@ -53,34 +98,15 @@ class DistanceCalculator:
         if not self.request_queue:
             return
             
-        # Define mode of transportation strings
-        mode_strings = ["walking", "public transport", "car"]
-        
         # Create a batch prompt
-        batch_prompt = "Calculate travel times in minutes between multiple location pairs:\n\n"
-        for i, (origin, destination, mode, _) in enumerate(self.request_queue):
-            batch_prompt += f"Request {i+1}:\n"
-            batch_prompt += f"  Origin: {origin['Nom']} at coordinates {origin['latitude']}, {origin['longitude']}\n"
-            batch_prompt += f"  Destination: {destination['Nom']} at coordinates {destination['latitude']}, {destination['longitude']}\n"
-            batch_prompt += f"  Mode: {mode_strings[mode]}\n\n"
-            
-        batch_prompt += "Respond with a JSON array of travel times in minutes. For example: [15, 25, 10, ...]"
+        batch_prompt = self._build_batch_prompt(
+            [(origin, destination, mode) for origin, destination, mode, _ in self.request_queue])
             
         try:
             self.request_count += 1  # Count as one API request
             
-            # Call OpenAI API
-            response = openai.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that provides precise travel time estimates."},
-                    {"role": "user", "content": batch_prompt}
-                ],
-                temperature=0
-            )
-            
-            # Parse the response
-            content = response.choices[0].message.content.strip()
+            # Call the provider and parse the response
+            content = self._complete(batch_prompt).strip()
             
             try:
                 # Try to parse the JSON response
@@ -89,20 +115,25 @@ class DistanceCalculator:
                 # Add results to cache
                 for i, (origin, destination, mode, cache_key) in enumerate(self.request_queue):
                     if i < len(times) and isinstance(times[i], (int, float)):
-                        self.cache[cache_key] = int(times[i])
+                        self._remember(origin, destination, mode, int(times[i]))
                     else:
                         # Fallback for missing or invalid results
-                        self.cache[cache_key] = self._fallback_travel_time(origin, destination, mode)
+                        self._remember(origin, destination, mode,
+                                       self._fallback_travel_time(origin, destination, mode), persist=False)
                         
             except json.JSONDecodeError:
                 # If JSON parsing fails, use fallback for all
+                logger.warning("Unparsable travel time batch answer, using haversine estimates: %.80r", content)
                 for origin, destination, mode, cache_key in self.request_queue:
-                    self.cache[cache_key] = self._fallback_travel_time(origin, destination, mode)
+                    self._remember(origin, destination, mode,
+                                   self._fallback_travel_time(origin, destination, mode), persist=False)
                     
-        except Exception as e:
+        except PROVIDER_ERRORS as e:
             # On error, use fallback for all
+            logger.warning("Travel time batch request failed, using haversine estimates: %s", e)
             for origin, destination, mode, cache_key in self.request_queue:
-                self.cache[cache_key] = self._fallback_travel_time(origin, destination, mode)
+                self._remember(origin, destination, mode,
+                               self._fallback_travel_time(origin, destination, mode), persist=False)
                 
         # Clear the queue
         self.request_queue = []
@@ -110,7 +141,7 @@ class DistanceCalculator:
     def _process_single_request(self, origin, destination, mode):
         """Process a single travel time request (original implementation)."""
         # Define mode of transportation
-        mode_str = ["walking", "public transport", "car"][mode]
+        mode_str = MODE_STRINGS[mode]
         
         # Create the API request
         prompt = (
@@ -124,40 +155,167 @@ class DistanceCalculator:
         try:
             self.request_count += 1
             
-            response = openai.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that provides precise travel time estimates."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0
-            )
-            
             # Extract the travel time from the response
-            travel_time = self._parse_time_from_response(response.choices[0].message.content)
+            travel_time = self._parse_time_from_response(self._complete(prompt))
             
             # Cache the result
-            cache_key = f"{origin['ID']}-{destination['ID']}-{mode}"
-            self.cache[cache_key] = travel_time
+            self._remember(origin, destination, mode, travel_time)
             
             return travel_time
             
-        except Exception as e:
+        except PROVIDER_ERRORS as e:
             # Return a fallback value
+            logger.warning("Travel time request failed, using a haversine estimate: %s", e)
             fallback = self._fallback_travel_time(origin, destination, mode)
-            cache_key = f"{origin['ID']}-{destination['ID']}-{mode}"
-            self.cache[cache_key] = fallback
+            self._remember(origin, destination, mode, fallback, persist=False)
             return fallback
     
-    def _parse_time_from_response(self, response_text):
-        """Extract the travel time from API response."""
+    def _complete(self, prompt):
+        """Send a prompt to the provider and return the text of its answer."""
+        if self.provider is not None:
+            return self.provider(prompt)
+        
+        response = openai.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0
+        )
+        return response.choices[0].message.content
+    
+    def _build_batch_prompt(self, requests):
+        """Prompt asking for the travel times of several (origin, destination, mode) requests."""
+        batch_prompt = "Calculate travel times in minutes between multiple location pairs:\n\n"
+        for i, (origin, destination, mode) in enumerate(requests):
+            batch_prompt += f"Request {i+1}:\n"
+            batch_prompt += f"  Origin: {origin['Nom']} at coordinates {origin['latitude']}, {origin['longitude']}\n"
+            batch_prompt += f"  Destination: {destination['Nom']} at coordinates {destination['latitude']}, {destination['longitude']}\n"
+            batch_prompt += f"  Mode: {MODE_STRINGS[mode]}\n\n"
+            
+        batch_prompt += "Respond with a JSON array of travel times in minutes. For example: [15, 25, 10, ...]"
+        return batch_prompt
+    
+    def get_travel_times_batch(self, requests):
+        """Estimate many travel times at once with concurrent batched prompts.
+        
+        requests is a list of (origin, destination, mode) tuples of POI node dicts. Pairs
+        already cached or stored are skipped; the rest are split into prompts of
+        prefetch_batch_size requests, sent with at most max_concurrency in flight. Each prompt
+        is retried up to max_retries times on API or parse errors before falling back to
+        _fallback_travel_time; fallbacks are not written to the store.
+        Returns {(origin_id, destination_id, mode): minutes}.
+        """
+        results = {}
+        pending = []
+        seen = set()
+        for origin, destination, mode in requests:
+            key = (origin['ID'], destination['ID'], mode)
+            cache_key = f"{origin['ID']}-{destination['ID']}-{mode}"
+            if key in seen:
+                continue
+            seen.add(key)
+            
+            if cache_key in self.cache:
+                results[key] = self.cache[cache_key]
+                continue
+            if self.store is not None:
+                stored_time = self.store.get(origin['ID'], destination['ID'], mode)
+                if stored_time is not None:
+                    self.cache[cache_key] = stored_time
+                    results[key] = stored_time
+                    continue
+            pending.append((origin, destination, mode))
+        
+        if not pending:
+            return results
+        
+        if not self.use_api:
+            batches_estimates = [([self._fallback_travel_time(*request) for request in pending],
+                                  [True] * len(pending))]
+            batches = [pending]
+        else:
+            size = max(1, self.prefetch_batch_size)
+            batches = [pending[idx:idx + size] for idx in range(0, len(pending), size)]
+            with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as executor:
+                batches_estimates = list(executor.map(self._estimate_batch, batches))
+        
+        # Record results from the calling thread, one store transaction for the whole run
+        rows = []
+        for batch, (times, fallbacks) in zip(batches, batches_estimates):
+            for (origin, destination, mode), travel_time, fallback in zip(batch, times, fallbacks):
+                self.cache[f"{origin['ID']}-{destination['ID']}-{mode}"] = travel_time
+                results[(origin['ID'], destination['ID'], mode)] = travel_time
+                if not fallback:
+                    rows.append((origin['ID'], destination['ID'], mode, travel_time))
+        if self.store is not None and rows:
+            self.store.put_many(rows)
+        
+        return results
+    
+    def _estimate_batch(self, batch):
+        """Ask the provider for one batch of travel times, with retries and per-entry fallback.
+        
+        Returns the travel times and, for each of them, whether it is a haversine fallback.
+        """
+        prompt = self._build_batch_prompt(batch)
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._count_lock:
+                    self.request_count += 1
+                times = self._parse_batch_response(self._complete(prompt), len(batch))
+            except PROVIDER_ERRORS as e:
+                logger.warning("Travel time batch of %d requests failed (attempt %d/%d): %s",
+                               len(batch), attempt + 1, self.max_retries + 1, e)
+                if attempt < self.max_retries:
+                    # Exponential backoff with jitter before retrying
+                    time.sleep((2 ** attempt) * 0.5 + random.random() * 0.1)
+                continue
+            
+            invalid = sum(t is None for t in times)
+            if invalid:
+                logger.warning("%d of %d travel times in a batch answer are invalid, "
+                               "using haversine estimates for them", invalid, len(batch))
+            return ([int(t) if t is not None else self._fallback_travel_time(*request)
+                     for request, t in zip(batch, times)],
+                    [t is None for t in times])
+        
+        logger.warning("Giving up on a travel time batch of %d requests, using haversine estimates", len(batch))
+        return [self._fallback_travel_time(*request) for request in batch], [True] * len(batch)
+    
+    def _parse_batch_response(self, content, expected):
+        """Parse a JSON array of travel times; invalid entries become None.
+        
+        Raises ValueError if no array can be found or if it has the wrong length.
+        """
+        content = content.strip()
         try:
-            # Try to extract just the number from the response
-            time_str = ''.join(c for c in response_text if c.isdigit() or c == '.')
-            return int(float(time_str))
-        except:
-            # If parsing fails, use a default value
-            return 20
+            times = json.loads(content)
+        except json.JSONDecodeError:
+            # Models sometimes wrap the array in prose or code fences
+            array_match = re.search(r'\[.*?\]', content, re.DOTALL)
+            if not array_match:
+                raise ValueError("No JSON array in batch response")
+            times = json.loads(array_match.group(0))
+        
+        if not isinstance(times, list) or len(times) != expected:
+            raise ValueError(f"Expected {expected} travel times, got {times!r:.80}")
+        
+        return [t if isinstance(t, (int, float)) and not isinstance(t, bool) and t >= 0 else None for t in times]
+    
+    def _remember(self, origin, destination, mode, travel_time, persist=True):
+        """Cache a travel time in memory and, with persist, append it to the persistent store."""
+        self.cache[f"{origin['ID']}-{destination['ID']}-{mode}"] = travel_time
+        if persist and self.store is not None:
+            self.store.put(origin['ID'], destination['ID'], mode, travel_time)
+    
+    def _parse_time_from_response(self, response_text):
+        """Extract the travel time from API response; raises ValueError if there is none."""
+        # Try to extract just the number from the response
+        time_str = ''.join(c for c in response_text if c.isdigit() or c == '.')
+        return int(float(time_str))
             
     def _fallback_travel_time(self, origin, destination, mode):
         """Calculate a fallback travel time if API fails."""
@@ -190,4 +348,71 @@ class DistanceCalculator:
     def flush_queue(self):
         """Force processing of any remaining items in the request queue."""
         if self.request_queue:
-            self._process_batch()
\ No newline at end of file
+            self._process_batch()
+
+
+class StubTravelTimeProvider:
+    """Offline stand-in for the LLM: answers travel time prompts from the coordinates they contain.
+    
+    Each call sleeps for `latency` seconds to mimic a network round-trip, so the
+    sequential and batched modes of DistanceCalculator can be benchmarked without an API key.
+    failure_rate makes a fraction of calls raise, to exercise retries and fallbacks.
+    """
+    
+    COORDINATES = re.compile(r"coordinates (-?[\d.]+), (-?[\d.]+)")
+    MODES = re.compile(r"Mode(?: of transportation)?: (walking|public transport|car)")
+    
+    def __init__(self, latency=0.5, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._estimator = DistanceCalculator(use_api=False, provider=self)
+    
+    def __call__(self, prompt):
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+        time.sleep(self.latency)
+        if fail:
+            raise TravelTimeProviderError("Simulated provider failure")
+        
+        coords = [(float(lat), float(lon)) for lat, lon in self.COORDINATES.findall(prompt)]
+        modes = [MODE_STRINGS.index(mode) for mode in self.MODES.findall(prompt)]
+        times = []
+        for k, mode in enumerate(modes):
+            (lat1, lon1), (lat2, lon2) = coords[2 * k], coords[2 * k + 1]
+            origin = {'latitude': lat1, 'longitude': lon1}
+            destination = {'latitude': lat2, 'longitude': lon2}
+            times.append(self._estimator._fallback_travel_time(origin, destination, mode))
+        
+        # Single requests expect a bare number, batches a JSON array
+        if "Request 1:" not in prompt:
+            return str(times[0]) if times else "20"
+        return json.dumps(times)
+
+
+if __name__ == "__main__":
+    # Offline comparison of sequential and concurrent batched estimation
+    rng = random.Random(42)
+    pois = [{'ID': i, 'Nom': f'POI {i}', 'latitude': 48.85 + rng.uniform(-0.05, 0.05),
+             'longitude': 2.35 + rng.uniform(-0.07, 0.07)} for i in range(40)]
+    requests = [(pois[i], pois[j], 1) for i in range(len(pois)) for j in rng.sample(range(len(pois)), 5) if i != j]
+    latency = 0.2
+    
+    sequential = DistanceCalculator(provider=StubTravelTimeProvider(latency=latency))
+    start = time.time()
+    for origin, destination, mode in requests:
+        sequential.get_travel_time(origin, destination, mode)
+    sequential.flush_queue()
+    sequential_time = time.time() - start
+    
+    batched = DistanceCalculator(provider=StubTravelTimeProvider(latency=latency, failure_rate=0.1))
+    start = time.time()
+    batched.get_travel_times_batch(requests)
+    batched_time = time.time() - start
+    
+    print(f"{len(requests)} travel times with a {latency}s stub latency:")
+    print(f"  sequential: {sequential_time:.2f}s, {sequential.request_count} requests")
+    print(f"  batched:    {batched_time:.2f}s, {batched.request_count} requests")
@@ -0,0 +1,86 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371  # Radius of Earth in kilometers
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Haversine distance in kilometers, vectorized over NumPy arrays."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    return c * EARTH_RADIUS_KM
+
+
+class DistanceMatrix:
+    """All-pairs haversine distances between the POIs of a city graph."""
+
+    def __init__(self, graph):
+        """Compute the full distance matrix for the nodes of the graph in one batched operation."""
+        self.node_ids = list(graph.nodes())
+        self.index = {node: idx for idx, node in enumerate(self.node_ids)}
+
+        self.latitudes = np.array([graph.nodes[n]['latitude'] for n in self.node_ids], dtype=np.float64)
+        self.longitudes = np.array([graph.nodes[n]['longitude'] for n in self.node_ids], dtype=np.float64)
+
+        # Broadcast column against row vectors to get the n x n matrix
+        self.matrix = haversine_km(
+            self.latitudes[:, np.newaxis], self.longitudes[:, np.newaxis],
+            self.latitudes[np.newaxis, :], self.longitudes[np.newaxis, :]
+        )
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __contains__(self, node):
+        return node in self.index
+
+    def distance(self, poi_i, poi_j):
+        """Distance in kilometers between two POIs."""
+        return float(self.matrix[self.index[poi_i], self.index[poi_j]])
+
+    def nearest(self, poi, k):
+        """Return the k closest POIs to `poi` (excluding itself), closest first."""
+        n = len(self.node_ids)
+        k = min(k, n - 1)
+        if k <= 0:
+            return []
+
+        row = self.matrix[self.index[poi]].copy()
+        row[self.index[poi]] = np.inf
+
+        # Partial selection of the k smallest, then order only those k
+        candidates = np.argpartition(row, k - 1)[:k]
+        candidates = candidates[np.argsort(row[candidates], kind='stable')]
+
+        return [self.node_ids[idx] for idx in candidates]
+
+    def nearest_neighbors(self, k, nodes=None):
+        """Return the k nearest neighbors of every POI as {poi_id: [neighbor_ids]}.
+        
+        With `nodes`, both the POIs and their neighbors are restricted to that subset.
+        """
+        node_ids = self.node_ids if nodes is None else list(nodes)
+        masked = self.matrix if nodes is None else self.matrix[np.ix_(*[[self.index[n] for n in node_ids]] * 2)]
+        
+        n = len(node_ids)
+        k = min(k, n - 1)
+        if k <= 0:
+            return {node: [] for node in node_ids}
+
+        masked = masked.copy()
+        np.fill_diagonal(masked, np.inf)
+
+        # Row-wise partial selection, then sort the k selected columns of each row
+        candidates = np.argpartition(masked, k - 1, axis=1)[:, :k]
+        selected = np.take_along_axis(masked, candidates, axis=1)
+        order = np.argsort(selected, axis=1, kind='stable')
+        candidates = np.take_along_axis(candidates, order, axis=1)
+
+        return {
+            node: [node_ids[idx] for idx in candidates[row]]
+            for row, node in enumerate(node_ids)
+        }
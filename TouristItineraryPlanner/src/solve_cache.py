@@ -0,0 +1,118 @@
+import time
+import threading
+from collections import OrderedDict, namedtuple
+
+# Normalized parameters of a planning request, used as the cache key
+PlanRequest = namedtuple("PlanRequest", [
+    "city", "start_minutes", "end_minutes", "max_pois", "restaurant_count",
+    "mandatory_poi_ids", "use_api_for_distance", "formulation", "scheduling", "num_days",
+    "engine",
+])
+
+# Fields that may differ between a request and a previous solve still useful as a warm start
+NEAR_MISS_FIELDS = ("start_minutes", "end_minutes", "max_pois")
+
+
+def _to_minutes(time_str):
+    """Convert "H:MM" / "HH:MM" to minutes since midnight; leave other values untouched."""
+    try:
+        hours, minutes = map(int, str(time_str).strip().split(':'))
+        return hours * 60 + minutes
+    except ValueError:
+        return str(time_str).strip()
+
+
+def make_plan_request(city, start_time, end_time, max_pois, restaurant_count, mandatory_poi_ids=None,
+                      use_api_for_distance=True, formulation="positional", scheduling="reified", num_days=1,
+                      engine="exact"):
+    """Build the normalized cache key of a planning request."""
+    return PlanRequest(
+        city=city.strip().lower(),
+        start_minutes=_to_minutes(start_time),
+        end_minutes=_to_minutes(end_time),
+        max_pois=int(max_pois),
+        restaurant_count=int(restaurant_count),
+        mandatory_poi_ids=tuple(sorted({int(poi_id) for poi_id in (mandatory_poi_ids or [])})),
+        use_api_for_distance=bool(use_api_for_distance),
+        formulation=formulation,
+        scheduling=scheduling,
+        num_days=int(num_days),
+        engine=engine,
+    )
+
+
+class SolveCache:
+    """Bounded, thread-safe LRU cache of planning results with a time-to-live.
+
+    A result proven optimal answers any later identical request. Otherwise it only answers
+    requests with a time limit no longer than the one it was solved with, and a solve with
+    a longer time limit replaces it.
+    """
+
+    def __init__(self, max_entries=128, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # PlanRequest -> (timestamp, result, time_limit, optimal)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            self._evict_expired()
+            return len(self._entries)
+
+    def _evict_expired(self):
+        """Drop entries older than the TTL (caller holds the lock)."""
+        now = time.time()
+        expired = [key for key, entry in self._entries.items() if now - entry[0] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, request, time_limit=None):
+        """Return the cached result for exactly this request, or None.
+
+        With `time_limit`, a result that is not proven optimal is only returned if it was
+        solved with at least that time limit.
+        """
+        with self._lock:
+            self._evict_expired()
+            entry = self._entries.get(request)
+            if entry is None or not (entry[3] or time_limit is None or entry[2] >= time_limit):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(request)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, request, result, time_limit=0, optimal=False):
+        """Store a result solved with `time_limit`, unless a stronger one is already cached.
+
+        Evicts the least recently used entry if the cache is full.
+        """
+        with self._lock:
+            self._evict_expired()
+            entry = self._entries.get(request)
+            if entry is not None and (entry[3] or (not optimal and entry[2] > time_limit)):
+                return
+            self._entries[request] = (time.time(), result, time_limit, optimal)
+            self._entries.move_to_end(request)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def find_similar(self, request):
+        """Return (request, result) of the most recent entry that only differs in NEAR_MISS_FIELDS.
+
+        Such results are not valid answers, but make good warm-start hints for a re-solve.
+        """
+        with self._lock:
+            self._evict_expired()
+            for cached_request in reversed(self._entries):
+                if all(getattr(cached_request, field) == getattr(request, field)
+                       for field in PlanRequest._fields if field not in NEAR_MISS_FIELDS):
+                    return cached_request, self._entries[cached_request][1]
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,314 @@
+import time
+import uuid
+import atexit
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait as wait_connections
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATES = ("done", "failed", "cancelled", "timeout")
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted while the solve queue is full."""
+
+
+def _worker_main(conn, handler, preload_cities):
+    """Worker process loop: keep city graphs resident and run the jobs received on `conn`."""
+    from data.city_graph import load_graph
+
+    graphs = {}
+    for city in preload_cities:
+        graph = load_graph(city.lower())
+        if graph is not None:
+            graphs[city.lower()] = graph
+    conn.send((None, "ready", None))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+
+        job_id, params, time_limit = message
+        try:
+            result = handler(params, graph_cache=graphs, time_limit=time_limit)
+            conn.send((job_id, "done", result))
+        except Exception as e:
+            conn.send((job_id, "failed", f"{type(e).__name__}: {e}"))
+
+
+class SolveJob:
+    """A planning request queued on the solve service."""
+
+    def __init__(self, params, time_limit):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.time_limit = time_limit
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        """JSON-serializable view of the job, including the result once finished."""
+        job = {
+            "id": self.id,
+            "status": self.status,
+            "time_limit": self.time_limit,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == "done":
+            job["result"] = self.result
+        if self.error is not None:
+            job["error"] = self.error
+        return job
+
+
+class _Worker:
+    """Handle on one worker process and the job it is running."""
+
+    def __init__(self, context, handler, preload_cities):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, handler, preload_cities), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.job = None
+
+    def stop(self, terminate=False):
+        """Ask the process to exit, or kill it right away when `terminate` is set."""
+        if not terminate:
+            try:
+                self.conn.send(None)
+            except (OSError, BrokenPipeError):
+                terminate = True
+        if terminate and self.process.is_alive():
+            self.process.terminate()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class SolveService:
+    """Pool of pre-started solver processes fed from a FIFO job queue.
+
+    Each worker keeps the city graphs it has loaded in memory, so jobs only pay for the
+    solve itself. A dispatcher thread hands queued jobs to idle workers, collects results
+    and kills (then replaces) workers whose job was cancelled or ran past
+    `time_limit + grace_seconds`. The solver itself is given `time_limit`, so the grace
+    period only covers precomputation and stuck jobs.
+    """
+
+    def __init__(self, handler=None, num_workers=2, time_limit=60, grace_seconds=15, max_queued=100,
+                 preload_cities=(), max_finished_jobs=1000, start_method="spawn"):
+        """`handler(params, graph_cache, time_limit)` runs in the workers and defaults to plan_itinerary.plan_request."""
+        self.handler = handler
+        self.num_workers = max(1, num_workers)
+        self.time_limit = time_limit
+        self.grace_seconds = grace_seconds
+        self.max_queued = max_queued
+        self.preload_cities = list(preload_cities)
+        self.max_finished_jobs = max_finished_jobs
+        self._context = multiprocessing.get_context(start_method)
+
+        self._jobs = {}
+        self._queue = deque()
+        self._finished = deque()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._dispatcher = None
+        self._stopping = False
+
+    def start(self):
+        """Start the worker processes and the dispatcher thread (no-op if already running)."""
+        with self._lock:
+            if self._dispatcher is not None:
+                return
+            if self.handler is None:
+                from plan_itinerary import plan_request
+                self.handler = plan_request
+            self._workers = [self._spawn_worker() for _ in range(self.num_workers)]
+            self._stopping = False
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="solve-dispatcher", daemon=True)
+            self._dispatcher.start()
+        atexit.register(self.shutdown)
+        logger.info(f"Solve service started with {self.num_workers} workers")
+
+    def shutdown(self):
+        """Stop the dispatcher and all worker processes; unfinished jobs are cancelled."""
+        with self._lock:
+            if self._dispatcher is None:
+                return
+            self._stopping = True
+            dispatcher = self._dispatcher
+        dispatcher.join()
+
+        with self._lock:
+            workers = [(worker, worker.job is not None) for worker in self._workers]
+            for worker, busy in workers:
+                if busy:
+                    self._finish(worker.job, "cancelled", error="Solve service shut down")
+            for job_id in self._queue:
+                self._finish(self._jobs[job_id], "cancelled", error="Solve service shut down")
+            self._queue.clear()
+            self._workers = []
+            self._dispatcher = None
+
+        # Join the processes without holding the lock, so status requests are not blocked
+        for worker, busy in workers:
+            worker.stop(terminate=busy)
+
+    def submit(self, params, time_limit=None):
+        """Queue a planning request and return the job as a dict (its `id` is used to poll it)."""
+        self.start()
+        with self._lock:
+            if len(self._queue) >= self.max_queued:
+                raise QueueFullError(f"Solve queue is full ({self.max_queued} jobs waiting)")
+            job = SolveJob(params, time_limit or self.time_limit)
+            self._jobs[job.id] = job
+            self._queue.append(job.id)
+            return job.to_dict()
+
+    def get(self, job_id):
+        """Return the job as a dict, or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes or `timeout` seconds pass, then return it as a dict."""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._changed.wait_for(lambda: job.status in FINISHED_STATES, timeout=timeout)
+            return job.to_dict()
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job and return it as a dict, or None if unknown.
+
+        A running job is stopped by killing its worker, which the dispatcher replaces.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == "queued":
+                self._queue.remove(job_id)
+            if job.status in ("queued", "running"):
+                self._finish(job, "cancelled")
+            return job.to_dict()
+
+    def stats(self):
+        """Current queue length and worker occupancy."""
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "busy": sum(1 for worker in self._workers if worker.job is not None),
+                "queued": len(self._queue),
+            }
+
+    def _spawn_worker(self):
+        return _Worker(self._context, self.handler, self.preload_cities)
+
+    def _finish(self, job, status, result=None, error=None):
+        """Record the final state of a job (caller holds the lock)."""
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        job.params = None
+        self._finished.append(job.id)
+        while len(self._finished) > self.max_finished_jobs:
+            self._jobs.pop(self._finished.popleft(), None)
+        self._changed.notify_all()
+
+    def _replace_worker(self, worker):
+        """Start a fresh worker in place of `worker` and return the old one (caller holds the lock).
+
+        The caller stops the old worker once it has released the lock, since killing and
+        joining a process can take seconds.
+        """
+        self._workers[self._workers.index(worker)] = self._spawn_worker()
+        return worker
+
+    def _assign_jobs(self):
+        """Hand queued jobs to idle workers (caller holds the lock)."""
+        for worker in self._workers:
+            if not self._queue:
+                return
+            if worker.ready and worker.job is None:
+                job = self._jobs[self._queue.popleft()]
+                job.status = "running"
+                job.started_at = time.time()
+                worker.job = job
+                worker.conn.send((job.id, job.params, job.time_limit))
+
+    def _reap_workers(self):
+        """Replace workers whose job was cancelled, overran its deadline, or that died (caller holds the lock).
+
+        Returns the replaced workers, for the caller to stop outside the lock.
+        """
+        now = time.time()
+        retired = []
+        for worker in list(self._workers):
+            job = worker.job
+            if job is not None and job.status == "cancelled":
+                logger.info(f"Killing worker running cancelled job {job.id}")
+            elif job is not None and now - job.started_at > job.time_limit + self.grace_seconds:
+                logger.warning(f"Job {job.id} exceeded its {job.time_limit}s time limit")
+                self._finish(job, "timeout", error=f"Exceeded time limit of {job.time_limit}s")
+            elif not worker.process.is_alive():
+                logger.error(f"Solve worker {worker.process.pid} died")
+                if job is not None:
+                    self._finish(job, "failed", error="Worker process died")
+            else:
+                continue
+            retired.append(self._replace_worker(worker))
+        return retired
+
+    def _handle_message(self, worker, message):
+        """Process a message received from a worker (caller holds the lock)."""
+        job_id, status, payload = message
+        if status == "ready":
+            worker.ready = True
+            return
+        job = worker.job
+        worker.job = None
+        if job is None or job.id != job_id or job.status != "running":
+            return  # Cancelled or timed out meanwhile
+        if status == "done":
+            self._finish(job, "done", result=payload)
+        else:
+            self._finish(job, "failed", error=payload)
+
+    def _dispatch_loop(self):
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+                retired = self._reap_workers()
+                self._assign_jobs()
+                workers = {worker.conn: worker for worker in self._workers}
+
+            for worker in retired:
+                worker.stop(terminate=True)
+
+            for conn in wait_connections(list(workers), timeout=0.1):
+                worker = workers[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    continue  # The process died; _reap_workers replaces it
+                with self._lock:
+                    self._handle_message(worker, message)
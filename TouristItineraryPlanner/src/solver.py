@@ -1,24 +1,51 @@
 from ortools.sat.python import cp_model
 import datetime
+import time
+import random
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import os
-import math
 import networkx as nx
 from dotenv import load_dotenv
 
 # Add project root to path to allow imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from data.city_graph import load_graph
+from data.travel_time_store import TravelTimeStore
 from src.distance_api import DistanceCalculator
 from src.city_generator import generate_city_data
+from src.distance_matrix import DistanceMatrix, haversine_km
+from src.spatial_index import GridIndex
+from src.clustering import partition_pois
 
 class TouristItinerarySolver:
     """Solver for the Tourist Trip Design Problem using constraint programming."""
     
+    # Above this many POIs the n x n distance matrix is not materialized
+    DENSE_MATRIX_MAX_POIS = 2000
+    
+    # Encodings of the visit order available in solve()
+    FORMULATIONS = ("positional", "circuit")
+    
+    # Encodings of opening hours and meal windows available in solve()
+    SCHEDULING_MODES = ("reified", "interval")
+    
+    # Search engines available in solve(): one CP-SAT model over every candidate POI, or
+    # greedy insertion improved by large neighborhood search over small CP-SAT sub-models
+    ENGINES = ("exact", "lns")
+    
     def __init__(self, city="paris", graph=None, start_time="09:00", end_time="19:00", 
                  mandatory_visits=None, api_key=None, max_neighbors=3,
-                 mandatory_restaurant=True, restaurant_count=1, max_pois=6, use_api_for_distance=True):
-        """Initialize the solver with tour parameters."""
+                 mandatory_restaurant=True, restaurant_count=1, max_pois=6, use_api_for_distance=True,
+                 candidate_radius_km=None, mandatory_radius_km=None, formulation="positional",
+                 scheduling="reified", travel_time_store=None, engine="exact", distance_provider=None):
+        """Initialize the solver with tour parameters.
+        
+        distance_provider replaces the OpenAI chat API of the distance calculator (see
+        DistanceCalculator), e.g. with a StubTravelTimeProvider for offline runs.
+        """
         self.city = city.lower()
         
         # Add these missing attributes
@@ -86,11 +113,31 @@ class TouristItinerarySolver:
         self.walking_threshold = 1.0  # km
         self.public_transport_threshold = 5.0  # km
         
+        # Spatial filtering: mandatory POIs connect to everything within this radius,
+        # and solve() only considers POIs within candidate_radius_km of the anchors (None = all)
+        self.mandatory_radius_km = mandatory_radius_km if mandatory_radius_km is not None else self.public_transport_threshold
+        self.candidate_radius_km = candidate_radius_km
+        self._mandatory_connection_cache = {}
+        
+        # Default visit-order encoding used by solve(), and figures from the last solve
+        self.formulation = formulation
+        self.scheduling = scheduling
+        self.engine = engine
+        self.last_solve_stats = None
+        
         # Add the parameter to the constructor
         self.use_api_for_distance = use_api_for_distance
         
+        # Persistent travel-time store shared with the distance calculator (opened on first use)
+        self.travel_time_store = travel_time_store if travel_time_store is not None else TravelTimeStore(self.city)
+        
         # Initialize distance calculator with the parameter
-        self.distance_calculator = DistanceCalculator(api_key=api_key, use_api=use_api_for_distance)
+        self.distance_calculator = DistanceCalculator(api_key=api_key, use_api=use_api_for_distance,
+                                                      store=self.travel_time_store, provider=distance_provider)
+        
+        # All-pairs haversine distances and spatial index, computed once per graph on first use
+        self._distance_matrix = None
+        self._spatial_index = None
         
         # Try to load cached nearest neighbors
         if hasattr(self.graph, 'graph') and 'nearest_neighbors' in self.graph.graph:
@@ -187,126 +234,147 @@ class TouristItinerarySolver:
         
         return intervals if intervals else [(0, 24*60)]  # Default to open all day if parsing fails
     
+    @property
+    def distance_matrix(self):
+        """Haversine distance matrix shared by neighbor search and transport mode selection.
+        
+        None for graphs larger than DENSE_MATRIX_MAX_POIS, where the spatial index is used instead.
+        """
+        if self.graph.number_of_nodes() > self.DENSE_MATRIX_MAX_POIS:
+            return None
+        if self._distance_matrix is None or len(self._distance_matrix) != self.graph.number_of_nodes():
+            self._distance_matrix = DistanceMatrix(self.graph)
+        return self._distance_matrix
+    
+    @property
+    def spatial_index(self):
+        """Grid index over POI coordinates for k-nearest and within-radius queries."""
+        if self._spatial_index is None or len(self._spatial_index) != self.graph.number_of_nodes():
+            self._spatial_index = GridIndex(self.graph)
+        return self._spatial_index
+    
     def _precompute_nearest_neighbors(self):
         """Precompute the nearest neighbors for each POI based on haversine distance."""
-        nearest_neighbors = {}
-        pois = list(self.graph.nodes())
+        matrix = self.distance_matrix
+        if matrix is not None:
+            return matrix.nearest_neighbors(self.max_neighbors)
+        return self.spatial_index.nearest_neighbors(self.max_neighbors)
+    
+    def _candidate_pois(self, pois):
+        """Restrict the POIs given to the model to those near the anchors of the tour.
         
-        for i in pois:
-            distances = []
-            for j in pois:
-                if i != j:
-                    # Calculate haversine distance
-                    lat1 = math.radians(self.graph.nodes[i]['latitude'])
-                    lon1 = math.radians(self.graph.nodes[i]['longitude'])
-                    lat2 = math.radians(self.graph.nodes[j]['latitude'])
-                    lon2 = math.radians(self.graph.nodes[j]['longitude'])
-                    
-                    # Haversine formula
-                    dlon = lon2 - lon1
-                    dlat = lat2 - lat1
-                    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-                    c = 2 * math.asin(math.sqrt(a))
-                    r = 6371  # Radius of Earth in kilometers
-                    distance = c * r
-                    
-                    distances.append((j, distance))
-            
-            # Sort by distance and keep only the closest neighbors
-            distances.sort(key=lambda x: x[1])
-            nearest_neighbors[i] = [poi_id for poi_id, _ in distances[:self.max_neighbors]]
+        Anchors are the mandatory visits, or the most interesting POI if there are none.
+        """
+        if self.candidate_radius_km is None or not pois:
+            return pois
+        
+        anchors = [poi for poi in self.mandatory_visits if poi in self.graph]
+        if not anchors:
+            anchors = [max(pois, key=lambda poi: self.graph.nodes[poi].get('Interet', 0))]
+        
+        allowed = set(anchors)
+        for anchor in anchors:
+            allowed.update(self.spatial_index.within_radius_of_poi(anchor, self.candidate_radius_km))
         
-        return nearest_neighbors
+        candidates = [poi for poi in pois if poi in allowed]
+        print(f"Kept {len(candidates)}/{len(pois)} candidate POIs within {self.candidate_radius_km} km of {anchors}")
+        return candidates
     
     def _precompute_travel_times(self, pois):
         """Precompute only the optimal transport mode and time between POIs."""
         print(f"Checking travel times for {len(pois)} POIs...")
         
-        # Debug: check how many edges already have travel times
-        edge_count = 0
-        edges_with_cached_times = 0
-        for i in pois:
-            for j in pois:
-                if i != j and i in self.graph and j in self.graph[i]:
-                    edge_count += 1
-                    if 'travel_time' in self.graph[i][j]:
-                        edges_with_cached_times += 1
-        print(f"DEBUG: Found {edges_with_cached_times}/{edge_count} edges with cached travel times in the full graph")
+        pois_set = set(pois)
+        
+        # Pull previously computed travel times from the persistent store in one query
+        for (i, j), (mode, minutes) in self.travel_time_store.load_selected(pois).items():
+            if not self.graph.has_edge(i, j):
+                self.graph.add_edge(i, j)
+            edge = self.graph[i][j]
+            if 'selected_mode' not in edge or 'travel_time' not in edge:
+                edge['selected_mode'] = mode
+                edge['travel_time'] = minutes
         
         # Track which connections we need to compute
         missing_connections = []
         total_edges = 0
         edges_with_times = 0
         
-        # First, ensure we have connections for all mandatory POIs
-        mandatory_connections = set()
+        # Nearest-neighbor connections
+        connections = set()
+        for i in pois:
+            for j in self.nearest_neighbors.get(i, []):
+                if j in pois_set:
+                    connections.add((i, j))
+        
+        # Mandatory POIs connect to every POI within mandatory_radius_km, plus their nearest neighbors
         if self.mandatory_visits:
             print(f"Adding connections for {len(self.mandatory_visits)} mandatory POIs")
-            # This creates an excessive number of connections
             for mandatory_poi in self.mandatory_visits:
-                for other_poi in pois:
-                    if mandatory_poi != other_poi:
-                        mandatory_connections.add((mandatory_poi, other_poi))
-                        mandatory_connections.add((other_poi, mandatory_poi))
-        
-        # Process both nearest neighbors and mandatory connections
-        for i in pois:
-            for j in pois:
-                if i == j:
+                if mandatory_poi not in pois_set:
                     continue
-                    
-                # Check if this is either a nearest neighbor or a mandatory connection
-                is_neighbor = j in self.nearest_neighbors.get(i, [])
-                is_mandatory = (i, j) in mandatory_connections
-                
-                if not (is_neighbor or is_mandatory):
-                    continue
-                    
-                total_edges += 1
+                for other_poi in self._mandatory_connections(mandatory_poi):
+                    if other_poi in pois_set:
+                        connections.add((mandatory_poi, other_poi))
+                        connections.add((other_poi, mandatory_poi))
+        
+        for i, j in sorted(connections):
+            total_edges += 1
+            
+            # Check if we already have a selected travel mode and time
+            if (self.graph.has_edge(i, j) and
+                'selected_mode' in self.graph[i][j] and 
+                'travel_time' in self.graph[i][j]):
+                edges_with_times += 1
+                continue
                 
-                # Check if we already have a selected travel mode and time
-                if ('selected_mode' in self.graph[i][j] and 
-                    'travel_time' in self.graph[i][j]):
-                    edges_with_times += 1
-                    continue
-                    
-                # If we need to compute this connection, add it to our list
-                missing_connections.append((i, j))
+            # If we need to compute this connection, add it to our list
+            missing_connections.append((i, j))
         
         print(f"Found {edges_with_times}/{total_edges} edges with travel times")
         print(f"Need to compute {len(missing_connections)} connections")
         
-        # Process missing connections in batches
-        if missing_connections:
-            batch_size = 10
-            for idx in range(0, len(missing_connections), batch_size):
-                batch = missing_connections[idx:idx + batch_size]
-                
-                # Track connections we've already processed to avoid duplicates
-                processed_connections = set()
-
-                for i, j in batch:
-                    # Skip if we've already computed the reverse connection
-                    if (j, i) in processed_connections:
-                        # Reuse the reverse travel time and mode
-                        self.graph[i][j]['selected_mode'] = self.graph[j][i]['selected_mode'] 
-                        self.graph[i][j]['travel_time'] = self.graph[j][i]['travel_time']
-                        continue
-                        
-                    # Mark this connection as processed
-                    processed_connections.add((i, j))
-                    
-                    # Compute travel time normally
-                    mode, time = self._select_preferred_transport_mode(i, j)
-                    self.graph[i][j]['selected_mode'] = mode
-                    self.graph[i][j]['travel_time'] = time
+        # Fetch every API estimate the mode selection will need in one concurrent batched run
+        if missing_connections and self.use_api_for_distance:
+            self._prefetch_api_travel_times(missing_connections)
         
-        # Save the updated graph
-        from data.city_graph import save_graph
-        save_graph(self.city, self.graph)
+        # Select the preferred mode of each missing connection (API answers are now cached)
+        store_rows = []
+        for i, j in missing_connections:
+            mode, time = self._select_preferred_transport_mode(i, j, store_rows)
+            self.graph[i][j]['selected_mode'] = mode
+            self.graph[i][j]['travel_time'] = time
         
+        # Append the new travel times to the store in one transaction,
+        # so the pickled graph no longer needs to be rewritten here
+        self.travel_time_store.put_selected_many(store_rows)
         print(f"Completed travel time computation with {self.distance_calculator.request_count} API requests")
     
+    def _prefetch_api_travel_times(self, connections):
+        """Send the API requests that _select_preferred_transport_mode would make for these connections."""
+        requests = []
+        seen_pairs = set()
+        for i, j in connections:
+            # Edges are undirected: the reverse connection reuses the same selection
+            if (j, i) in seen_pairs:
+                continue
+            seen_pairs.add((i, j))
+            
+            distance_km = self._poi_distance(i, j)
+            walking_time = int(distance_km * 12 * 1.3)
+            if distance_km <= self.walking_threshold and walking_time <= 25:
+                continue  # Walking is chosen without asking the API
+            
+            origin = self.graph.nodes[i]
+            destination = self.graph.nodes[j]
+            requests.append((origin, destination, 1))
+            if distance_km > self.walking_threshold:
+                requests.append((origin, destination, 2))
+        
+        if requests:
+            print(f"Requesting {len(requests)} travel time estimates in concurrent batches")
+            self.distance_calculator.get_travel_times_batch(requests)
+    
     def get_travel_time(self, poi_i, poi_j):
         """Get travel time between two POIs using the cached or computed optimal mode."""
         # Ensure POI IDs are integers
@@ -317,6 +385,11 @@ class TouristItinerarySolver:
         if poi_i == poi_j:
             return 0
         
+        # Large cities use a sparse graph: create the edge on first use
+        if not self.graph.has_edge(poi_i, poi_j):
+            self.graph.add_edge(poi_i, poi_j)
+        self._load_stored_selection(poi_i, poi_j)
+        
         # Special handling for mandatory POIs - always allow connections
         if poi_j in self.mandatory_visits or poi_i in self.mandatory_visits:
             # If not precomputed, compute on-the-fly
@@ -341,23 +414,26 @@ class TouristItinerarySolver:
             self.graph[poi_i][poi_j]['travel_time'] = time
             return time
 
-    def _select_preferred_transport_mode(self, poi_i, poi_j):
-        """Select the preferred transport mode based on distance and travel time heuristics."""
+    def _select_preferred_transport_mode(self, poi_i, poi_j, store_rows=None):
+        """Select the preferred transport mode based on distance and travel time heuristics.
+        
+        A newly computed selection is written to the persistent store, or appended
+        to `store_rows` when given so the caller can write a batch in one transaction.
+        """
         # Ensure POI IDs are integers
         poi_i = int(poi_i)
         poi_j = int(poi_j)
         
+        if not self.graph.has_edge(poi_i, poi_j):
+            self.graph.add_edge(poi_i, poi_j)
+        self._load_stored_selection(poi_i, poi_j)
+        
         # If already computed, return stored values
         if 'selected_mode' in self.graph[poi_i][poi_j] and 'travel_time' in self.graph[poi_i][poi_j]:
             return self.graph[poi_i][poi_j]['selected_mode'], self.graph[poi_i][poi_j]['travel_time']
         
-        # Calculate haversine distance
-        distance_km = self._calculate_haversine_distance(
-            self.graph.nodes[poi_i]['latitude'], 
-            self.graph.nodes[poi_i]['longitude'],
-            self.graph.nodes[poi_j]['latitude'], 
-            self.graph.nodes[poi_j]['longitude']
-        )
+        # Look up haversine distance in the shared matrix
+        distance_km = self._poi_distance(poi_i, poi_j)
         
         # Calculate walking time
         walking_time = int(distance_km * 12 * 1.3)  # 5 km/h with 1.3x penalty factor
@@ -431,50 +507,668 @@ class TouristItinerarySolver:
         self.graph[poi_i][poi_j]['selected_mode'] = chosen_mode
         self.graph[poi_i][poi_j]['travel_time'] = chosen_time
         
+        # Append to the persistent store (edges are undirected, so key on the sorted pair)
+        row = (min(poi_i, poi_j), max(poi_i, poi_j), chosen_mode, chosen_time)
+        if store_rows is not None:
+            store_rows.append(row)
+        else:
+            self.travel_time_store.put_selected(*row)
+        
         return chosen_mode, chosen_time
+    
+    def _load_stored_selection(self, poi_i, poi_j):
+        """Copy the persisted mode and travel time of an edge into the graph if it has none yet."""
+        edge = self.graph[poi_i][poi_j]
+        if 'selected_mode' in edge and 'travel_time' in edge:
+            return
+        
+        stored = self.travel_time_store.get_selected(min(poi_i, poi_j), max(poi_i, poi_j))
+        if stored is not None:
+            edge['selected_mode'], edge['travel_time'] = stored
 
+    def _poi_distance(self, poi_i, poi_j):
+        """Haversine distance in kilometers between two POIs of the graph."""
+        matrix = self.distance_matrix
+        if matrix is not None and poi_i in matrix and poi_j in matrix:
+            return matrix.distance(poi_i, poi_j)
+        
+        # Graph too large for a dense matrix, or POI added after it was built
+        return self._calculate_haversine_distance(
+            self.graph.nodes[poi_i]['latitude'], 
+            self.graph.nodes[poi_i]['longitude'],
+            self.graph.nodes[poi_j]['latitude'], 
+            self.graph.nodes[poi_j]['longitude']
+        )
+    
     def _calculate_haversine_distance(self, lat1, lon1, lat2, lon2):
         """Calculate the haversine distance between two points in kilometers."""
-        # Convert latitude and longitude from degrees to radians
-        lat1 = math.radians(lat1)
-        lon1 = math.radians(lon1)
-        lat2 = math.radians(lat2)
-        lon2 = math.radians(lon2)
-        
-        # Haversine formula
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
-        r = 6371  # Radius of Earth in kilometers
-        
-        return c * r
+        return float(haversine_km(lat1, lon1, lat2, lon2))
     
-    def solve(self, max_pois=None):
+    def solve(self, max_pois=None, formulation=None, time_limit=60, scheduling=None, hint_itinerary=None,
+              engine=None):
+        """Build and solve the CP-SAT model, returning a list of (poi_id, arrival, departure).
+        
+        formulation selects how the visit order is encoded: "positional" (one boolean per
+        POI x position) or "circuit" (optional successor arcs over the nearest-neighbor graph).
+        scheduling selects how opening hours and meals are encoded: "reified" (one boolean
+        per POI and time window) or "interval" (optional interval variables whose start
+        domains follow the opening hours, with meal windows enforced by AddNoOverlap; a smaller
+        model, but usually slower to solve).
+        hint_itinerary is a previous itinerary, with times relative to this solver's start
+        time, given to CP-SAT as a warm start.
+        engine "lns" replaces the single model by solve_lns(), which ignores formulation.
+        """
+        if engine is None:
+            engine = self.engine
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {self.ENGINES}")
+        if engine == "lns":
+            return self.solve_lns(max_pois=max_pois, time_limit=time_limit, scheduling=scheduling,
+                                  hint_itinerary=hint_itinerary)
+        
+        model, variables, build_time = self._prepare_model(max_pois, formulation, scheduling, hint_itinerary)
+        
+        # ==== Phase 9: Solve the model ====
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = time_limit
+        status = solver.Solve(model)
+        self._record_solve_stats(model, solver, status, variables, build_time)
+        
+        # ==== Phase 10: Extract the solution ====
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            itinerary = self._extract_itinerary(solver, variables)
+            self._print_metrics(itinerary)
+            return itinerary
+        else:
+            print("No feasible solution found.")
+            if status == cp_model.INFEASIBLE:
+                print("Problem proven infeasible.")
+            return None
+
+    def solve_iter(self, max_pois=None, formulation=None, time_limit=60, scheduling=None, hint_itinerary=None):
+        """Solve like solve(), yielding each improving itinerary as soon as CP-SAT finds it.
+        
+        Every item is a dict with keys itinerary, objective, wall_time and final. Intermediate
+        solutions have final=False; the last item has final=True, the status name and the best
+        itinerary (or None). Closing the generator early stops the search.
+        """
+        model, variables, build_time = self._prepare_model(max_pois, formulation, scheduling, hint_itinerary)
+        
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = time_limit
+        solutions = queue.Queue()
+        callback = _ItineraryCallback(self, variables, solutions)
+        outcome = {}
+        
+        def run():
+            try:
+                outcome['status'] = solver.Solve(model, callback)
+            finally:
+                solutions.put(None)
+        
+        # Solve in a background thread so solutions can be yielded while the search runs
+        thread = threading.Thread(target=run, name="cp-sat-stream", daemon=True)
+        thread.start()
+        best = None
+        try:
+            while True:
+                solution = solutions.get()
+                if solution is None:
+                    break
+                best = solution['itinerary']
+                yield solution
+        finally:
+            solver.StopSearch()
+            thread.join()
+        
+        status = outcome.get('status', cp_model.UNKNOWN)
+        self._record_solve_stats(model, solver, status, variables, build_time)
+        if best:
+            self._print_metrics(best)
+        else:
+            print("No feasible solution found.")
+        yield {
+            'itinerary': best,
+            'objective': self.last_solve_stats['objective'],
+            'wall_time': solver.WallTime(),
+            'status': self.last_solve_stats['status'],
+            'final': True,
+        }
+
+    def solve_multi_day(self, num_days, max_pois=None, formulation=None, time_limit=60, scheduling=None,
+                        max_workers=None, seed=0):
+        """Plan `num_days` days with the same daily time window, returning one itinerary (or None) per day.
+        
+        POIs are split into one geographic cluster per day with k-means on their coordinates,
+        so no POI can be visited on two different days. The distance matrix is shared by all
+        days and travel times are precomputed in one batch; the day models are then built one
+        after the other and the CP-SAT searches run in parallel threads. A day proven infeasible
+        is re-solved with more arcs per POI of its cluster. `max_pois` applies to each day.
+        """
+        max_pois, formulation, scheduling = self._resolve_modes(max_pois, formulation, scheduling)
+        pois = self._integer_pois()
+        
+        # ==== Partition POIs into days ====
+        days = partition_pois(self.graph, pois, num_days, minimums=self._daily_minimums(pois, max_pois),
+                              mandatory=self.mandatory_visits, max_mandatory=max_pois, seed=seed)
+        for day, day_pois in enumerate(days, start=1):
+            print(f"Day {day}: {len(day_pois)} candidate POIs")
+        
+        # Neighbors in another day's cluster can never follow each other, so each POI gets its
+        # nearest neighbors within its own day; days are disjoint, so one dict serves all of them
+        city_neighbors = self.nearest_neighbors
+        self.nearest_neighbors = {}
+        for day_pois in days:
+            self.nearest_neighbors.update(self._cluster_neighbors(day_pois))
+        
+        try:
+            # ==== Shared precomputation ====
+            # One batched pass fetches the travel times of every day's arcs
+            if self.use_api_for_distance:
+                self._precompute_travel_times(pois)
+            
+            # ==== Build one model per day ====
+            # Building touches the shared graph and travel-time caches, so it stays sequential
+            built = [self._prepare_model(max_pois, formulation, scheduling, None, pois=day_pois, precompute=False)
+                     for day_pois in days]
+        finally:
+            self.nearest_neighbors = city_neighbors
+        
+        # ==== Solve the days in parallel ====
+        # CP-SAT releases the GIL while searching; split the cores between the concurrent searches
+        max_workers = max_workers or len(built)
+        search_workers = max(1, (os.cpu_count() or 1) // max_workers)
+        
+        def solve_day(model):
+            solver = cp_model.CpSolver()
+            solver.parameters.max_time_in_seconds = time_limit
+            solver.parameters.num_workers = search_workers
+            return solver, solver.Solve(model)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(solve_day, [model for model, _, _ in built]))
+        
+        # ==== Repair the infeasible days ====
+        # A small cluster can have no feasible tour over its nearest-neighbor arcs alone (e.g. no
+        # arc reaching one of its two restaurants): re-solve it with twice as many neighbors per
+        # POI, until it is feasible or every pair of its POIs is connected
+        for index, day_pois in enumerate(days):
+            num_neighbors = self.max_neighbors
+            while results[index][1] == cp_model.INFEASIBLE and num_neighbors < len(day_pois) - 1:
+                num_neighbors = min(2 * num_neighbors, len(day_pois) - 1)
+                print(f"Day {index + 1}: infeasible, re-solving with {num_neighbors} neighbors per POI")
+                built[index], results[index] = self._solve_day_with_neighbors(
+                    day_pois, num_neighbors, max_pois, formulation, scheduling, solve_day)
+        
+        # ==== Extract the solutions ====
+        itineraries = []
+        day_stats = []
+        for day, ((model, variables, build_time), (solver, status)) in enumerate(zip(built, results), start=1):
+            stats = self._model_stats(model, solver, status, formulation, len(variables['pois']), build_time)
+            stats['scheduling'] = scheduling
+            day_stats.append(stats)
+            print(f"Day {day}: {stats['status']} in {stats['solve_time']:.2f}s")
+            if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+                itinerary = self._extract_itinerary(solver, variables)
+                self._print_metrics(itinerary)
+                itineraries.append(itinerary)
+            else:
+                print("No feasible solution found.")
+                itineraries.append(None)
+        
+        self.last_solve_stats = {
+            'formulation': formulation,
+            'scheduling': scheduling,
+            'num_days': num_days,
+            'days': day_stats,
+            'objective': sum(stats['objective'] or 0 for stats in day_stats),
+        }
+        return itineraries
+
+    def _solve_day_with_neighbors(self, day_pois, num_neighbors, max_pois, formulation, scheduling, solve_day):
+        """Build and solve one day of solve_multi_day with `num_neighbors` neighbors per POI of its cluster.
+        
+        Returns ((model, variables, build_time), (solver, status)).
+        """
+        city_neighbors = self.nearest_neighbors
+        self.nearest_neighbors = self._cluster_neighbors(day_pois, num_neighbors)
+        try:
+            built = self._prepare_model(max_pois, formulation, scheduling, None, pois=day_pois)
+        finally:
+            self.nearest_neighbors = city_neighbors
+        return built, solve_day(built[0])
+
+    def solve_lns(self, max_pois=None, time_limit=60, scheduling=None, hint_itinerary=None,
+                  sub_time_limit=1.0, pool_size=20, max_destroy=3, relocate_rate=0.3, max_stall=200,
+                  max_stall_time=10.0, seed=0):
+        """Heuristic solve for large cities: greedy insertion, then large neighborhood search.
+        
+        Each iteration removes up to `max_destroy` POIs from the current itinerary and re-solves
+        a circuit model over the kept POIs (forced visited), the removed ones and a pool of at
+        most `pool_size` unvisited POIs close to the tour. A `relocate_rate` share of the
+        iterations instead solves freely over the POIs around an interest-weighted anchor, so
+        the tour can move to another part of the city. Sub-models have the constraints and
+        objective of the full model, so an improving sub-solution is an improving itinerary.
+        Their size does not depend on the city, and the search stops after `time_limit`
+        seconds, or after `max_stall` iterations or `max_stall_time` seconds without
+        improvement. A sub-model holding every candidate POI with none forced is the full
+        model: its bound holds for the whole search, which stops once the itinerary reaches it.
+        """
+        started = time.perf_counter()
+        max_pois, _, scheduling = self._resolve_modes(max_pois, "circuit", scheduling)
+        pois = self._candidate_pois(self._integer_pois())
+        print(f"Solving with large neighborhood search over {len(pois)} POIs...")
+        
+        if self.use_api_for_distance:
+            self._precompute_travel_times(pois)
+        
+        pois_set = set(pois)
+        rng = random.Random(seed)
+        predecessors = {}
+        for i in pois:
+            for j in self._successor_candidates(i, pois_set):
+                predecessors.setdefault(j, []).append(i)
+        stats = {'num_variables': 0, 'num_constraints': 0, 'build_time': 0.0, 'iterations': 0, 'improvements': 0,
+                 'best_bound': None}
+        
+        def remaining():
+            return time_limit - (time.perf_counter() - started)
+        
+        # ==== Initial solution: greedy insertion, repaired by a first sub-solve ====
+        if hint_itinerary:
+            seed_itinerary = [(int(poi_id), arrival, departure) for poi_id, arrival, departure in hint_itinerary
+                              if int(poi_id) in pois_set]
+        else:
+            seed_itinerary = self._greedy_itinerary(pois, max_pois, predecessors)
+            print(f"Greedy insertion picked {len(seed_itinerary)} POIs")
+        seed_route = [i for i, _, _ in seed_itinerary]
+        
+        current = None
+        for size in (2 * pool_size, 4 * pool_size):
+            pool = self._lns_pool(seed_route, pois_set, size, rng)
+            current, objective = self._lns_subsolve(seed_route, [], pool, max_pois, scheduling,
+                                                    min(remaining(), 5 * sub_time_limit), stats,
+                                                    hint_itinerary=seed_itinerary, candidates=pois_set)
+            if current is not None:
+                break
+        if current is None:
+            # The neighborhood of the greedy tour cannot satisfy the constraints; fall back to a full model
+            print("No feasible seed around the greedy tour, falling back to the exact engine")
+            return self.solve(max_pois=max_pois, formulation="circuit", time_limit=max(remaining(), 1),
+                              scheduling=scheduling, engine="exact")
+        
+        # ==== Destroy and repair ====
+        # Interest-weighted anchors for relocation moves
+        anchors = sorted(pois, key=lambda i: self.graph.nodes[i]['Interet'], reverse=True)
+        anchor_weights = [self.graph.nodes[i]['Interet'] ** 2 + 1 for i in anchors]
+        
+        def proven():
+            return stats['best_bound'] is not None and objective >= stats['best_bound'] - 1e-6
+        
+        stall = 0
+        last_improvement = time.perf_counter()
+        while (remaining() > 0 and stall < max_stall and not proven()
+               and time.perf_counter() - last_improvement < max_stall_time):
+            stats['iterations'] += 1
+            route = [i for i, _, _ in current]
+            
+            if rng.random() < relocate_rate:
+                # Relocate: solve freely over the POIs around an interesting anchor elsewhere in the city
+                anchor = rng.choices(anchors, weights=anchor_weights)[0]
+                region = [anchor] + [j for j in self.spatial_index.nearest_to_poi(anchor, 2 * pool_size - 1)
+                                     if j in pois_set]
+                candidate, candidate_objective = self._lns_subsolve(
+                    region, [], [], max_pois, scheduling, min(sub_time_limit, remaining()), stats,
+                    candidates=pois_set)
+            else:
+                # Destroy part of the tour and repair it with the POIs around it
+                removed = self._lns_destroy(route, rng.randint(1, max_destroy), rng)
+                kept = [i for i in route if i not in removed]
+                pool = self._lns_pool(route, pois_set, pool_size, rng)
+                candidate, candidate_objective = self._lns_subsolve(
+                    kept, kept, removed + pool, max_pois, scheduling, min(sub_time_limit, remaining()), stats,
+                    hint_itinerary=current)
+            
+            if candidate is not None and candidate_objective > objective:
+                current, objective = candidate, candidate_objective
+                stats['improvements'] += 1
+                stall = 0
+                last_improvement = time.perf_counter()
+                print(f"LNS iteration {stats['iterations']}: objective {objective}")
+            else:
+                stall += 1
+        
+        self.last_solve_stats = {
+            'engine': "lns",
+            'formulation': "circuit",
+            'scheduling': scheduling,
+            'num_pois': len(pois),
+            'num_variables': stats['num_variables'],
+            'num_constraints': stats['num_constraints'],
+            'build_time': stats['build_time'],
+            'solve_time': time.perf_counter() - started,
+            'status': "OPTIMAL" if proven() else "FEASIBLE",
+            'objective': objective,
+            'best_bound': stats['best_bound'],
+            'iterations': stats['iterations'],
+            'improvements': stats['improvements'],
+        }
+        print(f"LNS finished after {stats['iterations']} iterations ({stats['improvements']} improvements), "
+              f"largest sub-model {stats['num_variables']} variables")
+        
+        print(f"Solution found with {len(current)} POIs")
+        self._print_metrics(current)
+        return current
+
+    def _lns_subsolve(self, route, forced, extra, max_pois, scheduling, time_limit, stats, hint_itinerary=None,
+                      candidates=()):
+        """Solve the circuit model restricted to `route` + `extra` (+ mandatory POIs), with `forced` POIs visited.
+        
+        Returns (itinerary, objective), or (None, None) without a solution. When the sub-model holds
+        all `candidates` and forces none, its objective bound is recorded in stats['best_bound'].
+        """
+        sub_pois = list(dict.fromkeys(list(route) + list(extra) +
+                                      [i for i in self.mandatory_visits if i in self.graph]))
+        build_start = time.perf_counter()
+        model, variables = self._build_model(sub_pois, max_pois, "circuit", scheduling)
+        for i in forced:
+            model.Add(variables['visit'][i] == 1)
+        if hint_itinerary:
+            self._add_hints(model, variables, hint_itinerary)
+        stats['build_time'] += time.perf_counter() - build_start
+        
+        proto = model.Proto()
+        stats['num_variables'] = max(stats['num_variables'], len(proto.variables))
+        stats['num_constraints'] = max(stats['num_constraints'], len(proto.constraints))
+        
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = max(time_limit, 0.01)
+        solver.parameters.num_workers = 1
+        status = solver.Solve(model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None, None
+        if candidates and not forced and set(candidates) <= set(sub_pois):
+            bound = solver.BestObjectiveBound()
+            if stats['best_bound'] is None or bound < stats['best_bound']:
+                stats['best_bound'] = bound
+        return self._extract_itinerary(solver, variables, verbose=False), solver.ObjectiveValue()
+
+    def _lns_destroy(self, route, count, rng):
+        """Pick up to `count` non-mandatory POIs of the route to remove: a random set, a segment or the weakest."""
+        removable = [i for i in route if i not in self.mandatory_visits]
+        count = min(count, len(removable))
+        if count == 0:
+            return []
+        
+        strategy = rng.choice(("random", "segment", "worst"))
+        if strategy == "random":
+            return rng.sample(removable, count)
+        if strategy == "segment":
+            start = rng.randrange(len(removable) - count + 1)
+            return removable[start:start + count]
+        
+        # Lowest interest per minute spent at the POI
+        return sorted(removable, key=lambda i: self.graph.nodes[i]['Interet'] / max(self.graph.nodes[i]['duree'], 1))[:count]
+
+    def _lns_pool(self, route, pois_set, size, rng, per_poi=None):
+        """Unvisited POIs closest to the route's POIs, sampled down to `size`, favoring interesting ones."""
+        route_set = set(route)
+        unvisited = pois_set - route_set
+        if len(unvisited) <= size:
+            # The whole (small) city fits in the pool
+            return sorted(unvisited)
+        anchors = route or [max(pois_set, key=lambda i: self.graph.nodes[i]['Interet'])]
+        per_poi = per_poi or max(self.max_neighbors, 2 * size // len(anchors))
+        
+        pool = set()
+        for i in anchors:
+            pool.update(j for j in self.spatial_index.nearest_to_poi(i, per_poi) if j in pois_set and j not in route_set)
+        
+        pool = sorted(pool)
+        if len(pool) <= size:
+            return pool
+        # Weighted sampling without replacement (Efraimidis-Spirakis keys)
+        keys = {i: rng.random() ** (1.0 / (1 + self.graph.nodes[i]['Interet'])) for i in pool}
+        return sorted(pool, key=keys.get, reverse=True)[:size]
+
+    def _greedy_itinerary(self, pois, max_pois, predecessors):
+        """Orienteering-style greedy insertion along the successor arcs of the model.
+        
+        Each step inserts, at its best position, the POI with the best ratio of interest to
+        added time; restaurants are only inserted when they serve a meal not yet covered, and
+        get a bonus while meals are missing. The schedule check only approximates the model's
+        meal rules, so the result is used as a starting point, not as a final answer.
+        """
+        pois_set = set(pois)
+        route = [i for i in self.mandatory_visits if i in pois_set]
+        if self._schedule_route(route) is None:
+            route = []
+        
+        meals_needed = min(self.restaurant_count, 2) if self.mandatory_restaurant else 0
+        max_tourists = max_pois - self.restaurant_count
+        
+        while len(route) < max_pois:
+            served = self._served_meals(self._schedule_route(route))
+            tourists = sum(1 for i in route if self.graph.nodes[i].get('Type') != "Restaurant")
+            base_travel = self._route_travel(route)
+            
+            best = None
+            for candidate in self._insertion_candidates(route, pois_set, predecessors):
+                is_restaurant = self.graph.nodes[candidate].get('Type') == "Restaurant"
+                if is_restaurant and len(served) >= meals_needed:
+                    continue
+                if not is_restaurant and tourists >= max_tourists:
+                    continue
+                
+                for position in range(len(route) + 1):
+                    new_route = route[:position] + [candidate] + route[position:]
+                    new_schedule = self._schedule_route(new_route)
+                    if new_schedule is None:
+                        continue
+                    new_served = self._served_meals(new_schedule)
+                    if len(new_served) < len(served) or (is_restaurant and len(new_served) == len(served)):
+                        continue
+                    added_travel = self._route_travel(new_route) - base_travel
+                    added_time = self.graph.nodes[candidate]['duree'] + max(added_travel, 0)
+                    ratio = (10 * self.graph.nodes[candidate]['Interet'] - added_travel) / max(added_time, 1)
+                    if is_restaurant:
+                        ratio += 10  # Covering a meal comes first
+                    if best is None or ratio > best[0]:
+                        best = (ratio, new_route)
+            if best is None:
+                break
+            route = best[1]
+        
+        return self._schedule_route(route) or []
+
+    def _insertion_candidates(self, route, pois_set, predecessors):
+        """Unvisited POIs connected by an arc to a POI of the route (the most interesting POIs for an empty route)."""
+        if not route:
+            return sorted(pois_set, key=lambda i: self.graph.nodes[i]['Interet'], reverse=True)[:20]
+        route_set = set(route)
+        candidates = set()
+        for i in route:
+            candidates.update(self._successor_candidates(i, pois_set))
+            candidates.update(predecessors.get(i, []))
+        return sorted(candidates - route_set)
+
+    def _route_travel(self, route):
+        """Total travel time along a route, in minutes."""
+        return sum(self.get_travel_time(i, j) for i, j in zip(route, route[1:]))
+
+    def _schedule_route(self, route):
+        """Earliest-arrival schedule of a route as [(poi_id, arrival, departure)], or None if it cannot be kept.
+        
+        Visits must fit in the opening hours and the day, consecutive POIs must be joined by an
+        arc of the model, restaurants must start within an unserved meal window, and attractions
+        may not overlap a meal window left without a restaurant.
+        """
+        lunch, dinner = self._meal_windows()
+        meal_windows = [lunch, dinner]
+        
+        def attempt(blocked):
+            schedule = []
+            served = set()
+            ready = 0
+            for idx, i in enumerate(route):
+                if idx > 0:
+                    travel = self.get_travel_time(route[idx - 1], i)
+                    if travel >= self.total_available_time:
+                        return None, None
+                    ready = schedule[-1][2] + travel
+                
+                duration = self.graph.nodes[i]['duree']
+                allowed = self._arrival_intervals(i)
+                if self.graph.nodes[i].get('Type') == "Restaurant":
+                    allowed = _intersect_intervals(allowed, [w for m, w in enumerate(meal_windows) if m not in served])
+                else:
+                    allowed = _subtract_intervals(allowed, [(meal_windows[m][0] - duration, meal_windows[m][1])
+                                                            for m in blocked])
+                arrival = next((max(lo, ready) for lo, hi in allowed if hi >= ready), None)
+                if arrival is None:
+                    return None, None
+                if self.graph.nodes[i].get('Type') == "Restaurant":
+                    served.add(next(m for m, (lo, hi) in enumerate(meal_windows) if lo <= arrival <= hi))
+                schedule.append((i, arrival, arrival + duration))
+            return schedule, served
+        
+        # Find the meals the restaurants serve, then keep attractions out of the other meal windows
+        schedule, served = attempt(blocked=[])
+        if schedule is None:
+            return None
+        blocked = [m for m in range(len(meal_windows)) if m not in served]
+        schedule, served_again = attempt(blocked)
+        if schedule is None or served_again != served:
+            return None
+        return schedule
+
+    def _served_meals(self, schedule):
+        """Meal windows (0 lunch, 1 dinner) in which a restaurant of the schedule starts."""
+        served = set()
+        for m, (lo, hi) in enumerate(self._meal_windows()):
+            if any(self.graph.nodes[i].get('Type') == "Restaurant" and lo <= arrival <= hi
+                   for i, arrival, _ in schedule or []):
+                served.add(m)
+        return served
+
+    def _leg_time(self, poi_i, poi_j):
+        """Travel time already selected for an edge, or get_travel_time() when there is none."""
+        edge = self.graph.get_edge_data(poi_i, poi_j) or {}
+        if 'travel_time' in edge:
+            return edge['travel_time']
+        return self.get_travel_time(poi_i, poi_j)
+
+    def _cluster_neighbors(self, pois, num_neighbors=None):
+        """Nearest neighbors of each POI among `pois` only (`num_neighbors`, default max_neighbors, per POI)."""
+        matrix = self.distance_matrix
+        if matrix is None:
+            matrix = DistanceMatrix(self.graph.subgraph(pois))
+        return matrix.nearest_neighbors(num_neighbors or self.max_neighbors, nodes=pois)
+
+    def _daily_minimums(self, pois, max_pois):
+        """(POIs, minimum) groups every day needs to fill its meals and visits, for partition_pois."""
+        attractions = [i for i in pois if self.graph.nodes[i].get('Type') != "Restaurant" and i not in self.mandatory_visits]
+        minimums = [(attractions, max(max_pois - self.restaurant_count, 0))]
+        if not self.mandatory_restaurant or self.restaurant_count <= 0:
+            return minimums
+        
+        # A restaurant only counts for a meal if a whole visit fits in its opening hours during that meal
+        lunch, dinner = self._meal_windows()
+        lunch_restaurants, dinner_restaurants = [], []
+        for i in pois:
+            if self.graph.nodes[i].get('Type') != "Restaurant":
+                continue
+            arrivals = self._arrival_intervals(i)
+            if _intersect_intervals(arrivals, [lunch]):
+                lunch_restaurants.append(i)
+            if _intersect_intervals(arrivals, [dinner]):
+                dinner_restaurants.append(i)
+        
+        # A restaurant open for both meals counts in both groups, but lunch and dinner need two of them
+        meal_restaurants = list(dict.fromkeys(lunch_restaurants + dinner_restaurants))
+        if self.restaurant_count >= 2:
+            return minimums + [(lunch_restaurants, 1), (dinner_restaurants, 1), (meal_restaurants, 2)]
+        return minimums + [(meal_restaurants, 1)]
+
+    def _resolve_modes(self, max_pois, formulation, scheduling):
+        """Fill in the instance defaults and validate the formulation and scheduling mode."""
         # Use instance max_pois if none provided
         if max_pois is None:
             max_pois = self.max_pois
-            
-        # Ensure all POIs have integer IDs
+        if formulation is None:
+            formulation = self.formulation
+        if formulation not in self.FORMULATIONS:
+            raise ValueError(f"Unknown formulation '{formulation}', expected one of {self.FORMULATIONS}")
+        if scheduling is None:
+            scheduling = self.scheduling
+        if scheduling not in self.SCHEDULING_MODES:
+            raise ValueError(f"Unknown scheduling mode '{scheduling}', expected one of {self.SCHEDULING_MODES}")
+        return max_pois, formulation, scheduling
+
+    def _integer_pois(self):
+        """All graph POIs with an integer ID."""
         pois = []
         for node in self.graph.nodes():
             try:
                 pois.append(int(node))
             except (ValueError, TypeError):
                 print(f"Warning: Skipping POI {node} - not a valid integer ID")
+        return pois
+
+    def _prepare_model(self, max_pois, formulation, scheduling, hint_itinerary, pois=None, precompute=True):
+        """Select candidate POIs, precompute travel times and build the model; returns (model, variables, build_time).
+        
+        When `pois` is given it is used as is instead of the candidate POIs of the whole graph.
+        """
+        max_pois, formulation, scheduling = self._resolve_modes(max_pois, formulation, scheduling)
+        
+        if pois is None:
+            # Ensure all POIs have integer IDs, then keep only POIs close enough to the tour anchors
+            pois = self._candidate_pois(self._integer_pois())
+        
+        print(f"Solving model with {len(pois)} POIs ({formulation} formulation)...")
+        
+        # Precompute travel times in batch
+        if precompute and self.use_api_for_distance:
+            self._precompute_travel_times(pois)
 
-        print(f"Solving model with {len(pois)} POIs...")
+        build_start = time.perf_counter()
+        model, variables = self._build_model(pois, max_pois, formulation, scheduling)
+        if hint_itinerary:
+            self._add_hints(model, variables, hint_itinerary)
+        build_time = time.perf_counter() - build_start
+        return model, variables, build_time
+
+    def _record_solve_stats(self, model, solver, status, variables, build_time):
+        """Store the figures of the finished solve in last_solve_stats and print a summary."""
+        self.last_solve_stats = self._model_stats(model, solver, status, variables['formulation'],
+                                                  len(variables['pois']), build_time)
+        self.last_solve_stats['scheduling'] = variables['scheduling']
+        print(f"Model: {self.last_solve_stats['num_variables']} variables, "
+              f"{self.last_solve_stats['num_constraints']} constraints, "
+              f"built in {build_time:.2f}s, solved in {self.last_solve_stats['solve_time']:.2f}s")
+
+    def _print_metrics(self, itinerary):
+        """Print the interest and travel time totals of an itinerary."""
+        final_interest = sum(self.graph.nodes[i]['Interet'] for i, _, _ in itinerary)
+        final_travel_time = 0
         
+        for idx in range(len(itinerary) - 1):
+            curr_poi, _, _ = itinerary[idx]
+            next_poi, _, _ = itinerary[idx + 1]
+            final_travel_time += self._leg_time(curr_poi, next_poi)
+            
+        print(f"Total interest score: {final_interest}")
+        print(f"Total travel time: {final_travel_time} minutes")
+
+    def _build_model(self, pois, max_pois, formulation, scheduling="reified"):
+        """Create the CP-SAT model; returns the model and the variables needed to read a solution."""
         # Extract POI types
         restaurant_pois = [i for i in pois if self.graph.nodes[i].get('Type') == "Restaurant"]
         tourist_pois = [i for i in pois if self.graph.nodes[i].get('Type') != "Restaurant"]
         
         print(f"Found {len(restaurant_pois)} restaurants and {len(tourist_pois)} tourist attractions")
         
-        # Precompute travel times in batch
-        if self.use_api_for_distance:
-            self._precompute_travel_times(pois)
-
         # Initialize the model
         model = cp_model.CpModel()
         
@@ -484,37 +1178,98 @@ class TouristItinerarySolver:
         for i in pois:
             visit[i] = model.NewBoolVar(f'visit_{i}')
         
-        # pos[i][p] = 1 if POI i is visited at position p, 0 otherwise
-        pos = {}
-        for i in pois:
-            pos[i] = {}
-            for p in range(max_pois):
-                pos[i][p] = model.NewBoolVar(f'poi_{i}_at_pos_{p}')
-        
         # Time variables: define domain from 0 to total available time
+        # (in interval mode, arrivals are restricted to the opening hours directly)
         max_time = self.total_available_time
         arrival_time = {}
         departure_time = {}
         for i in pois:
+            arrival_intervals = [(0, max_time)]
+            if scheduling == "interval":
+                arrival_intervals = self._arrival_intervals(i)
+                if not arrival_intervals:
+                    # Cannot be visited within its opening hours today
+                    arrival_intervals = [(0, 0)]
+                    model.Add(visit[i] == 0)
             arrival_time[i] = model.NewIntVarFromDomain(
-                cp_model.Domain.FromIntervals([(0, max_time)]), f'arrival_{i}')
+                cp_model.Domain.FromIntervals(arrival_intervals), f'arrival_{i}')
             departure_time[i] = model.NewIntVarFromDomain(
                 cp_model.Domain.FromIntervals([(0, max_time)]), f'departure_{i}')
         
-        # ==== Phase 2: Core structural constraints ====
-        # 1. Each POI is visited at most once
+        # ==== Phase 2: Visit order and travel time constraints ====
+        if formulation == "circuit":
+            sequence, travel_times = self._add_circuit_sequence(
+                model, pois, max_pois, visit, arrival_time, departure_time)
+        else:
+            sequence, travel_times = self._add_positional_sequence(
+                model, pois, max_pois, visit, arrival_time, departure_time)
+        
+        # ==== Phases 3-6: Opening hours, visit durations and meal windows ====
+        if scheduling == "interval":
+            self._add_interval_schedule(
+                model, pois, restaurant_pois, tourist_pois, visit, arrival_time, departure_time)
+        else:
+            self._add_reified_schedule(
+                model, pois, restaurant_pois, tourist_pois, visit, arrival_time, departure_time)
+        
+        # ==== Phase 7: Additional constraints ====
+        # Enforce mandatory visits
+        for poi_id in self.mandatory_visits:
+            if poi_id in pois:
+                model.Add(visit[poi_id] == 1)
+        
+        # Apply the tourist POI limit
+        max_tourist_count = max_pois - self.restaurant_count
+        if max_tourist_count > 0:
+            model.Add(sum(visit[i] for i in tourist_pois) <= max_tourist_count)
+        
+        # Ensure total time doesn't exceed available time
+        model.Add(sum(departure_time[i] - arrival_time[i] for i in pois) <= self.total_available_time)
+        
+        # Minimize travel time between POIs
+        total_travel_time = model.NewIntVar(0, max_time, 'total_travel_time')
+        model.Add(total_travel_time == sum(travel_times))
+        
+        # ==== Phase 8: Define the objective function ====
+        # Primary objective: maximize interest
+        interest_score = model.NewIntVar(0, 10 * len(pois), 'interest_score')
+        interest_terms = []
+        
         for i in pois:
-            model.Add(sum(pos[i][p] for p in range(max_pois)) <= 1)
-            # Link visit[i] with pos[i][p]
-            model.Add(visit[i] == sum(pos[i][p] for p in range(max_pois)))
+            interest_var = model.NewIntVar(0, 10, f'interest_{i}')
+            poi_interest = self.graph.nodes[i]['Interet']
+            model.Add(interest_var == poi_interest).OnlyEnforceIf(visit[i])
+            model.Add(interest_var == 0).OnlyEnforceIf(visit[i].Not())
+            interest_terms.append(interest_var)
         
-        # 2. Each position has at most one POI
-        for p in range(max_pois):
-            model.Add(sum(pos[i][p] for i in pois) <= 1)
+        model.Add(interest_score == sum(interest_terms))
         
-        # 3. No gaps in positions
-        for p in range(1, max_pois):
-            model.Add(sum(pos[i][p] for i in pois) <= sum(pos[i][p-1] for i in pois))
+        # Secondary objective: minimize travel time
+        # Instead of dividing travel time by 10, we multiply interest by 10
+        # This achieves the same relative weighting
+        interest_score_scaled = model.NewIntVar(0, 100 * len(pois), 'interest_score_scaled')
+        model.Add(interest_score_scaled == interest_score * 10)
+
+        # Combined objective: maximize scaled interest score - travel time
+        combined_objective = model.NewIntVar(-max_time, 100 * len(pois), 'combined_objective')
+        model.Add(combined_objective == interest_score_scaled - total_travel_time)
+        model.Maximize(combined_objective)
+        
+        variables = {
+            'formulation': formulation,
+            'scheduling': scheduling,
+            'pois': pois,
+            'max_pois': max_pois,
+            'visit': visit,
+            'arrival': arrival_time,
+            'departure': departure_time,
+        }
+        variables.update(sequence)
+        return model, variables
+    
+    def _add_reified_schedule(self, model, pois, restaurant_pois, tourist_pois, visit, arrival_time, departure_time):
+        """Opening hours and meal windows with one reified boolean per POI and time window."""
+        max_time = self.total_available_time
         
         # ==== Phase 3: Visit duration and time window constraints ====
         # POI visit duration and opening hours
@@ -548,26 +1303,6 @@ class TouristItinerarySolver:
             if in_interval:
                 model.Add(sum(in_interval) == visit[i])
         
-        # ==== Phase 4: Travel time constraints ====
-        # Travel time between consecutive POIs
-        for p in range(max_pois - 1):
-            # For each pair of POIs that could be visited consecutively
-            for i in pois:
-                for j in pois:
-                    if i != j:
-                        # Pre-compute travel time using the preferred transport mode
-                        travel_time = self.get_travel_time(i, j)
-                        
-                        # Create a variable indicating if j follows i in the itinerary
-                        follows = model.NewBoolVar(f'poi_{j}_follows_{i}_at_pos_{p}')
-                        
-                        # Link the follows variable with position variables
-                        model.AddBoolAnd([pos[i][p], pos[j][p+1]]).OnlyEnforceIf(follows)
-                        model.AddBoolOr([pos[i][p].Not(), pos[j][p+1].Not()]).OnlyEnforceIf(follows.Not())
-                        
-                        # If j follows i, enforce the travel time constraint
-                        model.Add(arrival_time[j] >= departure_time[i] + travel_time).OnlyEnforceIf(follows)
-        
         # ==== Phase 5: Restaurant scheduling constraints ====
         # Define meal time periods
         lunch_start = self._time_to_minutes("12:00") - self.start_time
@@ -667,23 +1402,149 @@ class TouristItinerarySolver:
             # No tourist attractions during dinner if no dinner restaurant
             for i in tourist_pois:
                 model.AddImplication(dinner_visit.Not(), tourist_in_dinner[i].Not())
-
-        # ==== Phase 7: Additional constraints ====
-        # Enforce mandatory visits
-        for poi_id in self.mandatory_visits:
-            if poi_id in pois:
-                model.Add(visit[poi_id] == 1)
+    
+    def _meal_windows(self):
+        """Lunch and dinner arrival windows, in minutes relative to the start of the day."""
+        lunch = (self._time_to_minutes("12:00") - self.start_time, self._time_to_minutes("13:00") - self.start_time)
+        dinner = (self._time_to_minutes("19:00") - self.start_time, self._time_to_minutes("20:00") - self.start_time)
+        return lunch, dinner
+    
+    def _arrival_intervals(self, poi):
+        """Arrival times (relative to the start of the day) that fit a whole visit in the opening hours."""
+        max_time = self.total_available_time
+        duration = self.graph.nodes[poi]['duree']
         
-        # Apply the tourist POI limit
-        max_tourist_count = max_pois - self.restaurant_count
-        if max_tourist_count > 0:
-            model.Add(sum(visit[i] for i in tourist_pois) <= max_tourist_count)
+        intervals = []
+        for open_min, close_min in self._parse_opening_hours(self.graph.nodes[poi]['Horaire']):
+            earliest = max(0, open_min - self.start_time)
+            latest = min(max_time, close_min - self.start_time) - duration
+            if earliest <= latest:
+                intervals.append((earliest, latest))
         
-        # Ensure total time doesn't exceed available time
-        model.Add(sum(departure_time[i] - arrival_time[i] for i in pois) <= self.total_available_time)
+        return _merge_intervals(intervals)
+    
+    def _add_interval_schedule(self, model, pois, restaurant_pois, tourist_pois, visit, arrival_time, departure_time):
+        """Opening hours and meal windows with optional interval variables.
+        
+        Opening hours are already enforced by the arrival domains built in _build_model.
+        Each visit is an optional interval of its fixed duration; restaurants pick a lunch,
+        dinner or other slot through domain-restricted arrivals, and attractions cannot
+        overlap a meal window for which no restaurant was scheduled.
+        The model is smaller than the reified one but not faster to solve: on the stub
+        benchmark CP-SAT finds the optimum later, so "reified" stays the default.
+        """
+        (lunch_start, lunch_end), (dinner_start, dinner_end) = self._meal_windows()
+        
+        intervals = {}
+        for i in pois:
+            poi_duration = self.graph.nodes[i]['duree']
+            intervals[i] = model.NewOptionalIntervalVar(
+                arrival_time[i], poi_duration, departure_time[i], visit[i], f'visit_interval_{i}')
+            model.Add(departure_time[i] == arrival_time[i]).OnlyEnforceIf(visit[i].Not())
         
-        # Minimize travel time between POIs
-        total_travel_time = model.NewIntVar(0, max_time, 'total_travel_time')
+        # A single tourist can only be in one place at a time
+        model.AddNoOverlap(intervals.values())
+        
+        if not restaurant_pois:
+            return
+        
+        lunch_restaurants = []
+        dinner_restaurants = []
+        for i in restaurant_pois:
+            # Split the restaurant's arrival domain into lunch, dinner and other slots
+            opening = self._arrival_intervals(i)
+            slots = {
+                'lunch': _intersect_intervals(opening, [(lunch_start, lunch_end)]),
+                'dinner': _intersect_intervals(opening, [(dinner_start, dinner_end)]),
+                'other': _subtract_intervals(opening, [(lunch_start, lunch_end), (dinner_start, dinner_end)]),
+            }
+            
+            slot_vars = []
+            for slot, slot_intervals in slots.items():
+                if not slot_intervals:
+                    continue
+                slot_var = model.NewBoolVar(f'{slot}_rest_{i}')
+                model.AddLinearExpressionInDomain(
+                    arrival_time[i], cp_model.Domain.FromIntervals(slot_intervals)).OnlyEnforceIf(slot_var)
+                slot_vars.append(slot_var)
+                if slot == 'lunch':
+                    lunch_restaurants.append(slot_var)
+                elif slot == 'dinner':
+                    dinner_restaurants.append(slot_var)
+            
+            model.Add(sum(slot_vars) == visit[i])
+        
+        # Prevent multiple restaurants in the same meal period
+        lunch_visit = model.NewBoolVar('lunch_restaurant_visit')
+        dinner_visit = model.NewBoolVar('dinner_restaurant_visit')
+        model.Add(sum(lunch_restaurants) == lunch_visit)
+        model.Add(sum(dinner_restaurants) == dinner_visit)
+        
+        # Apply restaurant count specific constraints
+        if self.restaurant_count == 1:
+            model.Add(lunch_visit + dinner_visit == 1)
+        elif self.restaurant_count >= 2:
+            model.Add(lunch_visit == 1)
+            model.Add(dinner_visit == 1)
+        
+        # With both meals mandatory no meal window can be empty, so the blocks below would only
+        # add propagation work
+        if self.restaurant_count >= 2:
+            return
+        
+        # Attractions cannot touch a meal window that has no restaurant; the blocks are widened
+        # by one minute on each side to match the closed windows of the reified encoding
+        lunch_block = model.NewOptionalFixedSizeIntervalVar(
+            lunch_start - 1, lunch_end - lunch_start + 2, lunch_visit.Not(), 'lunch_break')
+        dinner_block = model.NewOptionalFixedSizeIntervalVar(
+            dinner_start - 1, dinner_end - dinner_start + 2, dinner_visit.Not(), 'dinner_break')
+        model.AddNoOverlap([intervals[i] for i in tourist_pois] + [lunch_block, dinner_block])
+    
+    def _add_positional_sequence(self, model, pois, max_pois, visit, arrival_time, departure_time):
+        """Positional encoding: pos[i][p] = 1 if POI i is visited at position p."""
+        max_time = self.total_available_time
+        
+        # pos[i][p] = 1 if POI i is visited at position p, 0 otherwise
+        pos = {}
+        for i in pois:
+            pos[i] = {}
+            for p in range(max_pois):
+                pos[i][p] = model.NewBoolVar(f'poi_{i}_at_pos_{p}')
+        
+        # 1. Each POI is visited at most once
+        for i in pois:
+            model.Add(sum(pos[i][p] for p in range(max_pois)) <= 1)
+            # Link visit[i] with pos[i][p]
+            model.Add(visit[i] == sum(pos[i][p] for p in range(max_pois)))
+        
+        # 2. Each position has at most one POI
+        for p in range(max_pois):
+            model.Add(sum(pos[i][p] for i in pois) <= 1)
+        
+        # 3. No gaps in positions
+        for p in range(1, max_pois):
+            model.Add(sum(pos[i][p] for i in pois) <= sum(pos[i][p-1] for i in pois))
+        
+        # Travel time between consecutive POIs
+        for p in range(max_pois - 1):
+            # For each pair of POIs that could be visited consecutively
+            for i in pois:
+                for j in pois:
+                    if i != j:
+                        # Pre-compute travel time using the preferred transport mode
+                        travel_time = self.get_travel_time(i, j)
+                        
+                        # Create a variable indicating if j follows i in the itinerary
+                        follows = model.NewBoolVar(f'poi_{j}_follows_{i}_at_pos_{p}')
+                        
+                        # Link the follows variable with position variables
+                        model.AddBoolAnd([pos[i][p], pos[j][p+1]]).OnlyEnforceIf(follows)
+                        model.AddBoolOr([pos[i][p].Not(), pos[j][p+1].Not()]).OnlyEnforceIf(follows.Not())
+                        
+                        # If j follows i, enforce the travel time constraint
+                        model.Add(arrival_time[j] >= departure_time[i] + travel_time).OnlyEnforceIf(follows)
+        
+        # Travel time terms for the objective
         travel_times = []
         
         for p in range(max_pois - 1):
@@ -702,79 +1563,151 @@ class TouristItinerarySolver:
                         
                         travel_times.append(travel_time_var)
         
-        model.Add(total_travel_time == sum(travel_times))
+        return {'pos': pos}, travel_times
+    
+    def _add_circuit_sequence(self, model, pois, max_pois, visit, arrival_time, departure_time):
+        """Successor-arc encoding: one optional arc per allowed (i, j) pair, linked by AddCircuit.
         
-        # ==== Phase 8: Define the objective function ====
-        # Primary objective: maximize interest
-        interest_score = model.NewIntVar(0, 10 * len(pois), 'interest_score')
-        interest_terms = []
+        Arcs are restricted to the nearest-neighbor graph (plus the connections of mandatory
+        POIs), and the same arc literal drives both the timing constraint and the travel cost.
+        """
+        max_time = self.total_available_time
+        pois_set = set(pois)
+        
+        # Circuit node 0 is a dummy depot that opens and closes the tour
+        node_index = {i: idx + 1 for idx, i in enumerate(pois)}
+        circuit_arcs = [(0, 0, model.NewBoolVar('empty_tour'))]
         
+        start = {}
+        arcs = {}
+        travel_times = []
         for i in pois:
-            interest_var = model.NewIntVar(0, 10, f'interest_{i}')
-            poi_interest = self.graph.nodes[i]['Interet']
-            model.Add(interest_var == poi_interest).OnlyEnforceIf(visit[i])
-            model.Add(interest_var == 0).OnlyEnforceIf(visit[i].Not())
-            interest_terms.append(interest_var)
+            start[i] = model.NewBoolVar(f'start_at_{i}')
+            end = model.NewBoolVar(f'end_at_{i}')
+            circuit_arcs.append((0, node_index[i], start[i]))
+            circuit_arcs.append((node_index[i], 0, end))
+            # Unvisited POIs are skipped with a self-loop
+            circuit_arcs.append((node_index[i], node_index[i], visit[i].Not()))
         
-        model.Add(interest_score == sum(interest_terms))
+        for i in pois:
+            for j in self._successor_candidates(i, pois_set):
+                travel_time = self.get_travel_time(i, j)
+                if travel_time >= max_time:
+                    continue
+                
+                arc = model.NewBoolVar(f'poi_{j}_follows_{i}')
+                arcs[(i, j)] = arc
+                circuit_arcs.append((node_index[i], node_index[j], arc))
+                
+                # If j follows i, enforce the travel time constraint
+                model.Add(arrival_time[j] >= departure_time[i] + travel_time).OnlyEnforceIf(arc)
+                travel_times.append(travel_time * arc)
         
-        # Secondary objective: minimize travel time
-        # Instead of dividing travel time by 10, we multiply interest by 10
-        # This achieves the same relative weighting
-        interest_score_scaled = model.NewIntVar(0, 100 * len(pois), 'interest_score_scaled')
-        model.Add(interest_score_scaled == interest_score * 10)
-
-        # Combined objective: maximize scaled interest score - travel time
-        combined_objective = model.NewIntVar(-max_time, 100 * len(pois), 'combined_objective')
-        model.Add(combined_objective == interest_score_scaled - total_travel_time)
-        model.Maximize(combined_objective)
+        model.AddCircuit(circuit_arcs)
         
-        # ==== Phase 9: Solve the model ====
-        solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = 60  # Time limit
-        status = solver.Solve(model)
+        # Same cap on the tour length as the number of positions in the positional model
+        model.Add(sum(visit[i] for i in pois) <= max_pois)
         
-        # ==== Phase 10: Extract the solution ====
-        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-            # Extract the solution
-            itinerary = []
-            
-            # Find the number of POIs in the solution
-            n_visited = sum(solver.Value(visit[i]) for i in pois)
-            print(f"Solution found with {n_visited} POIs")
-            
-            # Extract the POIs in order
-            for p in range(max_pois):
-                for i in pois:
-                    if solver.Value(pos[i][p]) == 1:
-                        arrival = solver.Value(arrival_time[i])
-                        departure = solver.Value(departure_time[i])
-                        itinerary.append((i, arrival, departure))
-                        
-                        # Calculate interest score contribution
-                        poi_name = self.graph.nodes[i].get('Nom', f'POI {i}')
-                        poi_type = self.graph.nodes[i].get('Type', 'attraction')
-                        poi_interest = self.graph.nodes[i]['Interet']
-                        print(f"Position {p+1}: {poi_name} ({poi_type}) - Interest: {poi_interest}/10")
-            
-            # Calculate metrics
-            final_interest = sum(self.graph.nodes[i]['Interet'] for i, _, _ in itinerary)
-            final_travel_time = 0
-            
-            for idx in range(len(itinerary) - 1):
-                curr_poi, _, _ = itinerary[idx]
-                next_poi, _, _ = itinerary[idx + 1]
-                final_travel_time += self.get_travel_time(curr_poi, next_poi)
-                
-            print(f"Total interest score: {final_interest}")
-            print(f"Total travel time: {final_travel_time} minutes")
-                
-            return itinerary
+        return {'start': start, 'arcs': arcs}, travel_times
+    
+    def _successor_candidates(self, poi, pois_set):
+        """POIs that may directly follow `poi`: its nearest neighbors and mandatory connections."""
+        candidates = [j for j in self.nearest_neighbors.get(poi, []) if j in pois_set]
+        if poi in self.mandatory_visits:
+            candidates += [j for j in self._mandatory_connections(poi) if j in pois_set]
         else:
-            print("No feasible solution found.")
-            if status == cp_model.INFEASIBLE:
-                print("Problem proven infeasible.")
-            return None
+            for mandatory_poi in self.mandatory_visits:
+                if mandatory_poi in pois_set and poi in self._mandatory_connections(mandatory_poi):
+                    candidates.append(mandatory_poi)
+        return list(dict.fromkeys(j for j in candidates if j != poi))
+    
+    def _mandatory_connections(self, mandatory_poi):
+        """POIs connected to a mandatory POI: everything within mandatory_radius_km plus its nearest neighbors."""
+        if mandatory_poi not in self._mandatory_connection_cache:
+            nearby = self.spatial_index.within_radius_of_poi(mandatory_poi, self.mandatory_radius_km)
+            nearby += self.spatial_index.nearest_to_poi(mandatory_poi, self.max_neighbors)
+            self._mandatory_connection_cache[mandatory_poi] = set(nearby)
+        return self._mandatory_connection_cache[mandatory_poi]
+    
+    def _add_hints(self, model, variables, hint_itinerary):
+        """Warm-start the solver from a previous itinerary of (poi_id, arrival, departure)."""
+        pois = variables['pois']
+        max_time = self.total_available_time
+        
+        order = [int(poi_id) for poi_id, _, _ in hint_itinerary if int(poi_id) in variables['visit']]
+        order = order[:variables['max_pois']]
+        visited = set(order)
+        
+        for i in pois:
+            model.AddHint(variables['visit'][i], i in visited)
+        
+        for poi_id, arrival, departure in hint_itinerary:
+            poi_id = int(poi_id)
+            if poi_id in visited and 0 <= arrival <= departure <= max_time:
+                model.AddHint(variables['arrival'][poi_id], arrival)
+                model.AddHint(variables['departure'][poi_id], departure)
+        
+        if variables['formulation'] == "circuit":
+            hinted_arcs = set(zip(order, order[1:]))
+            for i in pois:
+                model.AddHint(variables['start'][i], bool(order) and i == order[0])
+            for arc_key, arc in variables['arcs'].items():
+                model.AddHint(arc, arc_key in hinted_arcs)
+        else:
+            position = {poi_id: p for p, poi_id in enumerate(order)}
+            for i in pois:
+                for p, pos_var in variables['pos'][i].items():
+                    model.AddHint(pos_var, position.get(i) == p)
+        
+        print(f"Warm start hint with {len(order)} POIs")
+    
+    def _extract_itinerary(self, solver, variables, verbose=True):
+        """Read the ordered list of (poi_id, arrival, departure) from a solved model or a solution callback."""
+        pois = variables['pois']
+        arrival_time = variables['arrival']
+        departure_time = variables['departure']
+        
+        if variables['formulation'] == "circuit":
+            # Follow the successor arcs from the POI leaving the depot
+            successor = {i: j for (i, j), arc in variables['arcs'].items() if solver.BooleanValue(arc)}
+            current = next((i for i in pois if solver.BooleanValue(variables['start'][i])), None)
+            order = []
+            while current is not None:
+                order.append(current)
+                current = successor.get(current)
+        else:
+            max_pois = variables['max_pois']
+            pos = variables['pos']
+            order = [i for p in range(max_pois) for i in pois if solver.Value(pos[i][p]) == 1]
+        
+        itinerary = [(i, solver.Value(arrival_time[i]), solver.Value(departure_time[i])) for i in order]
+        if not verbose:
+            return itinerary
+        
+        print(f"Solution found with {len(order)} POIs")
+        for p, i in enumerate(order):
+            # Calculate interest score contribution
+            poi_name = self.graph.nodes[i].get('Nom', f'POI {i}')
+            poi_type = self.graph.nodes[i].get('Type', 'attraction')
+            poi_interest = self.graph.nodes[i]['Interet']
+            print(f"Position {p+1}: {poi_name} ({poi_type}) - Interest: {poi_interest}/10")
+        
+        return itinerary
+    
+    def _model_stats(self, model, solver, status, formulation, num_pois, build_time):
+        """Size and timing figures for the last solve, used to compare formulations."""
+        proto = model.Proto()
+        feasible = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        return {
+            'formulation': formulation,
+            'num_pois': num_pois,
+            'num_variables': len(proto.variables),
+            'num_constraints': len(proto.constraints),
+            'build_time': build_time,
+            'solve_time': solver.WallTime(),
+            'status': solver.StatusName(status),
+            'objective': solver.ObjectiveValue() if feasible else None,
+        }
 
     def format_itinerary(self, itinerary):
         """Format the solution as a readable itinerary."""
@@ -891,4 +1824,64 @@ class TouristItinerarySolver:
                     
             result.append(poi_entry)
         
-        return result
\ No newline at end of file
+        return result
+
+
+class _ItineraryCallback(cp_model.CpSolverSolutionCallback):
+    """Push every improving itinerary found during the search onto a queue."""
+
+    def __init__(self, itinerary_solver, variables, solutions):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.itinerary_solver = itinerary_solver
+        self.variables = variables
+        self.solutions = solutions
+
+    def on_solution_callback(self):
+        self.solutions.put({
+            'itinerary': self.itinerary_solver._extract_itinerary(self, self.variables, verbose=False),
+            'objective': self.ObjectiveValue(),
+            'wall_time': self.WallTime(),
+            'final': False,
+        })
+
+
+def _merge_intervals(intervals):
+    """Sort closed integer intervals and merge those that overlap or touch."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _intersect_intervals(intervals, others):
+    """Intersection of two lists of closed integer intervals."""
+    result = []
+    for start, end in intervals:
+        for other_start, other_end in others:
+            lo, hi = max(start, other_start), min(end, other_end)
+            if lo <= hi:
+                result.append((lo, hi))
+    return _merge_intervals(result)
+
+
+def _subtract_intervals(intervals, others):
+    """Integers of `intervals` not covered by any interval of `others`."""
+    result = []
+    for start, end in intervals:
+        pieces = [(start, end)]
+        for other_start, other_end in others:
+            next_pieces = []
+            for lo, hi in pieces:
+                if other_end < lo or other_start > hi:
+                    next_pieces.append((lo, hi))
+                    continue
+                if lo < other_start:
+                    next_pieces.append((lo, other_start - 1))
+                if hi > other_end:
+                    next_pieces.append((other_end + 1, hi))
+            pieces = next_pieces
+        result.extend(pieces)
+    return _merge_intervals(result)
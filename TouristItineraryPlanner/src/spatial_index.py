@@ -0,0 +1,155 @@
+import math
+from collections import defaultdict
+
+import numpy as np
+
+from src.distance_matrix import EARTH_RADIUS_KM, haversine_km
+
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+class GridIndex:
+    """Uniform latitude/longitude grid over the POIs of a city graph.
+
+    Each POI is bucketed into a cell of roughly `cell_km` x `cell_km`. Queries only
+    look at the cells around the query point, so k-nearest and within-radius
+    lookups touch a handful of POIs instead of the whole city.
+    """
+
+    def __init__(self, graph, cell_km=None, points_per_cell=8):
+        """Build the grid from the `latitude`/`longitude` node attributes of the graph."""
+        self.node_ids = list(graph.nodes())
+        self.index = {node: idx for idx, node in enumerate(self.node_ids)}
+
+        self.latitudes = np.array([graph.nodes[n]['latitude'] for n in self.node_ids], dtype=np.float64)
+        self.longitudes = np.array([graph.nodes[n]['longitude'] for n in self.node_ids], dtype=np.float64)
+
+        if not self.node_ids:
+            self.lat_step = self.lon_step = 1.0
+            self.cell_km = cell_km or 1.0
+            self.min_cell_km = self.cell_km
+            self.cells = {}
+            return
+
+        # Project longitudes with the cosine of the mean latitude (city-scale approximation)
+        ref_lat = float(np.mean(self.latitudes))
+        cos_ref = max(math.cos(math.radians(ref_lat)), 1e-6)
+
+        if cell_km is None:
+            # Size cells so that each holds about `points_per_cell` POIs on average
+            height_km = max(np.ptp(self.latitudes) * KM_PER_DEGREE_LAT, 0.1)
+            width_km = max(np.ptp(self.longitudes) * KM_PER_DEGREE_LAT * cos_ref, 0.1)
+            n_cells = max(1.0, len(self.node_ids) / points_per_cell)
+            cell_km = math.sqrt(height_km * width_km / n_cells)
+        self.cell_km = cell_km
+
+        self.lat_step = cell_km / KM_PER_DEGREE_LAT
+        self.lon_step = cell_km / (KM_PER_DEGREE_LAT * cos_ref)
+
+        # Cells shrink in km towards the pole; keep the smallest size for search bounds
+        max_abs_lat = min(float(np.max(np.abs(self.latitudes))), 89.0)
+        self.min_cell_km = min(cell_km, cell_km * math.cos(math.radians(max_abs_lat)) / cos_ref)
+
+        rows, cols = self._cell_of(self.latitudes, self.longitudes)
+        buckets = defaultdict(list)
+        for idx, key in enumerate(zip(rows.tolist(), cols.tolist())):
+            buckets[key].append(idx)
+        self.cells = {key: np.array(members, dtype=np.int64) for key, members in buckets.items()}
+
+        self.row_range = (int(rows.min()), int(rows.max()))
+        self.col_range = (int(cols.min()), int(cols.max()))
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __contains__(self, node):
+        return node in self.index
+
+    def _cell_of(self, lat, lon):
+        """Return the (row, col) grid cell of one or many coordinates."""
+        return np.floor_divide(lat, self.lat_step).astype(np.int64), np.floor_divide(lon, self.lon_step).astype(np.int64)
+
+    def _ring_members(self, row, col, ring):
+        """Indices of the POIs in the cells at Chebyshev distance `ring` from (row, col)."""
+        if ring == 0:
+            keys = [(row, col)]
+        else:
+            keys = [(row + dr, col + dc)
+                    for dr in range(-ring, ring + 1)
+                    for dc in (-ring, ring)]
+            keys += [(row + dr, col + dc)
+                     for dr in (-ring, ring)
+                     for dc in range(-ring + 1, ring)]
+        members = [self.cells[key] for key in keys if key in self.cells]
+        return np.concatenate(members) if members else np.empty(0, dtype=np.int64)
+
+    def _coordinates(self, poi):
+        idx = self.index[poi]
+        return self.latitudes[idx], self.longitudes[idx]
+
+    def _ring_limit(self, row, col):
+        """Smallest ring around (row, col) that covers every occupied cell."""
+        return max(abs(row - self.row_range[0]), abs(row - self.row_range[1]),
+                   abs(col - self.col_range[0]), abs(col - self.col_range[1]))
+
+    def nearest(self, lat, lon, k, exclude=None):
+        """Return the k POIs closest to (lat, lon), closest first, skipping `exclude`."""
+        if k <= 0 or not self.node_ids:
+            return []
+
+        row, col = (int(v) for v in self._cell_of(lat, lon))
+        excluded = self.index.get(exclude) if exclude is not None else None
+        idx = np.empty(0, dtype=np.int64)
+        dist = np.empty(0, dtype=np.float64)
+
+        for ring in range(self._ring_limit(row, col) + 1):
+            members = self._ring_members(row, col, ring)
+            if excluded is not None:
+                members = members[members != excluded]
+            if len(members):
+                idx = np.concatenate([idx, members])
+                dist = np.concatenate([dist, haversine_km(lat, lon, self.latitudes[members], self.longitudes[members])])
+
+            # Any POI outside the rings scanned so far is at least `ring` cells away
+            if len(idx) >= k and np.partition(dist, k - 1)[k - 1] <= ring * self.min_cell_km:
+                break
+
+        if len(idx) == 0:
+            return []
+
+        k = min(k, len(idx))
+        best = np.argpartition(dist, k - 1)[:k]
+        best = best[np.argsort(dist[best], kind='stable')]
+        return [self.node_ids[i] for i in idx[best]]
+
+    def within_radius(self, lat, lon, radius_km):
+        """Return all POIs within `radius_km` of (lat, lon), closest first."""
+        if not self.node_ids:
+            return []
+
+        row, col = (int(v) for v in self._cell_of(lat, lon))
+        rings = min(int(math.ceil(radius_km / self.min_cell_km)), self._ring_limit(row, col))
+
+        idx = np.concatenate([self._ring_members(row, col, ring) for ring in range(rings + 1)])
+        if len(idx) == 0:
+            return []
+
+        dist = haversine_km(lat, lon, self.latitudes[idx], self.longitudes[idx])
+        keep = dist <= radius_km
+        idx, dist = idx[keep], dist[keep]
+        order = np.argsort(dist, kind='stable')
+        return [self.node_ids[i] for i in idx[order]]
+
+    def nearest_to_poi(self, poi, k):
+        """Return the k POIs closest to `poi`, excluding itself."""
+        lat, lon = self._coordinates(poi)
+        return self.nearest(lat, lon, k, exclude=poi)
+
+    def within_radius_of_poi(self, poi, radius_km):
+        """Return all other POIs within `radius_km` of `poi`, closest first."""
+        lat, lon = self._coordinates(poi)
+        return [other for other in self.within_radius(lat, lon, radius_km) if other != poi]
+
+    def nearest_neighbors(self, k):
+        """Return the k nearest neighbors of every POI as {poi_id: [neighbor_ids]}."""
+        return {node: self.nearest_to_poi(node, k) for node in self.node_ids}
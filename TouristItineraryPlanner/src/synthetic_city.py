@@ -0,0 +1,99 @@
+import math
+import random
+
+from data.city_graph import create_graph
+from src.spatial_index import KM_PER_DEGREE_LAT
+
+# Opening hours drawn for attractions and restaurants, with their relative weights
+ATTRACTION_HOURS = {
+    "All day": 3,
+    "09:00-18:00": 3,
+    "10:00-17:00": 2,
+    "10:00-22:00": 1,
+    "14:00-20:00": 1,
+}
+RESTAURANT_HOURS = {
+    "12:00-14:30, 19:00-22:30": 5,
+    "11:30-23:00": 3,
+    "18:30-23:00": 1,
+    "11:00-15:00": 1,
+}
+
+ATTRACTION_DURATIONS = (30, 45, 60, 90, 120)
+RESTAURANT_DURATIONS = (45, 60, 75, 90)
+
+
+def _weighted_choice(rng, weights):
+    """Pick a key of `weights` with probability proportional to its value."""
+    keys = list(weights)
+    return rng.choices(keys, weights=[weights[key] for key in keys])[0]
+
+
+def _interest(rng):
+    """Interest score in 1-10, skewed towards average places with a few landmarks."""
+    return max(1, min(10, round(rng.gauss(5.5, 2.0))))
+
+
+def generate_synthetic_city(num_pois, restaurant_ratio=0.2, attraction_hours=None, restaurant_hours=None,
+                            center=(48.8566, 2.3522), radius_km=4.0, num_districts=6, district_share=0.7,
+                            seed=0):
+    """Generate POIs in the format of city_generator.generate_city_data, without any network access.
+
+    `restaurant_ratio` is the share of restaurants. `attraction_hours` and `restaurant_hours`
+    map "Horaire" strings to relative weights (ATTRACTION_HOURS / RESTAURANT_HOURS by default).
+    A share `district_share` of the POIs is gathered around `num_districts` district centers,
+    the rest is spread uniformly over a disc of `radius_km` around `center`. The same seed
+    always gives the same city.
+    """
+    rng = random.Random(seed)
+    attraction_hours = attraction_hours or ATTRACTION_HOURS
+    restaurant_hours = restaurant_hours or RESTAURANT_HOURS
+    center_lat, center_lon = center
+    km_per_degree_lon = KM_PER_DEGREE_LAT * math.cos(math.radians(center_lat))
+
+    def random_offset(radius):
+        # Uniform point in a disc, in km
+        distance = radius * math.sqrt(rng.random())
+        angle = rng.uniform(0, 2 * math.pi)
+        return distance * math.cos(angle), distance * math.sin(angle)
+
+    districts = [random_offset(radius_km * 0.8) for _ in range(max(1, num_districts))]
+    num_restaurants = round(num_pois * restaurant_ratio)
+    restaurant_ids = set(rng.sample(range(1, num_pois + 1), num_restaurants))
+
+    locations = []
+    for poi_id in range(1, num_pois + 1):
+        if num_districts > 0 and rng.random() < district_share:
+            district_x, district_y = rng.choice(districts)
+            x, y = district_x + rng.gauss(0, radius_km / 10), district_y + rng.gauss(0, radius_km / 10)
+        else:
+            x, y = random_offset(radius_km)
+
+        if poi_id in restaurant_ids:
+            name, kind = f"Restaurant {poi_id}", "Restaurant"
+            hours = _weighted_choice(rng, restaurant_hours)
+            duration = rng.choice(RESTAURANT_DURATIONS)
+            cost = rng.choice((15, 25, 40, 60))
+        else:
+            name, kind = f"Site {poi_id}", "Touristique"
+            hours = _weighted_choice(rng, attraction_hours)
+            duration = rng.choice(ATTRACTION_DURATIONS)
+            cost = rng.choice((0, 0, 8, 12, 18))
+
+        locations.append({
+            "ID": poi_id,
+            "Nom": name,
+            "Horaire": hours,
+            "Type": kind,
+            "Interet": _interest(rng),
+            "duree": duration,
+            "cout": cost,
+            "latitude": round(center_lat + y / KM_PER_DEGREE_LAT, 6),
+            "longitude": round(center_lon + x / km_per_degree_lon, 6),
+        })
+    return locations
+
+
+def generate_synthetic_graph(num_pois, city="synthetic", **kwargs):
+    """City graph of generate_synthetic_city(num_pois, **kwargs), ready to give to the solver."""
+    return create_graph(generate_synthetic_city(num_pois, **kwargs), city)
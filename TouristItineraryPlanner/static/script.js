@@ -62,7 +62,8 @@ document.addEventListener('DOMContentLoaded', function() {
             end_time: document.getElementById('end-time').value,
             max_pois: document.getElementById('max-pois').value,
             restaurant_count: document.getElementById('restaurant-count').value,
-            mandatory_pois: document.getElementById('mandatory-pois').value
+            mandatory_pois: document.getElementById('mandatory-pois').value,
+            num_days: document.getElementById('num-days').value
         };
         
         // Find where the form data is collected and the API request is made
@@ -78,6 +79,7 @@ document.addEventListener('DOMContentLoaded', function() {
             max_pois: formData.max_pois,
             restaurant_count: formData.restaurant_count,
             mandatory_pois: formData.mandatory_pois,
+            num_days: formData.num_days,
             use_api_for_distance: useApiForDistance
         };
         
@@ -87,30 +89,36 @@ document.addEventListener('DOMContentLoaded', function() {
             itineraryResult.style.display = 'none';
         }
         
-        // Send API request
-        fetch('/api/plan', {
+        // Send API request; improving itineraries are streamed as Server-Sent Events
+        fetch('/api/plan/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify(requestData),
         })
-        .then(response => response.json())
-        .then(data => {
+        .then(response => readEventStream(response, function(eventName, data) {
+            if (eventName === 'solution') {
+                // Show the best plan so far and keep refining it in place
+                loadingIndicator.style.display = 'none';
+                displayItinerary(data.itinerary);
+                return;
+            }
+            
             // Hide loading indicator
             loadingIndicator.style.display = 'none';
             
             // Clear fun facts interval
             clearInterval(factInterval);
             
-            if (data.success) {
+            if (eventName === 'done' && data.success) {
                 // Show results
                 displayItinerary(data.itinerary);
             } else {
                 // Show error
                 handleError(data.error);
             }
-        })
+        }))
         .catch(error => {
             handleError("Network error: " + error.message);
         });
@@ -132,6 +140,47 @@ document.addEventListener('DOMContentLoaded', function() {
     initializePOIDetailsModal();
 });
 
+// Read a text/event-stream response, calling onEvent(eventName, data) for each event
+async function readEventStream(response, onEvent) {
+    if (!response.ok) {
+        // Rejected requests (bad time limit, busy solver) answer with a JSON error
+        const body = await response.json().catch(() => ({}));
+        throw new Error(body.error || `Server responded with ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let eventName = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    eventName = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            });
+            if (data) {
+                onEvent(eventName, JSON.parse(data));
+            }
+        }
+    }
+}
+
 // Fetch fun facts and return a promise
 function fetchFunFacts(city) {
     return new Promise((resolve, reject) => {